@@ -0,0 +1,346 @@
+"""Deterministic local stand-ins for the model, embedding and search providers."""
+
+import hashlib
+import random
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from unittest.mock import patch
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain.schema import Document
+from pydantic import ConfigDict, Field
+
+# Markers in benchmark questions that script the fake providers' behaviour
+WEB_MARKER = "[web]"          # The router sends the question to web search
+MISS_MARKER = "[miss]"        # Documents are irrelevant until the query is rewritten
+RETRY_MARKER = "[retry]"      # The first answer is graded as not grounded
+REWRITE_SUFFIX = "(rewritten)"
+
+_VOCABULARY = (
+    "agent memory planning tool reflection prompt chain thought retrieval attack "
+    "adversarial model language reasoning task decomposition embedding vector "
+    "context window instruction example jailbreak robustness evaluation"
+).split()
+
+def corpus_text(url: str, paragraphs: int = 40, words: int = 90) -> str:
+    """
+    Generate a deterministic document for a URL.
+
+    Args:
+        url: Document URL, used as the random seed
+        paragraphs: Number of paragraphs
+        words: Words per paragraph
+
+    Returns:
+        Document text
+    """
+    seed = int(hashlib.sha1(url.encode("utf-8")).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+    return "\n\n".join(
+        " ".join(rng.choice(_VOCABULARY, size=words)) + "."
+        for _ in range(paragraphs)
+    )
+
+def _count_tokens(text: str) -> int:
+    """Approximate the token count of a text."""
+    return max(1, len(text.split()))
+
+class ScriptedResponder:
+    """Decides fake model outputs from the prompt and the requested schema."""
+
+    def __init__(self):
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _generation_number(self, prompt: str) -> int:
+        """Count generations for an identical prompt, so retries differ."""
+        key = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            return self._generations[key]
+
+    def respond(self, prompt: str, schema_name: Optional[str] = None) -> str:
+        """
+        Produce the model output for a prompt.
+
+        Args:
+            prompt: Full prompt text
+            schema_name: Name of the structured output schema, if any
+
+        Returns:
+            Output text, JSON for structured outputs
+        """
+        if schema_name == "RouteQuery":
+            datasource = "web_search" if WEB_MARKER in prompt else "vectorstore"
+            return f'{{"datasource": "{datasource}"}}'
+        if schema_name == "GradeDocuments":
+            relevant = MISS_MARKER not in prompt or REWRITE_SUFFIX in prompt
+            return f'{{"binary_score": "{"yes" if relevant else "no"}"}}'
+        if schema_name == "GradeHallucinations":
+            grounded = not (RETRY_MARKER in prompt and "(draft 1)" in prompt)
+            return f'{{"binary_score": "{"yes" if grounded else "no"}"}}'
+        if schema_name == "GradeSentences":
+            unsupported = [1] if RETRY_MARKER in prompt and "(draft 1)" in prompt else []
+            return f'{{"unsupported": {unsupported}}}'
+        if schema_name == "GradeAnswer":
+            return '{"binary_score": "yes"}'
+        if schema_name == "MultiQuery":
+            question = self._question(prompt)
+            return (
+                f'{{"queries": ["{question} {REWRITE_SUFFIX}", '
+                f'"{question} explained {REWRITE_SUFFIX}"]}}'
+            )
+
+        if "question re-writer" in prompt:
+            return f"{self._question(prompt)} {REWRITE_SUFFIX}"
+        if "hypothetical document" in prompt:
+            return "A hypothetical passage about agent memory, planning and tool use."
+
+        # Graders see the answer but not the question, so carry the marker over
+        number = self._generation_number(prompt)
+        marker = f"{RETRY_MARKER} " if RETRY_MARKER in prompt else ""
+        return (
+            f"{marker}Agents combine planning, memory and tool use to solve tasks (draft {number}). "
+            "Memory is split into short-term context and long-term vector storage."
+        )
+
+    @staticmethod
+    def _question(prompt: str) -> str:
+        """Extract the question from a rewriter prompt."""
+        match = re.search(r"initial question:\s*(.*?)\s*\n", prompt)
+        return match.group(1).replace('"', "") if match else prompt.strip()
+
+class FaultInjector:
+    """Makes a fake provider fail or hang on a share of its calls."""
+
+    def __init__(
+        self,
+        error_rate: float = 0.0,
+        hang_rate: float = 0.0,
+        hang_seconds: float = 30.0,
+        seed: int = 0,
+    ):
+        """
+        Initialize the injector.
+
+        Args:
+            error_rate: Fraction of calls that raise ConnectionError
+            hang_rate: Fraction of calls that stall for hang_seconds first
+            hang_seconds: Seconds a hung call stalls
+            seed: Random seed, so that runs inject the same faults
+        """
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.errors = 0
+        self.hangs = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self) -> None:
+        """Inject a fault into the current call, or return at once."""
+        with self._lock:
+            roll = self._random.random()
+            error = roll < self.error_rate
+            hang = not error and roll < self.error_rate + self.hang_rate
+            self.errors += error
+            self.hangs += hang
+        if error:
+            raise ConnectionError("Injected provider fault")
+        if hang:
+            time.sleep(self.hang_seconds)
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers from a script after an injected latency."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    model_name: str = Field(default="fake-model", alias="model")
+    latency: float = 0.0
+    responder: Any = None
+    faults: Any = None  # Optional FaultInjector
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def with_structured_output(self, schema, **kwargs):
+        """Parse JSON output into the schema, like a tool-calling model would."""
+        return self.bind(schema_name=schema.__name__) | RunnableLambda(
+            lambda message: schema.model_validate_json(message.content)
+        )
+
+    def _respond(self, messages: List[BaseMessage], schema_name: Optional[str]) -> AIMessage:
+        prompt = "\n".join(str(message.content) for message in messages)
+        content = self.responder.respond(prompt, schema_name)
+        if self.faults is not None:
+            self.faults()
+        time.sleep(self.latency)
+        input_tokens, output_tokens = _count_tokens(prompt), _count_tokens(content)
+        return AIMessage(
+            content=content,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        schema_name: Optional[str] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, schema_name))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager=None,
+        schema_name: Optional[str] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        message = self._respond(messages, schema_name)
+        words = re.findall(r"\S+\s*", message.content)
+        for i, word in enumerate(words):
+            usage = message.usage_metadata if i == len(words) - 1 else None
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word, usage_metadata=usage))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+class FakeEmbeddings(Embeddings):
+    """Hashed bag-of-words embeddings with an injected latency per request."""
+
+    def __init__(self, latency: float = 0.0, dimensions: int = 64, **kwargs: Any):
+        self.latency = latency
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.md5(word.encode("utf-8")).digest()
+            vector[digest[0] % self.dimensions] += 1.0 if digest[1] % 2 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+class FakeEncoding:
+    """Offline tokenizer standing in for tiktoken encodings."""
+
+    _pattern = re.compile(r"\s*\w{1,4}|\s*[^\w\s]{1,4}|\s+")
+
+    def encode(self, text: str, **kwargs: Any) -> List[str]:
+        return self._pattern.findall(text)
+
+    def decode(self, tokens: List[str]) -> str:
+        return "".join(tokens)
+
+class FakeSearchTool:
+    """Web search tool returning canned results after an injected latency."""
+
+    def __init__(self, latency: float = 0.0, k: int = 3, faults: Optional[FaultInjector] = None, **kwargs: Any):
+        self.latency = latency
+        self.k = k
+        self.faults = faults
+
+    def invoke(self, tool_input: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if self.faults is not None:
+            self.faults()
+        time.sleep(self.latency)
+        query = tool_input["query"]
+        return [
+            {
+                "url": f"https://example.com/result-{i}",
+                "title": f"Result {i}",
+                "content": f"Search result {i} for {query}: {corpus_text(query + str(i), 2, 40)}",
+            }
+            for i in range(self.k)
+        ]
+
+class FakeWebLoader:
+    """Document loader returning generated documents instead of fetching URLs."""
+
+    def __init__(self, url: str, **kwargs: Any):
+        self.url = url
+
+    def load(self) -> List[Document]:
+        return [Document(page_content=corpus_text(self.url), metadata={"source": self.url})]
+
+@contextmanager
+def fake_providers(
+    llm_latency: float = 0.0,
+    embedding_latency: float = 0.0,
+    search_latency: float = 0.0,
+    responder: Optional[ScriptedResponder] = None,
+    llm_faults: Optional[FaultInjector] = None,
+    search_faults: Optional[FaultInjector] = None,
+) -> Iterator[ScriptedResponder]:
+    """
+    Replace the model, embedding, search, loader and tokenizer providers with local fakes.
+
+    Args:
+        llm_latency: Seconds added to every chat model call
+        embedding_latency: Seconds added to every embedding request
+        search_latency: Seconds added to every web search
+        responder: Script deciding model outputs
+        llm_faults: Errors and hangs injected into chat model calls
+        search_faults: Errors and hangs injected into web searches
+
+    Yields:
+        The responder in use
+    """
+    responder = responder or ScriptedResponder()
+
+    def chat_model(**kwargs: Any) -> FakeChatModel:
+        name = kwargs.get("model") or kwargs.get("model_name") or "fake-model"
+        return FakeChatModel(model=name, latency=llm_latency, responder=responder, faults=llm_faults)
+
+    def embeddings(**kwargs: Any) -> FakeEmbeddings:
+        return FakeEmbeddings(latency=embedding_latency)
+
+    def search_tool(**kwargs: Any) -> FakeSearchTool:
+        return FakeSearchTool(latency=search_latency, faults=search_faults, **kwargs)
+
+    targets = {
+        "src.components.routers.ChatOpenAI": chat_model,
+        "src.components.graders.ChatOpenAI": chat_model,
+        "src.components.generators.ChatOpenAI": chat_model,
+        "src.components.transformers.ChatOpenAI": chat_model,
+        "src.components.retrievers.OpenAIEmbeddings": embeddings,
+        "src.utils.document_loader.OpenAIEmbeddings": embeddings,
+        "src.utils.mmap_index.OpenAIEmbeddings": embeddings,
+        "src.utils.document_loader.WebBaseLoader": FakeWebLoader,
+        "src.components.searchers.TavilySearchResults": search_tool,
+        "src.components.searchers._TavilySearchAPIWrapper": lambda **kwargs: None,
+        "src.app.setup_required_env_vars": lambda: None,
+        # tiktoken downloads its vocabularies on first use
+        "tiktoken.get_encoding": lambda *args, **kwargs: FakeEncoding(),
+        "tiktoken.encoding_for_model": lambda *args, **kwargs: FakeEncoding(),
+    }
+    with ExitStack() as stack:
+        for target, replacement in targets.items():
+            stack.enter_context(patch(target, new=replacement))
+        # Use the built-in prompt instead of pulling one from the hub
+        stack.enter_context(
+            patch("src.components.generators.hub.pull", side_effect=RuntimeError("offline"))
+        )
+        yield responder
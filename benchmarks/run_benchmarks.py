@@ -0,0 +1,207 @@
+"""Offline end-to-end benchmarks for the Adaptive RAG workflow."""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Add the parent directory to the path to import the package
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.fakes import MISS_MARKER, RETRY_MARKER, WEB_MARKER, fake_providers
+from src.app import AdaptiveRAG
+from src.config import Config, DEFAULT_VECTORSTORE_SETTINGS
+
+# Scenario name -> question template exercising one path through the graph
+SCENARIOS = {
+    "vectorstore_hit": "How do agents use memory?",
+    "transform_loop": f"{MISS_MARKER} How do agents decompose tasks?",
+    "web_route": f"{WEB_MARKER} What happened in the news today?",
+    "hallucination_retry": f"{RETRY_MARKER} How do agents use tools?",
+}
+
+BENCHMARK_URLS = [
+    "https://example.com/agents",
+    "https://example.com/prompting",
+    "https://example.com/attacks",
+]
+
+def percentile(values: List[float], q: float) -> float:
+    """Return the q-th percentile of values, or 0.0 when there are none."""
+    return float(np.percentile(values, q)) if values else 0.0
+
+def run_scenario(
+    name: str,
+    num_queries: int = 20,
+    concurrency: int = 1,
+    track_memory: bool = True,
+    config_overrides: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Run one scenario against a fresh system and measure it.
+
+    Must be called inside fake_providers().
+
+    Args:
+        name: Scenario name, a key of SCENARIOS
+        num_queries: Number of measured queries
+        concurrency: Number of queries in flight at once
+        track_memory: Whether to measure peak Python memory with tracemalloc
+        config_overrides: Extra keyword arguments for Config
+
+    Returns:
+        Throughput, latency percentiles, LLM calls and generations per query,
+        the share of queries that searched the web and peak memory
+    """
+    config = Config(
+        vectorstore_settings={
+            **DEFAULT_VECTORSTORE_SETTINGS,
+            "collection_name": f"benchmark-{name}-{uuid.uuid4().hex[:8]}",
+        },
+        document_urls=BENCHMARK_URLS,
+        enable_tracing=False,
+        **(config_overrides or {}),
+    )
+    rag = AdaptiveRAG(config=config)
+    template = SCENARIOS[name]
+
+    # Warm up lazily built chains outside the measurement
+    rag.query(f"{template} #warmup")
+
+    def timed_query(index: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        result = rag.query(f"{template} #{index}")
+        return {
+            "seconds": time.perf_counter() - started,
+            "llm_calls": result.metadata.get("budget", {}).get("llm_calls", 0),
+            "nodes": [
+                stage["name"] for stage in (result.metadata.get("metrics") or {}).get("stages", [])
+                if stage["kind"] == "node"
+            ],
+        }
+
+    if track_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(timed_query, range(num_queries)))
+    wall = time.perf_counter() - started
+    peak_memory = None
+    if track_memory:
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    rag.close()
+
+    latencies = [sample["seconds"] for sample in samples]
+    llm_calls = [sample["llm_calls"] for sample in samples]
+    return {
+        "scenario": name,
+        "queries": num_queries,
+        "concurrency": concurrency,
+        "qps": round(num_queries / wall, 3) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "llm_calls_per_query": round(sum(llm_calls) / len(llm_calls), 2) if llm_calls else 0.0,
+        "peak_memory_mb": round(peak_memory / 2 ** 20, 2) if peak_memory is not None else None,
+        "web_search_share": round(
+            sum("web_search" in sample["nodes"] for sample in samples) / len(samples), 2
+        ) if samples else 0.0,
+        "generations_per_query": round(
+            sum(sample["nodes"].count("generate") for sample in samples) / len(samples), 2
+        ) if samples else 0.0,
+    }
+
+def run_benchmarks(
+    scenarios: Optional[List[str]] = None,
+    num_queries: int = 20,
+    concurrency: int = 1,
+    llm_latency: float = 0.02,
+    embedding_latency: float = 0.005,
+    search_latency: float = 0.05,
+    track_memory: bool = True,
+    config_overrides: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run benchmark scenarios with fake providers.
+
+    Args:
+        scenarios: Scenario names, or None for all of them
+        num_queries: Number of measured queries per scenario
+        concurrency: Number of queries in flight at once
+        llm_latency: Seconds added to every chat model call
+        embedding_latency: Seconds added to every embedding request
+        search_latency: Seconds added to every web search
+        track_memory: Whether to measure peak Python memory
+        config_overrides: Extra keyword arguments for Config
+
+    Returns:
+        One result dictionary per scenario
+    """
+    # The fakes make no network calls, but the clients are still constructed
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    os.environ.setdefault("TAVILY_API_KEY", "benchmark")
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+
+    results = []
+    with fake_providers(llm_latency, embedding_latency, search_latency):
+        for name in scenarios or list(SCENARIOS):
+            results.append(run_scenario(
+                name,
+                num_queries=num_queries,
+                concurrency=concurrency,
+                track_memory=track_memory,
+                config_overrides=config_overrides,
+            ))
+    return results
+
+def format_table(results: List[Dict[str, Any]]) -> str:
+    """Format benchmark results as a text table."""
+    columns = [
+        "scenario", "qps", "p50_ms", "p95_ms", "p99_ms",
+        "llm_calls_per_query", "generations_per_query", "peak_memory_mb",
+    ]
+    rows = [[str(result[column]) for column in columns] for result in results]
+    widths = [max(len(column), *(len(row[i]) for row in rows)) for i, column in enumerate(columns)]
+    lines = ["  ".join(column.ljust(width) for column, width in zip(columns, widths))]
+    lines.extend("  ".join(cell.ljust(width) for cell, width in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
+
+def main():
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmarks for Adaptive RAG")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), help="Scenarios to run (default: all)")
+    parser.add_argument("--queries", type=int, default=20, help="Measured queries per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="Queries in flight at once")
+    parser.add_argument("--llm-latency", type=float, default=0.02, help="Seconds per chat model call")
+    parser.add_argument("--embedding-latency", type=float, default=0.005, help="Seconds per embedding request")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Seconds per web search")
+    parser.add_argument("--no-memory", action="store_true", help="Skip peak memory tracking")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    # Keep per-decision workflow logging out of the report
+    logging.getLogger("src").setLevel(logging.WARNING)
+
+    results = run_benchmarks(
+        scenarios=args.scenarios,
+        num_queries=args.queries,
+        concurrency=args.concurrency,
+        llm_latency=args.llm_latency,
+        embedding_latency=args.embedding_latency,
+        search_latency=args.search_latency,
+        track_memory=not args.no_memory,
+    )
+    print(json.dumps(results, indent=2) if args.json else format_table(results))
+
+if __name__ == "__main__":
+    main()
@@ -21,6 +21,7 @@ setup(
         "tavily-python>=0.2.8",
         "chromadb>=0.4.18",
         "typing-extensions>=4.8.0",
+        "numpy>=1.24.0",
     ],
     extras_require={
         "dev": [
@@ -1,17 +1,30 @@
 """Main application for Adaptive RAG."""
 
-from typing import List, Dict, Any, Optional
+from concurrent.futures import Future
+from typing import List, Dict, Any, AsyncIterator, Callable, Iterator, Optional, Union
+import asyncio
 import logging
+import threading
 
 from .utils.env_setup import setup_required_env_vars
 from .config import Config
-from .utils.document_loader import load_and_index_urls
-from .components.retrievers import VectorStoreRetriever
+from .utils.document_loader import load_and_index_urls, load_documents_from_urls, split_documents
+from .components.retrievers import VectorStoreRetriever, ShardedVectorStoreRetriever, MemoryMappedRetriever
 from .components.searchers import WebSearcher
 from .components.generators import RAGGenerator
-from .components.transformers import QueryTransformer
+from .components.transformers import QueryTransformer, HypotheticalDocumentGenerator
 from .components.graders import DocumentGrader, HallucinationGrader, AnswerGrader
 from .components.routers import QueryRouter
+from .components.cascade import model_tiers
+from .utils.context_packer import ContextPacker
+from .utils.cache import normalize_query
+from .utils.clients import ClientRegistry
+from .utils.coalescing import SingleFlight
+from .utils.rate_limit import request_priority, shared_rate_limiter
+from .utils.resilience import ResilienceRegistry
+from .utils.metrics import QueryMetrics
+from .utils.profiling import QueryProfiler
+from .utils.tracing import Tracer
 from .workflow.nodes import WorkflowNodes
 from .workflow.edges import WorkflowEdges
 from .workflow.graph import AdaptiveRAGWorkflow
@@ -45,53 +58,159 @@ class AdaptiveRAG:
         # Initialize system
         self._initialize_system()
     
-    def _initialize_system(self):
-        """Initialize all components of the system."""
+    def _create_retriever(self) -> VectorStoreRetriever:
+        """Create the retriever and index the configured documents."""
+        vectorstore_settings = self.config.vectorstore_settings
+        retrieval_settings = self.config.retrieval_settings
+        num_shards = vectorstore_settings["num_shards"]
+        
+        retriever_kwargs = {
+            "cache_size": retrieval_settings["cache_size"],
+            "adaptive_k": retrieval_settings["adaptive_k"],
+            "k_min": retrieval_settings["k_min"],
+            "k_max": retrieval_settings["k_max"],
+            "score_threshold": retrieval_settings["score_threshold"],
+            "max_score_gap": retrieval_settings["max_score_gap"],
+            "client_registry": self.client_registry,
+        }
+        
+        # Serving workers map the index a builder process published; nothing is crawled here
+        shared_index_dir = vectorstore_settings["shared_index_dir"]
+        if shared_index_dir:
+            return MemoryMappedRetriever(
+                index_dir=shared_index_dir,
+                check_interval=vectorstore_settings["index_check_interval"],
+                **retriever_kwargs,
+            )
+        
+        if num_shards > 1:
+            retriever = ShardedVectorStoreRetriever(
+                collection_name=vectorstore_settings["collection_name"],
+                num_shards=num_shards,
+                shard_key=vectorstore_settings["shard_key"],
+                **retriever_kwargs,
+            )
+            try:
+                documents = split_documents(
+                    load_documents_from_urls(self.config.document_urls),
+                    chunk_size=vectorstore_settings["chunk_size"],
+                    chunk_overlap=vectorstore_settings["chunk_overlap"],
+                )
+                retriever.add_documents(documents)
+            except Exception as e:
+                logging.error(f"Error indexing sharded vectorstore: {e}")
+            return retriever
+        
         # Create vectorstore
         try:
             vectorstore = load_and_index_urls(
                 urls=self.config.document_urls,
-                collection_name=self.config.vectorstore_settings["collection_name"],
-                chunk_size=self.config.vectorstore_settings["chunk_size"],
-                chunk_overlap=self.config.vectorstore_settings["chunk_overlap"],
+                collection_name=vectorstore_settings["collection_name"],
+                chunk_size=vectorstore_settings["chunk_size"],
+                chunk_overlap=vectorstore_settings["chunk_overlap"],
+                client_registry=self.client_registry,
             )
         except Exception as e:
             logging.error(f"Error creating vectorstore: {e}")
             vectorstore = None
         
-        # Initialize components
-        self.retriever = VectorStoreRetriever(
+        return VectorStoreRetriever(
             vectorstore=vectorstore,
-            collection_name=self.config.vectorstore_settings["collection_name"],
+            collection_name=vectorstore_settings["collection_name"],
+            **retriever_kwargs,
         )
+    
+    def _initialize_system(self):
+        """Initialize all components of the system."""
+        # One pooled HTTP client per provider and model, shared by all components
+        rate_limit_settings = dict(self.config.rate_limit_settings)
+        self.rate_limiter = shared_rate_limiter(**rate_limit_settings) if rate_limit_settings.pop("enabled") else None
+        client_settings = dict(self.config.client_settings)
         
-        self.web_searcher = WebSearcher(
-            num_results=self.config.web_search_settings["num_results"],
-        )
+        # Deadlines, hedging and circuit breakers for model and web search calls
+        resilience_settings = dict(self.config.resilience_settings)
+        self.resilience = None
+        if resilience_settings.pop("enabled"):
+            self.resilience = ResilienceRegistry(
+                services={service: resilience_settings[service] for service in ("llm", "web_search")},
+                max_workers=resilience_settings["max_workers"],
+            )
+            # A request abandoned at its deadline would otherwise hold a worker until the read timeout
+            llm_timeout = resilience_settings["llm"].get("timeout")
+            if llm_timeout is not None:
+                client_settings["read_timeout"] = min(client_settings["read_timeout"], llm_timeout)
+        
+        self.client_registry = ClientRegistry(**client_settings, rate_limiter=self.rate_limiter)
+        
+        # Create retriever; indexing yields to interactive queries
+        with request_priority("bulk"):
+            self.retriever = self._create_retriever()
+        
+        self.web_searcher = WebSearcher(**self.config.web_search_settings, resilience=self.resilience)
         
         self.generator = RAGGenerator(
             model_name=self.config.models["generator"],
+            client_registry=self.client_registry,
+            resilience=self.resilience,
+            context_packer=self._create_context_packer(self.config.models["generator"]),
         )
         
         self.query_transformer = QueryTransformer(
             model_name=self.config.models["rewriter"],
+            client_registry=self.client_registry,
+            resilience=self.resilience,
         )
         
+        # Only build the HyDE generator when it is actually used
+        self.hypothetical_document_generator = None
+        if self.config.retrieval_settings["mode"] == "hyde":
+            self.hypothetical_document_generator = HypotheticalDocumentGenerator(
+                model_name=self.config.models["rewriter"],
+                client_registry=self.client_registry,
+                resilience=self.resilience,
+            )
+        
+        grading_settings = self.config.grading_settings
+        prefilter = grading_settings["prefilter"]
         self.document_grader = DocumentGrader(
             model_name=self.config.models["grader"],
+            client_registry=self.client_registry,
+            resilience=self.resilience,
+            embeddings=self.retriever.embeddings if prefilter else None,
+            retriever=self.retriever if prefilter else None,
+            accept_threshold=grading_settings["accept_threshold"] if prefilter else None,
+            reject_threshold=grading_settings["reject_threshold"] if prefilter else None,
+            min_confidence=grading_settings["escalation_confidence"],
         )
         
+        scoped = grading_settings["scoped_hallucination"]
         self.hallucination_grader = HallucinationGrader(
             model_name=self.config.models["grader"],
+            client_registry=self.client_registry,
+            resilience=self.resilience,
+            context_packer=self._create_context_packer(self.config.models["grader"]),
+            embeddings=self.retriever.embeddings if scoped else None,
+            evidence_per_sentence=grading_settings["evidence_per_sentence"],
+            min_confidence=grading_settings["escalation_confidence"],
         )
         
         self.answer_grader = AnswerGrader(
             model_name=self.config.models["grader"],
+            client_registry=self.client_registry,
+            resilience=self.resilience,
+            min_confidence=grading_settings["escalation_confidence"],
         )
         
+        routing_settings = self.config.routing_settings
         self.query_router = QueryRouter(
             model_name=self.config.models["router"],
+            client_registry=self.client_registry,
+            resilience=self.resilience,
+            embeddings=self.retriever.embeddings,
+            mode=routing_settings["mode"],
+            margin=routing_settings["margin"],
         )
+        self._fit_router()
         
         # Create workflow nodes and edges
         self.nodes = WorkflowNodes(
@@ -102,63 +221,290 @@ class AdaptiveRAG:
             document_grader=self.document_grader,
             hallucination_grader=self.hallucination_grader,
             answer_grader=self.answer_grader,
+            retrieval_mode=self.config.retrieval_settings["mode"],
+            num_queries=self.config.retrieval_settings["num_queries"],
+            max_documents=self.config.retrieval_settings["max_documents"],
+            hypothetical_document_generator=self.hypothetical_document_generator,
         )
         
         self.edges = WorkflowEdges(
             query_router=self.query_router,
             hallucination_grader=self.hallucination_grader,
             answer_grader=self.answer_grader,
+            web_searcher=self.web_searcher,
+            dual_path_threshold=(
+                routing_settings["dual_path_threshold"] if self.config.workflow_settings["dual_path"] else None
+            ),
         )
         
+        self.profiler = QueryProfiler(**self.config.profiling_settings)
+        
+        # Identical questions asked at the same time share one workflow run
+        self.coalescer = SingleFlight() if self.config.workflow_settings["coalesce_queries"] else None
+        
+        trace_settings = dict(self.config.trace_settings)
+        self.tracer = Tracer(**trace_settings) if trace_settings.pop("enabled") else None
+        
         # Create workflow
         self.workflow = AdaptiveRAGWorkflow(
             nodes=self.nodes,
             edges=self.edges,
             debug=True,
+            optimistic=self.config.workflow_settings["optimistic"],
+            dual_path=self.config.workflow_settings["dual_path"],
+            budget_settings=self.config.budget_settings,
+            tracer=self.tracer,
         )
     
-    def query(self, question: str) -> RAGResult:
+    def _create_context_packer(self, model_name: Union[str, List[str]]) -> Optional[ContextPacker]:
+        """Create a context packer for a model or cascade if packing is enabled."""
+        if not self.config.context_settings["enabled"]:
+            return None
+        
+        return ContextPacker(
+            max_tokens=self.config.context_budget(model_name),
+            model_name=model_tiers(model_name)[0],
+            near_duplicate_threshold=self.config.context_settings["near_duplicate_threshold"],
+        )
+    
+    def cascade_stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        Get per-tier hit rates and latencies of the model cascades.
+        
+        Returns:
+            Statistics for each model tier, keyed by component
+        """
+        hallucination_chain = (
+            self.hallucination_grader.sentence_chain
+            if self.hallucination_grader.embeddings is not None
+            else self.hallucination_grader.grader_chain
+        )
+        return {
+            "router": self.query_router.router_chain.stats(),
+            "document_grader": self.document_grader.grader_chain.stats(),
+            "hallucination_grader": hallucination_chain.stats(),
+            "answer_grader": self.answer_grader.grader_chain.stats(),
+            "generator": self.generator.generation_chain.stats(),
+            "rewriter": self.query_transformer.transform_chain.stats(),
+        }
+    
+    def _fit_router(self):
+        """Compute routing centroids from the configured example questions."""
+        if self.query_router.mode != "centroid":
+            return
+        
+        try:
+            self.query_router.fit_centroids(self.config.routing_settings["example_questions"])
+        except Exception as e:
+            logging.error(f"Error computing routing centroids: {e}")
+    
+    def query(self, question: str, profile: Optional[bool] = None) -> RAGResult:
         """
         Process a query through the RAG system.
         
+        Concurrent queries for the same normalized question share one run,
+        unless coalescing is disabled or the query is to be profiled.
+        
         Args:
             question: User question
+            profile: True to profile this query, False to never profile it, or
+                None to profile at the configured sample rate
             
         Returns:
-            RAG result with answer and metadata
+            RAG result with answer and metadata; metadata["coalesced"] is True
+            when the result was shared from another caller's run
+        """
+        if self.coalescer is None or profile:
+            return self._query(question, profile)
+        result, shared = self.coalescer.do(normalize_query(question), self._query, question, profile)
+        return self._shared_result(question, result) if shared else result
+    
+    def _query(self, question: str, profile: Optional[bool] = None) -> RAGResult:
+        """Run a query through the workflow, profiling it if requested or sampled."""
+        if not self.profiler.should_profile(profile):
+            # Run the workflow
+            final_state = self.workflow.run(question)
+            return self._build_result(question, final_state)
+        
+        query_metrics = QueryMetrics()
+        with self.profiler.profile(question) as run:
+            run.metrics = query_metrics
+            final_state = self.workflow.run(question, query_metrics=query_metrics)
+        
+        result = self._build_result(question, final_state)
+        result.metadata["profile"] = run.paths
+        return result
+    
+    async def aquery(self, question: str, profile: Optional[bool] = None) -> RAGResult:
         """
-        # Run the workflow
-        final_state = self.workflow.run(question)
+        Process a query without blocking the event loop.
         
+        Args:
+            question: User question
+            profile: True to profile this query, False to never profile it, or
+                None to profile at the configured sample rate
+            
+        Returns:
+            RAG result with answer and metadata, shared between concurrent
+            queries for the same question like query()
+        """
+        if self.coalescer is None or profile:
+            return await self._aquery(question, profile)
+        result, shared = await self.coalescer.ado(normalize_query(question), self._aquery, question, profile)
+        return self._shared_result(question, result) if shared else result
+    
+    async def _aquery(self, question: str, profile: Optional[bool] = None) -> RAGResult:
+        """Run a query through the workflow on the event loop, profiling it if requested or sampled."""
+        if self.profiler.should_profile(profile):
+            # Profiles cover one query from start to end, so run it whole in a thread
+            return await asyncio.to_thread(self._query, question, True)
+        
+        final_state = await self.workflow.arun(question)
+        return self._build_result(question, final_state)
+    
+    def _shared_result(self, question: str, result: RAGResult) -> RAGResult:
+        """Copy a result shared from another caller's run, so callers cannot affect each other."""
+        shared = result.model_copy(deep=True)
+        shared.question = question
+        shared.metadata["original_question"] = question
+        shared.metadata["coalesced"] = True
+        return shared
+    
+    def _build_result(self, question: str, final_state: Dict[str, Any]) -> RAGResult:
+        """Create a RAG result from the final workflow state."""
         # Extract results
         answer = final_state.get("generation", "No answer generated")
         documents = final_state.get("documents", [])
+        retriever_name = documents[0].metadata.get("retriever") if documents else None
+        
+        budget = final_state.get("budget")
+        metrics = final_state.get("metrics")
         
         # Create result object
         result = RAGResult(
             question=question,
             answer=answer,
             documents=documents,
-            routing_decision="vectorstore" if isinstance(documents[0].metadata.get("retriever"), str) and "vector" in documents[0].metadata.get("retriever", "").lower() else "web_search",
+            routing_decision="vectorstore" if isinstance(retriever_name, str) and "vector" in retriever_name.lower() else "web_search",
             metadata={
                 "final_question": final_state.get("question"),
                 "original_question": question,
+                "graded": final_state.get("generation_graded", True),
+                "budget": budget.summary() if budget is not None else None,
+                "metrics": metrics.summary() if metrics is not None else None,
             }
         )
         
         return result
     
-    def stream_query(self, question: str):
+    def stream_query(self, question: str, profile: Optional[bool] = None):
         """
         Stream the processing of a query through the RAG system.
         
         Args:
             question: User question
+            profile: True to profile this query, False to never profile it, or
+                None to profile at the configured sample rate
             
         Yields:
             Intermediate states of the workflow
         """
-        return self.workflow.stream(question)
+        if not self.profiler.should_profile(profile):
+            return self.workflow.stream(question)
+        return self._profiled_stream(question)
+    
+    def _profiled_stream(self, question: str):
+        """Stream a query inside the profiler; the profile covers the consumer's time too."""
+        query_metrics = QueryMetrics()
+        with self.profiler.profile(question) as run:
+            run.metrics = query_metrics
+            yield from self.workflow.stream(question, query_metrics=query_metrics)
+    
+    def stream_answer(self, question: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream workflow progress and answer tokens as they are generated.
+        
+        Args:
+            question: User question
+            
+        Yields:
+            Event dictionaries with a "type" key: "node", "generation_start",
+            "token", and finally "result" with the RAGResult in "result"
+        """
+        for event in self.workflow.stream_events(question):
+            if event["type"] == "end":
+                yield {"type": "result", "result": self._build_result(question, event["state"])}
+            else:
+                yield event
+    
+    async def astream_answer(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the events of stream_answer without blocking the event loop.
+        
+        Args:
+            question: User question
+            
+        Yields:
+            The same event dictionaries as stream_answer
+        """
+        async for event in self.workflow.astream_events(question):
+            if event["type"] == "end":
+                yield {"type": "result", "result": self._build_result(question, event["state"])}
+            else:
+                yield event
+    
+    def query_optimistic(
+        self,
+        question: str,
+        on_correction: Optional[Callable[[RAGResult], None]] = None,
+    ) -> RAGResult:
+        """
+        Return the first generated answer without waiting for it to be graded.
+        
+        Grading continues in the background. If the answer fails grading, the
+        workflow retries and on_correction is called with the final result.
+        Requires workflow_settings["optimistic"].
+        
+        Args:
+            question: User question
+            on_correction: Optional callback for a corrected final result
+            
+        Returns:
+            Provisional RAG result, marked with metadata["provisional"]
+        """
+        if not self.workflow.optimistic:
+            raise ValueError("query_optimistic requires workflow_settings['optimistic']")
+        
+        first_result: Future = Future()
+        
+        def run():
+            state: Dict[str, Any] = {}
+            provisional = None
+            retracted = False
+            try:
+                for event in self.workflow.stream_events(question):
+                    if event["type"] == "node":
+                        state.update(event["state"])
+                    elif event["type"] == "answer" and provisional is None:
+                        provisional = self._build_result(question, state)
+                        provisional.metadata["provisional"] = True
+                        first_result.set_result(provisional)
+                    elif event["type"] == "retraction":
+                        retracted = True
+                    elif event["type"] == "end":
+                        final = self._build_result(question, event["state"])
+                        if provisional is None:
+                            first_result.set_result(final)
+                        elif retracted and on_correction:
+                            on_correction(final)
+            except Exception as e:
+                if not first_result.done():
+                    first_result.set_exception(e)
+                else:
+                    logging.error(f"Error while grading optimistic answer: {e}")
+        
+        threading.Thread(target=run, daemon=True).start()
+        return first_result.result()
     
     def add_documents(self, documents=None, urls=None):
         """
@@ -169,7 +515,6 @@ class AdaptiveRAG:
             urls: List of URLs to load and add
         """
         if urls:
-            from .utils.document_loader import load_documents_from_urls, split_documents
             documents = load_documents_from_urls(urls)
             documents = split_documents(
                 documents,
@@ -178,4 +523,35 @@ class AdaptiveRAG:
             )
         
         if documents:
-            self.retriever.add_documents(documents)
\ No newline at end of file
+            # Indexing yields to interactive queries
+            with request_priority("bulk"):
+                self.retriever.add_documents(documents)
+    
+    def rate_limit_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-model request counts, waiting time and provider throttling.
+        
+        Returns:
+            Statistics for each model, empty when rate limiting is disabled
+        """
+        return self.rate_limiter.stats() if self.rate_limiter is not None else {}
+    
+    def resilience_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-service call outcomes, timeouts, hedges and circuit states.
+        
+        Returns:
+            Statistics for each model and web search, empty when resilience
+            policies are disabled
+        """
+        return self.resilience.stats() if self.resilience is not None else {}
+    
+    def close(self):
+        """Close the retriever and shared HTTP clients and write any queued traces."""
+        self.retriever.close()
+        self.client_registry.close()
+        self.web_searcher.close()
+        if self.resilience is not None:
+            self.resilience.close()
+        if self.tracer is not None:
+            self.tracer.close()
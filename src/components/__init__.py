@@ -1,14 +1,17 @@
 """Components package for Adaptive RAG."""
 
-from .retrievers import VectorStoreRetriever, HybridRetriever
+from .retrievers import VectorStoreRetriever, ShardedVectorStoreRetriever, MemoryMappedRetriever, HybridRetriever
 from .routers import QueryRouter
 from .graders import DocumentGrader, HallucinationGrader, AnswerGrader
 from .generators import RAGGenerator
 from .transformers import QueryTransformer, HypotheticalDocumentGenerator
 from .searchers import WebSearcher
+from .cascade import ModelCascade
 
 __all__ = [
     "VectorStoreRetriever",
+    "ShardedVectorStoreRetriever",
+    "MemoryMappedRetriever",
     "HybridRetriever",
     "QueryRouter",
     "DocumentGrader",
@@ -18,4 +21,5 @@ __all__ = [
     "QueryTransformer",
     "HypotheticalDocumentGenerator",
     "WebSearcher",
+    "ModelCascade",
 ]
\ No newline at end of file
@@ -0,0 +1,161 @@
+"""Model cascades for Adaptive RAG."""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from langchain_core.runnables import Runnable
+
+from ..utils.resilience import ResiliencePolicy, ResilienceRegistry, attempt_tags
+
+logger = logging.getLogger(__name__)
+
+def model_tiers(model_name: Union[str, Sequence[str]]) -> List[str]:
+    """
+    Normalize a model configuration to a list of tiers.
+
+    Args:
+        model_name: A model name, or model names ordered from cheapest to strongest
+
+    Returns:
+        Model names ordered from cheapest to strongest
+    """
+    if isinstance(model_name, str):
+        return [model_name]
+    tiers = list(model_name)
+    if not tiers:
+        raise ValueError("A model cascade needs at least one model")
+    return tiers
+
+def binary_score_accepted(result: Any, min_confidence: float = 0.0) -> bool:
+    """
+    Accept a binary grade only if it is a clear 'yes' or 'no' given with enough confidence.
+
+    Args:
+        result: Structured grade with a binary_score and optionally a confidence
+        min_confidence: Confidence below which the grade is escalated
+
+    Returns:
+        True if the grade can be used without asking a stronger model
+    """
+    if str(result.binary_score).strip().lower() not in ("yes", "no"):
+        return False
+    return getattr(result, "confidence", 1.0) >= min_confidence
+
+class ModelCascade:
+    """Runs a chain on a cheap model first and escalates to stronger models."""
+
+    def __init__(
+        self,
+        chains: List[Tuple[str, Runnable]],
+        accept: Optional[Callable[[Any], bool]] = None,
+        resilience: Optional[ResilienceRegistry] = None,
+    ):
+        """
+        Initialize the cascade.
+
+        Args:
+            chains: (model name, chain) pairs ordered from cheapest to strongest
+            accept: Optional check on a result; results it rejects (for example
+                low-confidence or unexpected labels) are escalated to the next tier
+            resilience: Optional registry of per-model deadlines, hedging and
+                circuit breakers; a timed-out or unavailable model escalates too
+        """
+        if not chains:
+            raise ValueError("A model cascade needs at least one chain")
+
+        self.chains = chains
+        self.accept = accept
+        self.resilience = resilience
+
+        # Per-tier counters and total latency
+        self._stats: Dict[str, Dict[str, float]] = {
+            name: {"calls": 0, "accepted": 0, "escalated": 0, "errors": 0, "latency": 0.0}
+            for name, _ in chains
+        }
+        self._stats_lock = threading.Lock()
+
+    @property
+    def model_names(self) -> List[str]:
+        """Model names ordered from cheapest to strongest."""
+        return [name for name, _ in self.chains]
+
+    def _record(self, name: str, outcome: str, latency: float) -> None:
+        """Record the outcome and latency of one call to a tier."""
+        with self._stats_lock:
+            stats = self._stats[name]
+            stats["calls"] += 1
+            stats[outcome] += 1
+            stats["latency"] += latency
+
+    def _policy(self, name: str) -> Optional[ResiliencePolicy]:
+        """Get the resilience policy for a model, if one is configured."""
+        return self.resilience.policy("llm", name) if self.resilience is not None else None
+
+    @staticmethod
+    def _invoke_attempt(chain: Runnable, inputs: Dict[str, Any]) -> Any:
+        """Invoke a chain, tagging its runs with the resilience attempt they belong to."""
+        return chain.invoke(inputs, config={"tags": attempt_tags()})
+
+    def _tier(self, tier: int) -> int:
+        """Clamp a tier index to the available tiers."""
+        return max(0, min(tier, len(self.chains) - 1))
+
+    def invoke(self, inputs: Dict[str, Any], tier: int = 0) -> Any:
+        """
+        Invoke the cascade.
+
+        Starting at the given tier, each model is tried in turn. A tier's
+        result is returned unless the call fails (for example malformed
+        structured output) or the accept check rejects it, in which case the
+        next tier is tried. The strongest tier's result is always returned.
+
+        Args:
+            inputs: Chain inputs
+            tier: Index of the first tier to try
+
+        Returns:
+            Result of the first accepted tier
+        """
+        start = self._tier(tier)
+        last = len(self.chains) - 1
+
+        for index in range(start, last + 1):
+            name, chain = self.chains[index]
+            policy = self._policy(name)
+            started = time.perf_counter()
+            try:
+                result = policy.call(self._invoke_attempt, chain, inputs) if policy is not None else chain.invoke(inputs)
+            except Exception as e:
+                self._record(name, "errors", time.perf_counter() - started)
+                if index == last:
+                    raise
+                logger.info(f"Model {name} failed ({e}), escalating")
+                continue
+
+            latency = time.perf_counter() - started
+            if index < last and self.accept is not None and not self.accept(result):
+                self._record(name, "escalated", latency)
+                logger.info(f"Model {name} result not accepted, escalating")
+                continue
+
+            self._record(name, "accepted", latency)
+            return result
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """
+        Return per-tier statistics.
+
+        Returns:
+            For each model: call counts by outcome, hit_rate (share of calls
+            whose result was used) and mean_latency in seconds
+        """
+        with self._stats_lock:
+            stats = {name: dict(values) for name, values in self._stats.items()}
+        for values in stats.values():
+            calls = values["calls"]
+            latency = values.pop("latency")
+            values["hit_rate"] = values["accepted"] / calls if calls else 0.0
+            values["mean_latency"] = latency / calls if calls else 0.0
+        return stats
@@ -1,30 +1,53 @@
 """Generation components for Adaptive RAG."""
 
-from typing import List, Optional
+from typing import List, Optional, Sequence, Union
 from langchain import hub
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 from langchain.schema import Document
 
+from ..utils.context_packer import ContextPacker
+from ..utils.clients import ClientRegistry, openai_client_kwargs
+from ..utils.resilience import ResilienceRegistry
+from .cascade import ModelCascade, model_tiers
+
+# Tag attached to generation LLM runs so streamed answer tokens can be told
+# apart from grader and router calls.
+GENERATION_TAG = "rag_generation"
+
 class RAGGenerator:
     """Component for generating responses from retrieved documents."""
     
     def __init__(
         self, 
-        model_name: str = "gpt-4o-mini",
+        model_name: Union[str, Sequence[str]] = "gpt-4o-mini",
         temperature: float = 0,
         prompt_template: Optional[str] = None,
+        context_packer: Optional[ContextPacker] = None,
+        client_registry: Optional[ClientRegistry] = None,
+        resilience: Optional[ResilienceRegistry] = None,
     ):
         """
         Initialize RAG generator.
         
         Args:
-            model_name: Name of the LLM model to use
+            model_name: Name of the LLM model to use, or names ordered from
+                cheapest to strongest; retries escalate to the next model
             temperature: Temperature for generation
             prompt_template: Optional custom prompt template
+            context_packer: Optional packer that bounds the context by tokens
+            client_registry: Optional registry of shared HTTP clients
+            resilience: Optional registry of deadlines, hedging and circuit breakers for model calls
         """
-        self.llm = ChatOpenAI(model_name=model_name, temperature=temperature)
+        self.context_packer = context_packer
+        self.model_names = model_tiers(model_name)
+        self.llms = [
+            ChatOpenAI(model_name=name, temperature=temperature, **openai_client_kwargs(client_registry, name))
+            for name in self.model_names
+        ]
+        self.llm = self.llms[0]
+        self.resilience = resilience
         
         # Use provided prompt or pull from LangChain hub
         if prompt_template:
@@ -47,20 +70,45 @@ class RAGGenerator:
                 """
                 self.prompt = ChatPromptTemplate.from_template(default_template)
         
-        # Create the generation chain
-        self.generation_chain = self.prompt | self.llm | StrOutputParser()
+        # Create the generation chain for each model tier
+        self.generation_chain = ModelCascade([
+            (name, (self.prompt | llm | StrOutputParser()).with_config(tags=[GENERATION_TAG]))
+            for name, llm in zip(self.model_names, self.llms)
+        ], resilience=self.resilience)
+        
+    def _revise_question(self, question: str, unsupported: Optional[List[str]]) -> str:
+        """Ask the model to avoid statements a previous answer could not support."""
+        if not unsupported:
+            return question
+        statements = "\n".join(f"- {sentence}" for sentence in unsupported)
+        return (
+            f"{question}\n\nA previous answer made these statements, which the context "
+            f"does not support. Do not repeat them unless the context supports them:\n{statements}"
+        )
         
     def _format_docs(self, docs: List[Document]) -> str:
         """Format a list of documents into a string context."""
+        if self.context_packer:
+            return self.context_packer.pack(docs)
         return "\n\n".join(doc.page_content for doc in docs)
         
-    def generate(self, question: str, documents: List[Document]) -> str:
+    def generate(
+        self,
+        question: str,
+        documents: List[Document],
+        unsupported: Optional[List[str]] = None,
+        tier: int = 0,
+    ) -> str:
         """
         Generate a response based on retrieved documents.
         
         Args:
             question: User question
             documents: Retrieved documents
+            unsupported: Optional sentences of a previous answer that were not
+                supported by the documents, to steer the regeneration
+            tier: Index of the model to start from; retries after a failed
+                grade use a stronger model
             
         Returns:
             Generated response
@@ -71,5 +119,5 @@ class RAGGenerator:
         # Generate response
         return self.generation_chain.invoke({
             "context": context,
-            "question": question
-        })
\ No newline at end of file
+            "question": self._revise_question(question, unsupported)
+        }, tier=tier)
@@ -1,31 +1,173 @@
 """Grading components for Adaptive RAG."""
 
+import functools
+import hashlib
+import logging
+import re
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from langchain.schema import Document
-from typing import List
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
 
-from ..models.data_models import GradeDocuments, GradeHallucinations, GradeAnswer
+from ..models.data_models import GradeDocuments, GradeHallucinations, GradeSentences, GradeAnswer
+from ..utils.cache import LRUCache, normalize_query
+from ..utils.context_packer import ContextPacker
+from ..utils.clients import ClientRegistry, openai_client_kwargs
+from ..utils.resilience import ResilienceRegistry
+from ..utils.tracing import span
+from .cascade import ModelCascade, binary_score_accepted, model_tiers
+from .retrievers import VectorStoreRetriever
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def _content_key(text: str) -> str:
+    """Cache key for the embedding of a passage."""
+    return "d:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def _embed_memoized(
+    embeddings: Embeddings, cache: LRUCache, keys: List[str], texts: List[str]
+) -> np.ndarray:
+    """
+    Embed texts, reusing memoized vectors and batching all misses in one request.
+    
+    Args:
+        embeddings: Embedding model
+        cache: Cache of vectors by key
+        keys: Cache key for each text
+        texts: Texts to embed
+        
+    Returns:
+        Matrix with one embedding row per text
+    """
+    vectors = {key: cache.get(key) for key in keys}
+    missing = [(key, text) for key, text in zip(keys, texts) if vectors[key] is None]
+    if missing:
+        missing = list(dict(missing).items())
+        with span("embed_documents", "embedding", texts=len(missing), cached=len(keys) - len(missing)):
+            embedded = embeddings.embed_documents([text for _, text in missing])
+        for (key, _), vector in zip(missing, embedded):
+            vectors[key] = np.asarray(vector, dtype=np.float32)
+            cache.put(key, vectors[key])
+    return np.stack([vectors[key] for key in keys])
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length."""
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Split a generation into sentences.
+    
+    Args:
+        text: Text to split
+        
+    Returns:
+        Non-empty sentences in order
+    """
+    return [sentence.strip() for sentence in _SENTENCE_BOUNDARY.split(text) if sentence.strip()]
+
+def _grader_cascade(
+    prompt: ChatPromptTemplate,
+    model_names: List[str],
+    llms: List[ChatOpenAI],
+    schema: type,
+    accept: Optional[Callable[[Any], bool]] = binary_score_accepted,
+    resilience: Optional[ResilienceRegistry] = None,
+) -> ModelCascade:
+    """
+    Create a structured-output grading chain for each model tier.
+    
+    Args:
+        prompt: Grader prompt
+        model_names: Model names ordered from cheapest to strongest
+        llms: Chat model for each name
+        schema: Structured output schema
+        accept: Check that escalates unclear grades to the next tier
+        resilience: Optional registry of deadlines, hedging and circuit breakers
+        
+    Returns:
+        Grading cascade
+    """
+    return ModelCascade(
+        [(name, prompt | llm.with_structured_output(schema)) for name, llm in zip(model_names, llms)],
+        accept=accept,
+        resilience=resilience,
+    )
 
 class DocumentGrader:
     """Grades document relevance to a question."""
     
-    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0):
+    def __init__(
+        self,
+        model_name: Union[str, Sequence[str]] = "gpt-4o-mini",
+        temperature: float = 0,
+        embeddings: Optional[Embeddings] = None,
+        accept_threshold: Optional[float] = None,
+        reject_threshold: Optional[float] = None,
+        embedding_cache_size: int = 1024,
+        retriever: Optional[VectorStoreRetriever] = None,
+        min_confidence: float = 0.7,
+        client_registry: Optional[ClientRegistry] = None,
+        resilience: Optional[ResilienceRegistry] = None,
+    ):
         """
         Initialize document grader.
         
         Args:
-            model_name: Name of the LLM model to use
+            model_name: Name of the LLM model to use, or names ordered from
+                cheapest to strongest to run as a cascade
             temperature: Temperature for model generation
+            embeddings: Optional embeddings used to pre-filter documents before LLM grading
+            accept_threshold: Cosine similarity at or above which a document is accepted without the LLM
+            reject_threshold: Cosine similarity at or below which a document is rejected without the LLM.
+                Both depend on the embedding model: text-embedding-ada-002 rarely scores
+                unrelated text below 0.7, so a reject threshold there would never fire
+            embedding_cache_size: Maximum number of memoized embeddings for the pre-filter
+            retriever: Optional retriever whose stored chunk embeddings and query
+                embeddings the pre-filter reuses; only the rest are embedded
+            min_confidence: Confidence below which a cheaper model's grade is
+                escalated to the next model of the cascade
+            client_registry: Optional registry of shared HTTP clients
+            resilience: Optional registry of deadlines, hedging and circuit breakers for model calls
         """
-        self.llm = ChatOpenAI(model=model_name, temperature=temperature)
+        if (
+            accept_threshold is not None
+            and reject_threshold is not None
+            and reject_threshold >= accept_threshold
+        ):
+            raise ValueError("reject_threshold must be lower than accept_threshold")
+        
+        self.embeddings = embeddings
+        self.retriever = retriever
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self._embedding_cache = LRUCache(max_size=embedding_cache_size)
+        
+        # Counters for how each document was decided
+        self.prefilter_stats: Dict[str, int] = {"accepted": 0, "rejected": 0, "llm": 0}
+        self._stats_lock = threading.Lock()
+        
+        self.model_names = model_tiers(model_name)
+        self.llms = [
+            ChatOpenAI(model=name, temperature=temperature, **openai_client_kwargs(client_registry, name))
+            for name in self.model_names
+        ]
+        self.llm = self.llms[0]
+        self.resilience = resilience
+        self.min_confidence = min_confidence
         self.structured_llm = self.llm.with_structured_output(GradeDocuments)
         
         # Define the grader prompt
         system_prompt = """You are a grader assessing relevance of a retrieved document to a user question. 
         If the document contains keyword(s) or semantic meaning related to the user question, grade it as relevant. 
         It does not need to be a stringent test. The goal is to filter out erroneous retrievals. 
-        Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question."""
+        Give a binary score 'yes' or 'no' score to indicate whether the document is relevant to the question.
+        Also give your confidence in the score, from 0 to 1."""
         
         self.prompt = ChatPromptTemplate.from_messages(
             [
@@ -34,8 +176,12 @@ class DocumentGrader:
             ]
         )
         
-        # Create the grading chain
-        self.grader_chain = self.prompt | self.structured_llm
+        # Create the grading chain, escalating unclear or low-confidence grades to stronger models
+        self.grader_chain = _grader_cascade(
+            self.prompt, self.model_names, self.llms, GradeDocuments,
+            accept=functools.partial(binary_score_accepted, min_confidence=self.min_confidence),
+            resilience=self.resilience,
+        )
         
     def grade_document(self, document: Document, question: str) -> bool:
         """
@@ -54,10 +200,57 @@ class DocumentGrader:
         })
         return result.binary_score.lower() == "yes"
     
+    def _similarities(self, documents: List[Document], question: str) -> np.ndarray:
+        """
+        Compute cosine similarity between the question and each document.
+        
+        Vectors the retriever already has (the stored chunk embeddings and
+        the query embedding it searched with) are reused. The rest are
+        memoized by text, and all misses are embedded in one batched request.
+        """
+        vectors: List[Optional[np.ndarray]] = [None] * (len(documents) + 1)
+        if self.retriever is not None:
+            try:
+                vectors[0] = self.retriever.lookup_query_embedding(question)
+                vectors[1:] = self.retriever.lookup_embeddings(documents)
+            except Exception as e:
+                # Embedding everything below still gives the right similarities
+                logger.warning(f"Could not look up stored embeddings: {e}")
+                vectors = [None] * (len(documents) + 1)
+        
+        keys = ["q:" + normalize_query(question)] + [
+            _content_key(doc.page_content) for doc in documents
+        ]
+        texts = [question] + [doc.page_content for doc in documents]
+        missing = [index for index, vector in enumerate(vectors) if vector is None]
+        if missing:
+            embedded = _embed_memoized(
+                self.embeddings,
+                self._embedding_cache,
+                [keys[index] for index in missing],
+                [texts[index] for index in missing],
+            )
+            for index, vector in zip(missing, embedded):
+                vectors[index] = vector
+        
+        vectors = np.asarray(vectors, dtype=np.float32)
+        question_vector, matrix = vectors[0], vectors[1:]
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(question_vector)
+        return (matrix @ question_vector) / np.maximum(norms, 1e-12)
+    
+    def _record(self, path: str) -> None:
+        """Increment the counter for a grading path."""
+        with self._stats_lock:
+            self.prefilter_stats[path] += 1
+    
     def filter_documents(self, documents: List[Document], question: str) -> List[Document]:
         """
         Filter a list of documents based on relevance.
         
+        When embeddings and thresholds are configured, documents that are
+        clearly relevant or clearly irrelevant are decided locally and only
+        the uncertain band is sent to the LLM grader.
+        
         Args:
             documents: List of documents to filter
             question: User question
@@ -65,26 +258,80 @@ class DocumentGrader:
         Returns:
             Filtered list of relevant documents
         """
-        return [doc for doc in documents if self.grade_document(doc, question)]
+        prefilter = self.embeddings is not None and (
+            self.accept_threshold is not None or self.reject_threshold is not None
+        )
+        if not prefilter or not documents:
+            return [doc for doc in documents if self.grade_document(doc, question)]
+        
+        filtered = []
+        for doc, similarity in zip(documents, self._similarities(documents, question)):
+            if self.accept_threshold is not None and similarity >= self.accept_threshold:
+                self._record("accepted")
+                filtered.append(doc)
+            elif self.reject_threshold is not None and similarity <= self.reject_threshold:
+                self._record("rejected")
+            else:
+                self._record("llm")
+                if self.grade_document(doc, question):
+                    filtered.append(doc)
+        return filtered
 
 
 class HallucinationGrader:
     """Grades whether a generation is grounded in the provided documents."""
     
-    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0):
+    def __init__(
+        self,
+        model_name: Union[str, Sequence[str]] = "gpt-4o-mini",
+        temperature: float = 0,
+        context_packer: Optional[ContextPacker] = None,
+        embeddings: Optional[Embeddings] = None,
+        evidence_per_sentence: int = 2,
+        embedding_cache_size: int = 1024,
+        grade_cache_size: int = 128,
+        min_confidence: float = 0.7,
+        client_registry: Optional[ClientRegistry] = None,
+        resilience: Optional[ResilienceRegistry] = None,
+    ):
         """
         Initialize hallucination grader.
         
         Args:
-            model_name: Name of the LLM model to use
+            model_name: Name of the LLM model to use, or names ordered from
+                cheapest to strongest to run as a cascade
             temperature: Temperature for model generation
+            context_packer: Optional packer that bounds the facts by tokens
+            embeddings: Optional embeddings that enable scoped grading, where each
+                sentence is checked only against its most similar passages
+            evidence_per_sentence: Number of passages selected for each sentence
+            embedding_cache_size: Maximum number of memoized embeddings for scoped grading
+            grade_cache_size: Maximum number of memoized scoped grades
+            min_confidence: Confidence below which a cheaper model's grade is
+                escalated to the next model of the cascade
+            client_registry: Optional registry of shared HTTP clients
+            resilience: Optional registry of deadlines, hedging and circuit breakers for model calls
         """
-        self.llm = ChatOpenAI(model=model_name, temperature=temperature)
+        self.context_packer = context_packer
+        self.embeddings = embeddings
+        self.evidence_per_sentence = evidence_per_sentence
+        self._embedding_cache = LRUCache(max_size=embedding_cache_size)
+        self._grade_cache = LRUCache(max_size=grade_cache_size)
+        
+        self.model_names = model_tiers(model_name)
+        self.llms = [
+            ChatOpenAI(model=name, temperature=temperature, **openai_client_kwargs(client_registry, name))
+            for name in self.model_names
+        ]
+        self.llm = self.llms[0]
+        self.resilience = resilience
+        self.min_confidence = min_confidence
         self.structured_llm = self.llm.with_structured_output(GradeHallucinations)
         
         # Define the grader prompt
         system_prompt = """You are a grader assessing whether an LLM generation is grounded in / supported by a set of retrieved facts.
-        Give a binary score 'yes' or 'no'. 'Yes' means that the answer is grounded in / supported by the set of facts."""
+        Give a binary score 'yes' or 'no'. 'Yes' means that the answer is grounded in / supported by the set of facts.
+        Also give your confidence in the score, from 0 to 1."""
         
         self.prompt = ChatPromptTemplate.from_messages(
             [
@@ -93,8 +340,113 @@ class HallucinationGrader:
             ]
         )
         
-        # Create the grading chain
-        self.grader_chain = self.prompt | self.structured_llm
+        # Create the grading chain, escalating unclear or low-confidence grades to stronger models
+        self.grader_chain = _grader_cascade(
+            self.prompt, self.model_names, self.llms, GradeHallucinations,
+            accept=functools.partial(binary_score_accepted, min_confidence=self.min_confidence),
+            resilience=self.resilience,
+        )
+        
+        # Define the scoped grader prompt
+        sentence_system_prompt = """You are a grader assessing whether each numbered statement of an LLM generation is grounded in / supported by a set of retrieved facts.
+        List the numbers of the statements that are not supported by the facts. Return an empty list if every statement is supported."""
+        
+        self.sentence_prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", sentence_system_prompt),
+                ("human", "Set of facts: \n\n {documents} \n\n Statements: \n\n {statements}"),
+            ]
+        )
+        self.sentence_chain = _grader_cascade(
+            self.sentence_prompt, self.model_names, self.llms, GradeSentences,
+            accept=None, resilience=self.resilience,
+        )
+        
+    def select_evidence(self, documents: List[Document], sentences: List[str]) -> List[Document]:
+        """
+        Select the passages most similar to each sentence.
+        
+        Args:
+            documents: Candidate passages
+            sentences: Sentences of the generation
+            
+        Returns:
+            The union of the top passages for every sentence, most similar first
+        """
+        if len(documents) <= self.evidence_per_sentence:
+            return list(documents)
+        
+        keys = ["s:" + normalize_query(sentence) for sentence in sentences] + [
+            _content_key(doc.page_content) for doc in documents
+        ]
+        texts = sentences + [doc.page_content for doc in documents]
+        vectors = _normalize_rows(
+            _embed_memoized(self.embeddings, self._embedding_cache, keys, texts)
+        )
+        
+        # Sentence-by-passage similarity matrix
+        similarities = vectors[:len(sentences)] @ vectors[len(sentences):].T
+        top = np.argsort(-similarities, axis=1)[:, :self.evidence_per_sentence]
+        selected = np.unique(top)
+        best = similarities.max(axis=0)
+        return [documents[i] for i in sorted(selected, key=lambda i: -best[i])]
+    
+    def _grade_key(self, documents: List[Document], generation: str) -> str:
+        """Cache key for a scoped grade of a generation against documents."""
+        digest = hashlib.sha1(generation.encode("utf-8"))
+        for doc in documents:
+            digest.update(b"\0" + doc.page_content.encode("utf-8"))
+        return digest.hexdigest()
+    
+    def find_unsupported(self, documents: List[Document], generation: str) -> List[str]:
+        """
+        Find the sentences of a generation that are not supported by the documents.
+        
+        Each sentence is graded only against the passages most similar to it,
+        so the grader sees a fraction of the retrieved context.
+        
+        Args:
+            documents: Documents that should ground the generation
+            generation: Generated text to grade
+            
+        Returns:
+            Unsupported sentences, empty if the generation is grounded
+        """
+        sentences = split_sentences(generation)
+        if not sentences:
+            return []
+        if not documents:
+            return sentences
+        
+        evidence = self.select_evidence(documents, sentences)
+        if self.context_packer:
+            docs_content = self.context_packer.pack(evidence)
+        else:
+            docs_content = "\n\n".join(doc.page_content for doc in evidence)
+        statements = "\n".join(f"{i}. {sentence}" for i, sentence in enumerate(sentences, 1))
+        
+        result = self.sentence_chain.invoke({
+            "documents": docs_content,
+            "statements": statements,
+        })
+        unsupported = [
+            sentences[i - 1] for i in sorted(set(result.unsupported)) if 1 <= i <= len(sentences)
+        ]
+        self._grade_cache.put(self._grade_key(documents, generation), unsupported)
+        return unsupported
+    
+    def cached_unsupported(self, documents: List[Document], generation: str) -> Optional[List[str]]:
+        """
+        Look up the unsupported sentences from an earlier scoped grade.
+        
+        Args:
+            documents: Documents the generation was graded against
+            generation: Graded generation
+            
+        Returns:
+            Unsupported sentences, or None if this generation was not scoped-graded
+        """
+        return self._grade_cache.get(self._grade_key(documents, generation))
         
     def grade_generation(self, documents: List[Document], generation: str) -> bool:
         """
@@ -107,8 +459,14 @@ class HallucinationGrader:
         Returns:
             True if the generation is grounded, False otherwise
         """
+        if self.embeddings is not None:
+            return not self.find_unsupported(documents, generation)
+        
         # Combine document content
-        docs_content = "\n\n".join([doc.page_content for doc in documents])
+        if self.context_packer:
+            docs_content = self.context_packer.pack(documents)
+        else:
+            docs_content = "\n\n".join([doc.page_content for doc in documents])
         
         result = self.grader_chain.invoke({
             "documents": docs_content,
@@ -120,20 +478,40 @@ class HallucinationGrader:
 class AnswerGrader:
     """Grades whether a generation addresses the original question."""
     
-    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0):
+    def __init__(
+        self,
+        model_name: Union[str, Sequence[str]] = "gpt-4o-mini",
+        temperature: float = 0,
+        min_confidence: float = 0.7,
+        client_registry: Optional[ClientRegistry] = None,
+        resilience: Optional[ResilienceRegistry] = None,
+    ):
         """
         Initialize answer grader.
         
         Args:
-            model_name: Name of the LLM model to use
+            model_name: Name of the LLM model to use, or names ordered from
+                cheapest to strongest to run as a cascade
             temperature: Temperature for model generation
+            min_confidence: Confidence below which a cheaper model's grade is
+                escalated to the next model of the cascade
+            client_registry: Optional registry of shared HTTP clients
+            resilience: Optional registry of deadlines, hedging and circuit breakers for model calls
         """
-        self.llm = ChatOpenAI(model=model_name, temperature=temperature)
+        self.model_names = model_tiers(model_name)
+        self.llms = [
+            ChatOpenAI(model=name, temperature=temperature, **openai_client_kwargs(client_registry, name))
+            for name in self.model_names
+        ]
+        self.llm = self.llms[0]
+        self.resilience = resilience
+        self.min_confidence = min_confidence
         self.structured_llm = self.llm.with_structured_output(GradeAnswer)
         
         # Define the grader prompt
         system_prompt = """You are a grader assessing whether an answer addresses / resolves a question.
-        Give a binary score 'yes' or 'no'. Yes' means that the answer resolves the question."""
+        Give a binary score 'yes' or 'no'. Yes' means that the answer resolves the question.
+        Also give your confidence in the score, from 0 to 1."""
         
         self.prompt = ChatPromptTemplate.from_messages(
             [
@@ -142,8 +520,12 @@ class AnswerGrader:
             ]
         )
         
-        # Create the grading chain
-        self.grader_chain = self.prompt | self.structured_llm
+        # Create the grading chain, escalating unclear or low-confidence grades to stronger models
+        self.grader_chain = _grader_cascade(
+            self.prompt, self.model_names, self.llms, GradeAnswer,
+            accept=functools.partial(binary_score_accepted, min_confidence=self.min_confidence),
+            resilience=self.resilience,
+        )
         
     def grade_answer(self, question: str, generation: str) -> bool:
         """
@@ -1,10 +1,89 @@
 """Retrieval components for Adaptive RAG."""
 
-from typing import List, Dict, Any, Optional
+import heapq
+import threading
+import zlib
+from typing import List, Dict, Any, Optional, Tuple
 from langchain.schema import Document, BaseRetriever
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 
+from ..utils.cache import LRUCache, normalize_query
+from ..utils.clients import ClientRegistry, openai_client_kwargs
+from ..utils.document_loader import chunk_id, unique_chunks
+from ..utils.metrics import record_cache_hit
+from ..utils.mmap_index import SharedIndexReader
+from ..utils.profiling import QueryThreadPoolExecutor
+from ..utils.tracing import span
+
+def _copy_documents(documents: List[Document]) -> List[Document]:
+    """Copy documents so callers cannot mutate cached instances."""
+    return [
+        Document(page_content=doc.page_content, metadata=dict(doc.metadata))
+        for doc in documents
+    ]
+
+def _document_key(doc: Document) -> Tuple[str, str]:
+    """Identify a document by its content and source for deduplication."""
+    return (doc.page_content, str(doc.metadata.get("source", "")))
+
+def reciprocal_rank_fusion(
+    result_lists: List[List[Document]],
+    limit: Optional[int] = None,
+    k: int = 60,
+) -> List[Document]:
+    """
+    Merge ranked result lists and remove duplicates.
+    
+    Documents are scored by the sum of 1 / (k + rank) over every list they
+    appear in, so chunks found by several queries rise to the top.
+    
+    Args:
+        result_lists: Ranked document lists to merge
+        limit: Optional maximum number of documents to return
+        k: Rank smoothing constant
+        
+    Returns:
+        Deduplicated documents ordered by fused score
+    """
+    scores: Dict[Tuple[str, str], float] = {}
+    documents: Dict[Tuple[str, str], Document] = {}
+    
+    for docs in result_lists:
+        for rank, doc in enumerate(docs):
+            key = _document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            documents.setdefault(key, doc)
+    
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    if limit is not None:
+        ranked = ranked[:limit]
+    return [documents[key] for key in ranked]
+
+def _with_relevance_scores(
+    vectorstore: Chroma,
+    results: List[Tuple[Document, float]],
+) -> List[Tuple[Document, float]]:
+    """Convert Chroma distances into relevance scores where higher is better."""
+    relevance = vectorstore._select_relevance_score_fn()
+    return [(doc, relevance(distance)) for doc, distance in results]
+
+def _stored_embeddings(vectorstores: List[Chroma]) -> Tuple[List[List[float]], List[str]]:
+    """Collect stored chunk embeddings and their sources from vectorstores."""
+    embeddings: List[List[float]] = []
+    sources: List[str] = []
+    for vectorstore in vectorstores:
+        stored = vectorstore.get(include=["embeddings", "metadatas"])
+        for vector, metadata in zip(stored["embeddings"], stored["metadatas"]):
+            embeddings.append(list(vector))
+            sources.append(str((metadata or {}).get("source", "")))
+    return embeddings, sources
+
+def _lookup_stored(vectorstore: Chroma, ids: List[str]) -> Dict[str, List[float]]:
+    """Get the stored embeddings of chunks by id, skipping ids that are not in the collection."""
+    stored = vectorstore.get(ids=ids, include=["embeddings"])
+    return {id_: list(vector) for id_, vector in zip(stored["ids"], stored["embeddings"])}
+
 class VectorStoreRetriever:
     """Component for retrieving documents from a vector store."""
     
@@ -14,6 +93,13 @@ class VectorStoreRetriever:
         collection_name: str = "adaptive-rag-collection",
         embedding_model: Optional[str] = None,
         search_kwargs: Optional[Dict[str, Any]] = None,
+        cache_size: int = 128,
+        adaptive_k: bool = False,
+        k_min: int = 1,
+        k_max: int = 8,
+        score_threshold: Optional[float] = None,
+        max_score_gap: Optional[float] = None,
+        client_registry: Optional[ClientRegistry] = None,
     ):
         """
         Initialize the retriever.
@@ -23,16 +109,47 @@ class VectorStoreRetriever:
             collection_name: Collection name for persistence
             embedding_model: Optional specific OpenAI embedding model
             search_kwargs: Additional search parameters
+            cache_size: Maximum number of cached query results (0 disables the cache)
+            adaptive_k: Whether to choose the number of results from similarity scores
+            k_min: Minimum number of results in adaptive mode
+            k_max: Maximum number of results in adaptive mode
+            score_threshold: Relevance score below which adaptive results stop
+            max_score_gap: Drop in relevance between neighbours at which adaptive results stop
+            client_registry: Optional registry of shared HTTP clients
         """
+        if adaptive_k and not 0 < k_min <= k_max:
+            raise ValueError("Adaptive retrieval requires 0 < k_min <= k_max")
+        
         self.collection_name = collection_name
         self.search_kwargs = search_kwargs or {"k": 4}
+        self.adaptive_k = adaptive_k
+        self.k_min = k_min
+        self.k_max = k_max
+        self.score_threshold = score_threshold
+        self.max_score_gap = max_score_gap
+        
+        self.cache = LRUCache(max_size=cache_size)
+        self._version_lock = threading.Lock()
+        
+        # Query embeddings computed for searches, reused by the grading pre-filter
+        self._query_embeddings = LRUCache(max_size=256)
         
         # Set up embeddings
         embedding_kwargs = {}
         if embedding_model:
             embedding_kwargs["model"] = embedding_model
             
-        self.embeddings = OpenAIEmbeddings(**embedding_kwargs)
+        self.embeddings = OpenAIEmbeddings(
+            **embedding_kwargs, **openai_client_kwargs(client_registry, embedding_model)
+        )
+        
+        self._open_index(vectorstore)
+        
+    def _open_index(self, vectorstore: Optional[Chroma]) -> None:
+        """Use the provided vectorstore or load the collection, and start at index version 0."""
+        # Results are cached per index version; add_documents bumps the version
+        # so stale entries can never be served after the index changes.
+        self.index_version = 0
         
         # Use provided vectorstore or try to load from persistence
         if vectorstore:
@@ -40,14 +157,14 @@ class VectorStoreRetriever:
         else:
             try:
                 self.vectorstore = Chroma(
-                    collection_name=collection_name,
+                    collection_name=self.collection_name,
                     embedding_function=self.embeddings,
                 )
             except Exception as e:
                 print(f"Could not load existing vectorstore: {e}")
                 # Initialize empty vectorstore
                 self.vectorstore = Chroma(
-                    collection_name=collection_name,
+                    collection_name=self.collection_name,
                     embedding_function=self.embeddings,
                 )
                 
@@ -56,6 +173,13 @@ class VectorStoreRetriever:
             search_kwargs=self.search_kwargs
         )
         
+    def _cache_key(self, query: str) -> Tuple[str, str, int]:
+        """Build the cache key for a query under the current index version."""
+        params = repr(sorted(self.search_kwargs.items()))
+        if self.adaptive_k:
+            params += repr((self.k_min, self.k_max, self.score_threshold, self.max_score_gap))
+        return (normalize_query(query), params, self.index_version)
+        
     def retrieve(self, query: str) -> List[Document]:
         """
         Retrieve documents for a query.
@@ -66,7 +190,154 @@ class VectorStoreRetriever:
         Returns:
             List of retrieved documents
         """
-        return self.retriever.invoke(query)
+        with span("retrieve", "retriever", query_chars=len(query)) as current:
+            key = self._cache_key(query)
+            cached = self.cache.get(key)
+            if cached is not None:
+                record_cache_hit()
+                current.set(cache_hit=True, documents=len(cached))
+                return _copy_documents(cached)
+            
+            documents = self._search(query)
+            self.cache.put(key, _copy_documents(documents))
+            current.set(cache_hit=False, documents=len(documents))
+            return documents
+    
+    def _search(self, query: str) -> List[Document]:
+        """Embed the query and run an uncached similarity search for it."""
+        # Searching by vector keeps the query embedding for the grading pre-filter
+        return self._search_by_vector(self._embed_query(query))
+    
+    def _embed_query(self, query: str) -> List[float]:
+        """Embed a query and remember the embedding for lookup_query_embedding."""
+        embedding = self.embeddings.embed_query(query)
+        self._query_embeddings.put(normalize_query(query), embedding)
+        return embedding
+    
+    def _search_by_vector(self, embedding: List[float]) -> List[Document]:
+        """Run a similarity search for a precomputed query embedding."""
+        if self.adaptive_k:
+            return self._select_adaptive(
+                self._search_by_vector_with_scores(embedding, self.k_max)
+            )
+        return self.vectorstore.similarity_search_by_vector(embedding, **self.search_kwargs)
+    
+    def _filter_kwargs(self) -> Dict[str, Any]:
+        """Search parameters other than the result count."""
+        return {key: value for key, value in self.search_kwargs.items() if key != "k"}
+    
+    def _search_by_vector_with_scores(
+        self, embedding: List[float], k: int
+    ) -> List[Tuple[Document, float]]:
+        """Search for an embedding and return (document, relevance) pairs, best first."""
+        return _with_relevance_scores(
+            self.vectorstore,
+            self.vectorstore.similarity_search_by_vector_with_relevance_scores(
+                embedding, k=k, **self._filter_kwargs()
+            ),
+        )
+    
+    def _select_adaptive(self, results: List[Tuple[Document, float]]) -> List[Document]:
+        """
+        Keep between k_min and k_max results based on their relevance scores.
+        
+        After the first k_min results, selection stops at the first result
+        below the score threshold or after a large drop from its neighbour.
+        Scores are recorded in each document's metadata.
+        """
+        selected = []
+        for index, (doc, score) in enumerate(results[:self.k_max]):
+            if index >= self.k_min:
+                if self.score_threshold is not None and score < self.score_threshold:
+                    break
+                previous_score = results[index - 1][1]
+                if self.max_score_gap is not None and previous_score - score > self.max_score_gap:
+                    break
+            doc.metadata["score"] = score
+            selected.append(doc)
+        return selected
+    
+    def retrieve_many(self, queries: List[str], limit: Optional[int] = None) -> List[Document]:
+        """
+        Retrieve documents for several queries and merge the results.
+        
+        Cache misses are embedded in a single batched request and searched
+        concurrently before the result lists are fused and deduplicated.
+        
+        Args:
+            queries: Queries to retrieve documents for
+            limit: Optional maximum number of merged documents to return
+            
+        Returns:
+            Merged list of retrieved documents
+        """
+        keys = [self._cache_key(query) for query in queries]
+        results: Dict[Tuple[str, str, int], List[Document]] = {}
+        misses: Dict[Tuple[str, str, int], str] = {}
+        
+        for key, query in zip(keys, queries):
+            if key in results or key in misses:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                record_cache_hit()
+                results[key] = _copy_documents(cached)
+            else:
+                misses[key] = query
+        
+        if misses:
+            # One embedding request for every uncached query
+            with span("embed_documents", "embedding", texts=len(misses)):
+                embeddings = self.embeddings.embed_documents(list(misses.values()))
+            for query, embedding in zip(misses.values(), embeddings):
+                self._query_embeddings.put(normalize_query(query), embedding)
+            with span("search_many", "retriever", queries=len(misses)):
+                with QueryThreadPoolExecutor(max_workers=len(misses)) as executor:
+                    searches = list(executor.map(self._search_by_vector, embeddings))
+            
+            for key, documents in zip(misses, searches):
+                self.cache.put(key, _copy_documents(documents))
+                results[key] = documents
+        
+        return reciprocal_rank_fusion(
+            [results[key] for key in dict.fromkeys(keys)],
+            limit=limit,
+        )
+    
+    def get_index_embeddings(self) -> Tuple[List[List[float]], List[str]]:
+        """
+        Return the stored embeddings and source of every indexed chunk.
+        
+        Returns:
+            Tuple of (embeddings, sources)
+        """
+        return _stored_embeddings([self.vectorstore])
+    
+    def lookup_embeddings(self, documents: List[Document]) -> List[Optional[List[float]]]:
+        """
+        Get the stored embedding of each retrieved chunk without calling the embedding model.
+        
+        Args:
+            documents: Chunks returned by this retriever
+            
+        Returns:
+            The stored embedding of each document, or None where it is not in the index
+        """
+        ids = [chunk_id(doc) for doc in documents]
+        found = _lookup_stored(self.vectorstore, list(dict.fromkeys(ids)))
+        return [found.get(id_) for id_ in ids]
+    
+    def lookup_query_embedding(self, query: str) -> Optional[List[float]]:
+        """
+        Get the embedding computed for a recent search, if it is still remembered.
+        
+        Args:
+            query: Query that was searched for
+            
+        Returns:
+            The query embedding, or None
+        """
+        return self._query_embeddings.get(normalize_query(query))
     
     def add_documents(self, documents: List[Document]) -> None:
         """
@@ -75,7 +346,312 @@ class VectorStoreRetriever:
         Args:
             documents: Documents to add
         """
-        self.vectorstore.add_documents(documents)
+        documents, ids = unique_chunks(documents)
+        self.vectorstore.add_documents(documents, ids=ids)
+        self._bump_index_version()
+    
+    def _bump_index_version(self) -> None:
+        """Invalidate cached results after the index has changed."""
+        with self._version_lock:
+            self.index_version += 1
+        self.cache.clear()
+    
+    def close(self) -> None:
+        """Release resources held by the retriever."""
+
+class ShardedVectorStoreRetriever(VectorStoreRetriever):
+    """Retriever that partitions chunks across several vectorstore collections."""
+    
+    def __init__(
+        self,
+        collection_name: str = "adaptive-rag-collection",
+        num_shards: int = 4,
+        shard_key: str = "hash",
+        embedding_model: Optional[str] = None,
+        search_kwargs: Optional[Dict[str, Any]] = None,
+        cache_size: int = 128,
+        adaptive_k: bool = False,
+        k_min: int = 1,
+        k_max: int = 8,
+        score_threshold: Optional[float] = None,
+        max_score_gap: Optional[float] = None,
+        client_registry: Optional[ClientRegistry] = None,
+    ):
+        """
+        Initialize the sharded retriever.
+        
+        Args:
+            collection_name: Base collection name; shards are suffixed with their index
+            num_shards: Number of shards to partition chunks across
+            shard_key: "hash" to spread chunks by content or "source" to keep
+                each source document on a single shard
+            embedding_model: Optional specific OpenAI embedding model
+            search_kwargs: Additional search parameters
+            cache_size: Maximum number of cached query results (0 disables the cache)
+            adaptive_k: Whether to choose the number of results from similarity scores
+            k_min: Minimum number of results in adaptive mode
+            k_max: Maximum number of results in adaptive mode
+            score_threshold: Relevance score below which adaptive results stop
+            max_score_gap: Drop in relevance between neighbours at which adaptive results stop
+            client_registry: Optional registry of shared HTTP clients
+        """
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        if shard_key not in ("hash", "source"):
+            raise ValueError("shard_key must be 'hash' or 'source'")
+        
+        # The base class owns shard 0 and the shared embeddings
+        super().__init__(
+            collection_name=f"{collection_name}-shard-0",
+            embedding_model=embedding_model,
+            search_kwargs=search_kwargs,
+            cache_size=cache_size,
+            adaptive_k=adaptive_k,
+            k_min=k_min,
+            k_max=k_max,
+            score_threshold=score_threshold,
+            max_score_gap=max_score_gap,
+            client_registry=client_registry,
+        )
+        self.collection_name = collection_name
+        self.num_shards = num_shards
+        self.shard_key = shard_key
+        
+        self.shards = [self.vectorstore] + [
+            Chroma(
+                collection_name=f"{collection_name}-shard-{index}",
+                embedding_function=self.embeddings,
+            )
+            for index in range(1, num_shards)
+        ]
+        
+        # Chroma's HNSW search runs in native code without the GIL, so a
+        # thread per shard is enough to spread a query across cores.
+        self._executor = QueryThreadPoolExecutor(max_workers=num_shards)
+    
+    def _shard_for(self, document: Document) -> int:
+        """Pick the owning shard for a document."""
+        if self.shard_key == "source":
+            key = str(document.metadata.get("source", ""))
+        else:
+            key = document.page_content
+        return zlib.crc32(key.encode("utf-8")) % self.num_shards
+    
+    def _search_by_vector(self, embedding: List[float]) -> List[Document]:
+        """Search every shard in parallel and merge the global top-k."""
+        if self.adaptive_k:
+            return self._select_adaptive(
+                self._search_by_vector_with_scores(embedding, self.k_max)
+            )
+        
+        results = self._search_by_vector_with_scores(embedding, self.search_kwargs.get("k", 4))
+        return [doc for doc, _ in results]
+    
+    def _search_by_vector_with_scores(
+        self, embedding: List[float], k: int
+    ) -> List[Tuple[Document, float]]:
+        """Scatter the embedding to every shard and merge results by relevance."""
+        filter_kwargs = self._filter_kwargs()
+        
+        def search_shard(shard: Chroma) -> List[Tuple[Document, float]]:
+            return _with_relevance_scores(
+                shard,
+                shard.similarity_search_by_vector_with_relevance_scores(
+                    embedding, k=k, **filter_kwargs
+                ),
+            )
+        
+        shard_results = self._executor.map(search_shard, self.shards)
+        return heapq.nlargest(
+            k,
+            (result for results in shard_results for result in results),
+            key=lambda result: result[1],
+        )
+    
+    def get_index_embeddings(self) -> Tuple[List[List[float]], List[str]]:
+        """
+        Return the stored embeddings and source of every chunk on every shard.
+        
+        Returns:
+            Tuple of (embeddings, sources)
+        """
+        return _stored_embeddings(self.shards)
+    
+    def lookup_embeddings(self, documents: List[Document]) -> List[Optional[List[float]]]:
+        """
+        Get the stored embedding of each retrieved chunk from its owning shard.
+        
+        Args:
+            documents: Chunks returned by this retriever
+            
+        Returns:
+            The stored embedding of each document, or None where it is not in the index
+        """
+        ids = [chunk_id(doc) for doc in documents]
+        partitions: Dict[int, List[str]] = {}
+        for document, id_ in zip(documents, ids):
+            partitions.setdefault(self._shard_for(document), []).append(id_)
+        
+        found: Dict[str, List[float]] = {}
+        for index, shard_ids in partitions.items():
+            found.update(_lookup_stored(self.shards[index], list(dict.fromkeys(shard_ids))))
+        return [found.get(id_) for id_ in ids]
+    
+    def add_documents(self, documents: List[Document]) -> None:
+        """
+        Add documents to their owning shards.
+        
+        Args:
+            documents: Documents to add
+        """
+        partitions: Dict[int, List[Document]] = {}
+        for document in unique_chunks(documents)[0]:
+            partitions.setdefault(self._shard_for(document), []).append(document)
+        
+        futures = [
+            self._executor.submit(
+                self.shards[index].add_documents,
+                shard_documents,
+                ids=[chunk_id(document) for document in shard_documents],
+            )
+            for index, shard_documents in partitions.items()
+        ]
+        for future in futures:
+            future.result()
+        
+        self._bump_index_version()
+    
+    def close(self) -> None:
+        """Stop the threads that search the shards."""
+        self._executor.shutdown(wait=True)
+
+class MemoryMappedRetriever(VectorStoreRetriever):
+    """Read-only retriever over a shared memory-mapped index published by a builder process."""
+    
+    def __init__(
+        self,
+        index_dir: str,
+        check_interval: float = 1.0,
+        embedding_model: Optional[str] = None,
+        search_kwargs: Optional[Dict[str, Any]] = None,
+        cache_size: int = 128,
+        adaptive_k: bool = False,
+        k_min: int = 1,
+        k_max: int = 8,
+        score_threshold: Optional[float] = None,
+        max_score_gap: Optional[float] = None,
+        client_registry: Optional[ClientRegistry] = None,
+    ):
+        """
+        Initialize the retriever.
+        
+        Args:
+            index_dir: Directory the index is published to (see utils.mmap_index)
+            check_interval: Minimum seconds between checks for a newly published version
+            embedding_model: OpenAI embedding model; must match the one the index was built with
+            search_kwargs: Additional search parameters; only "k" is supported
+            cache_size: Maximum number of cached query results (0 disables the cache)
+            adaptive_k: Whether to choose the number of results from similarity scores
+            k_min: Minimum number of results in adaptive mode
+            k_max: Maximum number of results in adaptive mode
+            score_threshold: Relevance score below which adaptive results stop
+            max_score_gap: Drop in relevance between neighbours at which adaptive results stop
+            client_registry: Optional registry of shared HTTP clients
+        """
+        self.reader = SharedIndexReader(index_dir, check_interval=check_interval)
+        super().__init__(
+            collection_name=index_dir,
+            embedding_model=embedding_model,
+            search_kwargs=search_kwargs,
+            cache_size=cache_size,
+            adaptive_k=adaptive_k,
+            k_min=k_min,
+            k_max=k_max,
+            score_threshold=score_threshold,
+            max_score_gap=max_score_gap,
+            client_registry=client_registry,
+        )
+        
+        # Embeddings of recent hits, reused by the grading pre-filter
+        self._hit_embeddings = LRUCache(max_size=1024)
+    
+    def _open_index(self, vectorstore: Optional[Chroma]) -> None:
+        """
+        Search the mapped index instead of a vectorstore collection.
+        
+        There is nothing to open: the reader maps the published version on first use.
+        """
+        return
+    
+    @property
+    def index_version(self) -> Optional[str]:
+        """
+        Name of the mapped index version, or None before the first publish.
+        
+        The version is part of the cache key, so results are never served from
+        a version the builder has since replaced.
+        """
+        index = self.reader.current()
+        return index.version if index is not None else None
+    
+    def _search_by_vector(self, embedding: List[float]) -> List[Document]:
+        """Search the mapped index for a precomputed query embedding."""
+        if self.adaptive_k:
+            return self._select_adaptive(
+                self._search_by_vector_with_scores(embedding, self.k_max)
+            )
+        
+        results = self._search_by_vector_with_scores(embedding, self.search_kwargs.get("k", 4))
+        return [doc for doc, _ in results]
+    
+    def _search_by_vector_with_scores(
+        self, embedding: List[float], k: int
+    ) -> List[Tuple[Document, float]]:
+        """Score every mapped vector and decode only the top k chunks."""
+        index = self.reader.current()
+        if index is None:
+            return []
+        
+        results = []
+        for position, score in index.search(embedding, k):
+            document = index.document(position)
+            self._hit_embeddings.put(chunk_id(document), index.vectors[position].tolist())
+            results.append((document, score))
+        return results
+    
+    def get_index_embeddings(self) -> Tuple[List[List[float]], List[str]]:
+        """
+        Return the embedding and source of every chunk in the mapped version.
+        
+        The embeddings are views of the mapped rows rather than copies.
+        
+        Returns:
+            Tuple of (embeddings, sources)
+        """
+        index = self.reader.current()
+        if index is None:
+            return [], []
+        sources = [str(index.metadata(position).get("source", "")) for position in range(len(index))]
+        return list(index.vectors), sources
+    
+    def lookup_embeddings(self, documents: List[Document]) -> List[Optional[List[float]]]:
+        """
+        Get the mapped embedding of each recently retrieved chunk.
+        
+        Args:
+            documents: Chunks returned by this retriever
+            
+        Returns:
+            The embedding of each document, or None where it is no longer remembered
+        """
+        return [self._hit_embeddings.get(chunk_id(doc)) for doc in documents]
+    
+    def add_documents(self, documents: List[Document]) -> None:
+        """Reject writes; new documents are published by the index builder."""
+        raise RuntimeError(
+            "The shared index is read-only; publish a new version with "
+            "python -m src.utils.mmap_index"
+        )
 
 class HybridRetriever:
     """Combines multiple retrievers with configurable weights."""
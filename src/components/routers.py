@@ -1,21 +1,73 @@
 """Query routing components for Adaptive RAG."""
 
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import ChatOpenAI
 from ..models.data_models import RouteQuery
+from ..utils.clients import ClientRegistry, openai_client_kwargs
+from ..utils.resilience import ResilienceRegistry
+from ..utils.tracing import span
+from .cascade import ModelCascade, model_tiers
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
 
 class QueryRouter:
     """Routes queries to the appropriate data source."""
     
-    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0):
+    def __init__(
+        self,
+        model_name: Union[str, Sequence[str]] = "gpt-4o-mini",
+        temperature: float = 0,
+        embeddings: Optional[Embeddings] = None,
+        mode: str = "llm",
+        margin: float = 0.05,
+        client_registry: Optional[ClientRegistry] = None,
+        resilience: Optional[ResilienceRegistry] = None,
+    ):
         """
         Initialize query router.
         
         Args:
-            model_name: Name of the LLM model to use
+            model_name: Name of the LLM model to use, or names ordered from
+                cheapest to strongest to run as a cascade
             temperature: Temperature for model generation
+            embeddings: Embeddings used for centroid routing
+            mode: "llm" to always ask the LLM, or "centroid" to route locally
+                by embedding similarity and fall back to the LLM when unsure
+            margin: Minimum similarity difference between the two sources for
+                a centroid decision to be trusted
+            client_registry: Optional registry of shared HTTP clients
+            resilience: Optional registry of deadlines, hedging and circuit breakers for model calls
         """
-        self.llm = ChatOpenAI(model=model_name, temperature=temperature)
+        if mode not in ("llm", "centroid"):
+            raise ValueError("mode must be 'llm' or 'centroid'")
+        if mode == "centroid" and embeddings is None:
+            raise ValueError("Centroid routing requires embeddings")
+        
+        self.embeddings = embeddings
+        self.mode = mode
+        self.margin = margin
+        
+        # Unit-length centroid matrices per datasource
+        self.centroids: Dict[str, np.ndarray] = {}
+        
+        # Counters for how each question was routed
+        self.route_stats: Dict[str, int] = {"centroid": 0, "llm": 0}
+        self._stats_lock = threading.Lock()
+        
+        self.model_names = model_tiers(model_name)
+        self.llms = [
+            ChatOpenAI(model=name, temperature=temperature, **openai_client_kwargs(client_registry, name))
+            for name in self.model_names
+        ]
+        self.llm = self.llms[0]
+        self.resilience = resilience
         self.structured_llm = self.llm.with_structured_output(RouteQuery)
         
         # Define the router prompt
@@ -27,6 +79,8 @@ class QueryRouter:
         1. Is the question about a specific topic in the vectorstore?
         2. Is the question asking for recent information or news?
         3. Is the question about a specialized domain not likely covered in the vectorstore?
+        
+        Also give your confidence in the choice, from 0 to 1.
         """
         
         self.prompt = ChatPromptTemplate.from_messages(
@@ -37,7 +91,14 @@ class QueryRouter:
         )
         
         # Create the routing chain
-        self.router_chain = self.prompt | self.structured_llm
+        self.router_chain = self._build_chain()
+        
+    def _build_chain(self) -> ModelCascade:
+        """Create the routing cascade from the current prompt."""
+        return ModelCascade([
+            (name, self.prompt | llm.with_structured_output(RouteQuery))
+            for name, llm in zip(self.model_names, self.llms)
+        ], resilience=self.resilience)
         
     def route(self, question: str) -> str:
         """
@@ -49,8 +110,79 @@ class QueryRouter:
         Returns:
             Data source to use ("vectorstore" or "web_search")
         """
+        return self.route_with_confidence(question)[0]
+    
+    def route_with_confidence(self, question: str) -> Tuple[str, float]:
+        """
+        Route a query and report how sure the decision is.
+        
+        Args:
+            question: User question
+            
+        Returns:
+            Data source to use and a confidence between 0 and 1; local
+            centroid decisions are only made when confident, so they report 1.0
+        """
+        if self.mode == "centroid":
+            datasource = self._route_by_centroid(question)
+            if datasource is not None:
+                self._record("centroid")
+                return datasource, 1.0
+        
+        self._record("llm")
         result = self.router_chain.invoke({"question": question})
-        return result.datasource
+        return result.datasource, min(1.0, max(0.0, result.confidence))
+    
+    def _record(self, path: str) -> None:
+        """Increment the counter for a routing path."""
+        with self._stats_lock:
+            self.route_stats[path] += 1
+    
+    def _route_by_centroid(self, question: str) -> Optional[str]:
+        """
+        Route by comparing the question embedding with datasource centroids.
+        
+        Returns:
+            The closest datasource, or None if the margin is too small to decide
+        """
+        centroids = self.centroids
+        if "vectorstore" not in centroids or "web_search" not in centroids:
+            return None
+        
+        with span("embed_query", "embedding", texts=1):
+            query = _normalize_rows(np.asarray(self.embeddings.embed_query(question), dtype=np.float32))
+        vectorstore_score = float(np.max(centroids["vectorstore"] @ query))
+        web_search_score = float(np.max(centroids["web_search"] @ query))
+        
+        if abs(vectorstore_score - web_search_score) < self.margin:
+            return None
+        return "vectorstore" if vectorstore_score > web_search_score else "web_search"
+    
+    def fit_centroids(self, example_questions: Dict[str, List[str]]) -> None:
+        """
+        Compute datasource centroids for local routing.
+        
+        Each datasource gets the centroid of its labeled example questions.
+        Both sides are built from questions because question-to-question
+        similarity runs higher than question-to-passage similarity; mixing
+        chunk centroids into one side would bias the margin test toward it.
+        
+        Args:
+            example_questions: Example questions keyed by datasource
+        """
+        labels = [label for label, questions in example_questions.items() for _ in questions]
+        questions = [question for questions in example_questions.values() for question in questions]
+        if not questions:
+            self.centroids = {}
+            return
+        
+        vectors = _normalize_rows(np.asarray(self.embeddings.embed_documents(questions), dtype=np.float32))
+        centroids: Dict[str, np.ndarray] = {}
+        for label in example_questions:
+            mask = np.asarray([item == label for item in labels])
+            if mask.any():
+                centroids[label] = _normalize_rows(vectors[mask].mean(axis=0, keepdims=True))
+        self.centroids = centroids
     
     def update_vectorstore_topics(self, topics: str) -> None:
         """
@@ -67,6 +199,8 @@ class QueryRouter:
         1. Is the question about a specific topic in the vectorstore?
         2. Is the question asking for recent information or news?
         3. Is the question about a specialized domain not likely covered in the vectorstore?
+        
+        Also give your confidence in the choice, from 0 to 1.
         """
         
         self.prompt = ChatPromptTemplate.from_messages(
@@ -77,4 +211,4 @@ class QueryRouter:
         )
         
         # Update the routing chain
-        self.router_chain = self.prompt | self.structured_llm
\ No newline at end of file
+        self.router_chain = self._build_chain()
\ No newline at end of file
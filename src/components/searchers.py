@@ -1,9 +1,51 @@
 """Web search components for Adaptive RAG."""
 
+import json
 from typing import List, Dict, Any, Optional
+import requests
 from langchain_community.tools.tavily_search import TavilySearchResults
+from langchain_community.utilities.tavily_search import TAVILY_API_URL, TavilySearchAPIWrapper
 from langchain.schema import Document
 
+from ..utils.cache import SQLiteCacheBackend, TTLCache, normalize_query
+from ..utils.metrics import record_cache_hit
+from ..utils.resilience import ResilienceRegistry
+from ..utils.tracing import span
+
+class WebSearchError(ConnectionError):
+    """The search provider reported an error instead of returning results."""
+
+class _TavilySearchAPIWrapper(TavilySearchAPIWrapper):
+    """Tavily API wrapper whose requests time out instead of waiting indefinitely."""
+    
+    timeout: Optional[float] = None
+    
+    def raw_results(
+        self,
+        query: str,
+        max_results: Optional[int] = 5,
+        search_depth: Optional[str] = "advanced",
+        include_domains: Optional[List[str]] = [],
+        exclude_domains: Optional[List[str]] = [],
+        include_answer: Optional[bool] = False,
+        include_raw_content: Optional[bool] = False,
+        include_images: Optional[bool] = False,
+    ) -> Dict:
+        params = {
+            "api_key": self.tavily_api_key.get_secret_value(),
+            "query": query,
+            "max_results": max_results,
+            "search_depth": search_depth,
+            "include_domains": include_domains,
+            "exclude_domains": exclude_domains,
+            "include_answer": include_answer,
+            "include_raw_content": include_raw_content,
+            "include_images": include_images,
+        }
+        response = requests.post(f"{TAVILY_API_URL}/search", json=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
 class WebSearcher:
     """Component for web search."""
     
@@ -13,6 +55,11 @@ class WebSearcher:
         num_results: int = 3,
         include_domains: Optional[List[str]] = None,
         exclude_domains: Optional[List[str]] = None,
+        resilience: Optional[ResilienceRegistry] = None,
+        cache_size: int = 256,
+        cache_ttl: float = 600.0,
+        stale_ttl: float = 0.0,
+        cache_path: Optional[str] = None,
     ):
         """
         Initialize web searcher.
@@ -22,6 +69,14 @@ class WebSearcher:
             num_results: Number of results to return
             include_domains: List of domains to include in search
             exclude_domains: List of domains to exclude from search
+            resilience: Optional registry providing the search deadline, hedging
+                and circuit breaker
+            cache_size: Maximum number of cached searches (0 disables the cache)
+            cache_ttl: Seconds a cached search is served as fresh
+            stale_ttl: Further seconds an expired search is served while it is
+                refreshed in the background
+            cache_path: Optional SQLite file persisting cached searches across
+                restarts and processes
         """
         search_args = {"k": num_results}
         
@@ -31,12 +86,27 @@ class WebSearcher:
         if exclude_domains:
             search_args["exclude_domains"] = exclude_domains
             
-        # Create the search tool
+        self.policy = resilience.policy("web_search") if resilience is not None else None
+        
+        # Create the search tool; a search abandoned at its deadline would otherwise hold a worker until it returns
         tavily_args = {}
         if api_key:
-            tavily_args["api_key"] = api_key
+            tavily_args["tavily_api_key"] = api_key
+        timeout = self.policy.timeout if self.policy is not None else None
+        api_wrapper = _TavilySearchAPIWrapper(**tavily_args, timeout=timeout)
             
-        self.search_tool = TavilySearchResults(**tavily_args, **search_args)
+        self.search_tool = TavilySearchResults(api_wrapper=api_wrapper, **search_args)
+        
+        # Searches are cached by normalized query and the arguments that change the results
+        self._search_key = json.dumps(
+            [num_results, sorted(include_domains or []), sorted(exclude_domains or [])]
+        )
+        backend = SQLiteCacheBackend(cache_path) if cache_path and cache_size > 0 else None
+        self.cache = TTLCache(max_size=cache_size, ttl=cache_ttl, stale_ttl=stale_ttl, backend=backend)
+        
+    def available(self) -> bool:
+        """Whether searches are being attempted, i.e. the circuit is not open."""
+        return self.policy is None or not self.policy.breaker.is_open
         
     def search(self, query: str) -> List[Dict[str, Any]]:
         """
@@ -48,7 +118,43 @@ class WebSearcher:
         Returns:
             List of search results
         """
-        return self.search_tool.invoke({"query": query})
+        with span("web_search", "search", query_chars=len(query)) as current:
+            key = f"{normalize_query(query)}\n{self._search_key}"
+            results, outcome = self.cache.get_or_load(key, lambda: self._search_uncached(query))
+            if outcome != "miss":
+                record_cache_hit()
+            current.set(results=len(results), cache=outcome)
+        # Copy so callers cannot mutate cached results
+        return [dict(result) for result in results]
+    
+    def _search_uncached(self, query: str) -> List[Dict[str, Any]]:
+        """Call the search provider for a query."""
+        if self.policy is not None:
+            return self.policy.call(self._invoke_tool, query)
+        return self._invoke_tool(query)
+    
+    def _invoke_tool(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Call the search tool, raising if it reports an error.
+        
+        Args:
+            query: Query to search for
+            
+        Returns:
+            List of search results
+            
+        Raises:
+            WebSearchError: The tool returned something other than results
+        """
+        results = self.search_tool.invoke({"query": query})
+        # Tavily returns the error text instead of raising; never cache or serve it
+        if not isinstance(results, list) or not all(isinstance(result, dict) for result in results):
+            raise WebSearchError(f"Web search failed: {str(results)[:200]}")
+        return results
+    
+    def close(self) -> None:
+        """Stop background cache refreshes and close the persistent cache."""
+        self.cache.close()
     
     def search_to_documents(self, query: str) -> List[Document]:
         """
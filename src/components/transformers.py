@@ -1,21 +1,43 @@
 """Query transformation components for Adaptive RAG."""
 
+from typing import List, Optional, Sequence, Union
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 
+from ..models.data_models import MultiQuery
+from ..utils.cache import normalize_query
+from ..utils.clients import ClientRegistry, openai_client_kwargs
+from ..utils.resilience import ResilienceRegistry
+from .cascade import ModelCascade, model_tiers
+
 class QueryTransformer:
     """Transforms user queries to improve retrieval performance."""
     
-    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0):
+    def __init__(
+        self,
+        model_name: Union[str, Sequence[str]] = "gpt-4o-mini",
+        temperature: float = 0,
+        client_registry: Optional[ClientRegistry] = None,
+        resilience: Optional[ResilienceRegistry] = None,
+    ):
         """
         Initialize query transformer.
         
         Args:
-            model_name: Name of the LLM model to use
+            model_name: Name of the LLM model to use, or names ordered from
+                cheapest to strongest to run as a cascade
             temperature: Temperature for model generation
+            client_registry: Optional registry of shared HTTP clients
+            resilience: Optional registry of deadlines, hedging and circuit breakers for model calls
         """
-        self.llm = ChatOpenAI(model=model_name, temperature=temperature)
+        self.model_names = model_tiers(model_name)
+        self.llms = [
+            ChatOpenAI(model=name, temperature=temperature, **openai_client_kwargs(client_registry, name))
+            for name in self.model_names
+        ]
+        self.llm = self.llms[0]
+        self.resilience = resilience
         
         # Define the transformer prompt
         system_prompt = """You are a question re-writer that converts an input question to a better version that is optimized 
@@ -42,7 +64,34 @@ class QueryTransformer:
         )
         
         # Create the transformation chain
-        self.transform_chain = self.prompt | self.llm | StrOutputParser()
+        self.transform_chain = ModelCascade([
+            (name, self.prompt | llm | StrOutputParser())
+            for name, llm in zip(self.model_names, self.llms)
+        ], resilience=self.resilience)
+        
+        # Define the multi-query prompt
+        multi_query_prompt = """You are a question re-writer that generates several alternative versions of an input question
+        to retrieve relevant documents from a vectorstore. Each version should approach the underlying intent from a
+        different angle, for example by using synonyms, expanding acronyms or focusing on a different sub-question.
+        
+        Return exactly {num_queries} distinct rewrites.
+        """
+        
+        self.multi_query_prompt = ChatPromptTemplate.from_messages(
+            [
+                ("system", multi_query_prompt),
+                (
+                    "human",
+                    "Here is the initial question: \n\n {question} \n Formulate {num_queries} improved questions.",
+                ),
+            ]
+        )
+        
+        # Create the multi-query chain
+        self.multi_query_chain = ModelCascade([
+            (name, self.multi_query_prompt | llm.with_structured_output(MultiQuery))
+            for name, llm in zip(self.model_names, self.llms)
+        ], resilience=self.resilience)
         
     def transform_query(self, question: str) -> str:
         """
@@ -55,20 +104,60 @@ class QueryTransformer:
             Transformed query
         """
         return self.transform_chain.invoke({"question": question})
+    
+    def generate_queries(self, question: str, num_queries: int = 3) -> List[str]:
+        """
+        Generate several rewrites of a query in a single LLM call.
+        
+        Args:
+            question: Original user question
+            num_queries: Number of rewrites to request
+            
+        Returns:
+            Distinct rewrites, excluding the original question
+        """
+        result = self.multi_query_chain.invoke({
+            "question": question,
+            "num_queries": num_queries,
+        })
+        
+        seen = {normalize_query(question)}
+        queries = []
+        for query in result.queries:
+            key = normalize_query(query)
+            if key and key not in seen:
+                seen.add(key)
+                queries.append(query.strip())
+        return queries[:num_queries]
 
 
 class HypotheticalDocumentGenerator:
     """Generates hypothetical documents that would answer a user's question."""
     
-    def __init__(self, model_name: str = "gpt-4o-mini", temperature: float = 0.4):
+    def __init__(
+        self,
+        model_name: Union[str, Sequence[str]] = "gpt-4o-mini",
+        temperature: float = 0.4,
+        client_registry: Optional[ClientRegistry] = None,
+        resilience: Optional[ResilienceRegistry] = None,
+    ):
         """
         Initialize hypothetical document generator.
         
         Args:
-            model_name: Name of the LLM model to use
+            model_name: Name of the LLM model to use, or names ordered from
+                cheapest to strongest to run as a cascade
             temperature: Temperature for model generation
+            client_registry: Optional registry of shared HTTP clients
+            resilience: Optional registry of deadlines, hedging and circuit breakers for model calls
         """
-        self.llm = ChatOpenAI(model=model_name, temperature=temperature)
+        self.model_names = model_tiers(model_name)
+        self.llms = [
+            ChatOpenAI(model=name, temperature=temperature, **openai_client_kwargs(client_registry, name))
+            for name in self.model_names
+        ]
+        self.llm = self.llms[0]
+        self.resilience = resilience
         
         # Define the generator prompt
         system_prompt = """You are an expert at generating hypothetical document fragments that would perfectly answer a user's question.
@@ -95,7 +184,10 @@ class HypotheticalDocumentGenerator:
         )
         
         # Create the generation chain
-        self.generation_chain = self.prompt | self.llm | StrOutputParser()
+        self.generation_chain = ModelCascade([
+            (name, self.prompt | llm | StrOutputParser())
+            for name, llm in zip(self.model_names, self.llms)
+        ], resilience=self.resilience)
         
     def generate_document(self, question: str) -> str:
         """
@@ -1,9 +1,10 @@
 """Configuration for the Adaptive RAG system."""
 
 import os
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Union
 
-# Default model configurations
+# Default model configurations. A role may also map to a list of models,
+# ordered from cheapest to strongest, to run as a cascade.
 DEFAULT_MODELS = {
     "router": "gpt-4o-mini",
     "generator": "gpt-4o-mini", 
@@ -16,11 +17,145 @@ DEFAULT_VECTORSTORE_SETTINGS = {
     "collection_name": "adaptive-rag-collection",
     "chunk_size": 500,
     "chunk_overlap": 0,
+    "num_shards": 1,  # More than one partitions chunks across collections
+    "shard_key": "hash",  # "hash" or "source"
+    "shared_index_dir": None,  # Serve from a memory-mapped index published to this directory
+    "index_check_interval": 1.0,  # Seconds between checks for a newly published index
+}
+
+# Default retrieval settings
+DEFAULT_RETRIEVAL_SETTINGS = {
+    "cache_size": 128,
+    "mode": "similarity",  # "similarity", "multi_query" or "hyde"
+    "num_queries": 3,
+    "max_documents": 8,
+    "adaptive_k": False,  # Choose the number of chunks from similarity scores
+    "k_min": 1,
+    "k_max": 8,
+    "score_threshold": 0.5,
+    "max_score_gap": 0.1,
+}
+
+# Default grading settings
+DEFAULT_GRADING_SETTINGS = {
+    "prefilter": False,  # Decide obvious documents by embedding similarity
+    # Cosine cut-offs for text-embedding-ada-002, whose question-passage similarities
+    # sit around 0.70-0.75 for unrelated text and 0.80-0.88 for relevant text.
+    # Other embedding models need their own values.
+    "accept_threshold": 0.88,
+    "reject_threshold": 0.72,
+    "scoped_hallucination": False,  # Grade each sentence against its closest passages
+    "evidence_per_sentence": 2,
+    "escalation_confidence": 0.7,  # With grader cascades, less confident grades go to the next model
+}
+
+# Default context packing settings
+DEFAULT_CONTEXT_SETTINGS = {
+    "enabled": False,  # Packing drops near-duplicates and truncates passages over the budget
+    "max_tokens": 6000,  # Default budget for packed context
+    "model_max_tokens": {},  # Per-model overrides, e.g. {"gpt-4o": 12000}
+    "near_duplicate_threshold": 0.9,
+}
+
+# Default routing settings
+DEFAULT_ROUTING_SETTINGS = {
+    "mode": "llm",  # "llm" or "centroid"
+    "margin": 0.05,  # Minimum similarity margin for a local decision
+    "dual_path_threshold": 0.6,  # Router confidence below which both sources are searched
+    "example_questions": {  # Centroid routing compares questions with these; cover the indexed topics
+        "vectorstore": [
+            "What are the types of agent memory?",
+            "How does chain-of-thought prompting work?",
+            "What are adversarial attacks on large language models?",
+        ],
+        "web_search": [
+            "Who won the game last night?",
+            "What is the weather forecast for tomorrow?",
+            "What are today's top news headlines?",
+            "What is the current stock price of Apple?",
+            "Which player is expected to be drafted first this year?",
+        ],
+    },
+}
+
+# Default workflow settings
+DEFAULT_WORKFLOW_SETTINGS = {
+    "optimistic": False,  # Deliver answers before grading finishes
+    "dual_path": False,  # Search the vectorstore and the web in parallel when the router is unsure
+    "coalesce_queries": False,  # Concurrent queries for the same question share one run
+}
+
+# Default per-query budget settings (None disables a limit)
+DEFAULT_BUDGET_SETTINGS = {
+    "max_seconds": None,  # Wall-clock deadline
+    "max_loops": None,  # Query rewrites and regenerations
+    "max_llm_calls": None,
+    "max_tokens": None,
+}
+
+# Default HTTP client settings, shared by all model clients
+DEFAULT_CLIENT_SETTINGS = {
+    "max_connections": 100,
+    "max_keepalive_connections": 20,
+    "keepalive_expiry": 30.0,  # Seconds an idle connection stays open
+    "connect_timeout": 5.0,
+    "read_timeout": 60.0,  # Capped at the model deadline when resilience is enabled
+}
+
+# Default client-side rate limits, shared by every model client in the process
+DEFAULT_RATE_LIMIT_SETTINGS = {
+    "enabled": False,
+    "requests_per_minute": 500,  # Per model; None disables the limit
+    "tokens_per_minute": 200_000,
+    "burst_seconds": 10.0,  # Seconds of traffic that may be sent at once
+    "models": {},  # Per-model overrides, e.g. {"gpt-4o": {"tokens_per_minute": 30_000}}
+}
+
+# Default deadlines, hedging and circuit breakers for external calls
+DEFAULT_RESILIENCE_SETTINGS = {
+    "enabled": False,
+    "max_workers": 32,  # Threads for calls with a deadline or hedging
+    "llm": {  # Per model; a timed out or failing tier escalates to the next one
+        "timeout": 30.0,  # Seconds; None for no deadline
+        "hedge": False,
+        "failure_threshold": 5,  # Consecutive failures that open the circuit
+        "reset_timeout": 30.0,  # Seconds before an open circuit allows a probe call
+    },
+    "web_search": {  # While the circuit is open, questions are routed to the vectorstore
+        "timeout": 10.0,
+        "hedge": True,  # Send a duplicate search once the first is slower than usual
+        "hedge_quantile": 95.0,
+        "failure_threshold": 3,
+        "reset_timeout": 30.0,
+    },
+}
+
+# Default per-query profiling settings
+DEFAULT_PROFILING_SETTINGS = {
+    "sample_rate": 0.0,  # Fraction of queries profiled without being requested
+    "output_dir": "profiles",
+    "mode": "sampling",  # "sampling" (the query's threads) or "cprofile" (calling thread)
+    "interval": 0.005,  # Seconds between stack samples
+    "max_profiles": 100,  # Older profiles are deleted
+}
+
+# Default built-in trace settings, independent of LangSmith
+DEFAULT_TRACE_SETTINGS = {
+    "enabled": False,
+    "output_dir": "traces",
+    "sample_rate": 1.0,  # Fraction of queries traced
+    "max_bytes": 10_000_000,  # Size at which a trace file is rotated
+    "max_files": 10,  # Trace files kept, including the current one
+    "queue_size": 1000,  # Traces buffered for writing; more are dropped
 }
 
 # Default web search settings
 DEFAULT_WEB_SEARCH_SETTINGS = {
     "num_results": 3,
+    "cache_size": 256,  # Cached searches (0 disables the cache)
+    "cache_ttl": 600.0,  # Seconds a cached search is served as fresh
+    "stale_ttl": 3600.0,  # Further seconds it is served while refreshed in the background
+    "cache_path": None,  # SQLite file to persist cached searches, e.g. "cache/web_search.db"
 }
 
 # Default document sources for indexing
@@ -35,8 +170,19 @@ class Config:
     
     def __init__(
         self,
-        models: Optional[Dict[str, str]] = None,
+        models: Optional[Dict[str, Union[str, List[str]]]] = None,
         vectorstore_settings: Optional[Dict[str, Any]] = None,
+        retrieval_settings: Optional[Dict[str, Any]] = None,
+        grading_settings: Optional[Dict[str, Any]] = None,
+        routing_settings: Optional[Dict[str, Any]] = None,
+        context_settings: Optional[Dict[str, Any]] = None,
+        workflow_settings: Optional[Dict[str, Any]] = None,
+        budget_settings: Optional[Dict[str, Any]] = None,
+        client_settings: Optional[Dict[str, Any]] = None,
+        rate_limit_settings: Optional[Dict[str, Any]] = None,
+        resilience_settings: Optional[Dict[str, Any]] = None,
+        profiling_settings: Optional[Dict[str, Any]] = None,
+        trace_settings: Optional[Dict[str, Any]] = None,
         web_search_settings: Optional[Dict[str, Any]] = None,
         document_urls: Optional[List[str]] = None,
         enable_tracing: bool = False,
@@ -47,13 +193,42 @@ class Config:
         Args:
             models: Model configuration for different components
             vectorstore_settings: Settings for the vectorstore
-            web_search_settings: Settings for web search
+            retrieval_settings: Settings for retrieval (caching, search modes)
+            grading_settings: Settings for document and generation grading
+            routing_settings: Settings for query routing
+            context_settings: Settings for token-budgeted context packing
+            workflow_settings: Settings for the workflow graph
+            budget_settings: Per-query latency and cost limits for the workflow
+            client_settings: Connection pool and timeout settings for model clients
+            rate_limit_settings: Requests and tokens per minute allowed per model
+            resilience_settings: Deadlines, hedging and circuit breakers for
+                model and web search calls
+            profiling_settings: Sampling rate and output settings for query profiling
+            trace_settings: Settings for the built-in span-tree tracer
+            web_search_settings: Settings for web search and its result cache
             document_urls: URLs to index in the vectorstore
             enable_tracing: Whether to enable LangSmith tracing
         """
         self.models = models or DEFAULT_MODELS.copy()
-        self.vectorstore_settings = vectorstore_settings or DEFAULT_VECTORSTORE_SETTINGS.copy()
-        self.web_search_settings = web_search_settings or DEFAULT_WEB_SEARCH_SETTINGS.copy()
+        self.vectorstore_settings = {**DEFAULT_VECTORSTORE_SETTINGS, **(vectorstore_settings or {})}
+        self.retrieval_settings = {**DEFAULT_RETRIEVAL_SETTINGS, **(retrieval_settings or {})}
+        self.grading_settings = {**DEFAULT_GRADING_SETTINGS, **(grading_settings or {})}
+        self.routing_settings = {**DEFAULT_ROUTING_SETTINGS, **(routing_settings or {})}
+        self.context_settings = {**DEFAULT_CONTEXT_SETTINGS, **(context_settings or {})}
+        self.workflow_settings = {**DEFAULT_WORKFLOW_SETTINGS, **(workflow_settings or {})}
+        self.budget_settings = {**DEFAULT_BUDGET_SETTINGS, **(budget_settings or {})}
+        self.client_settings = {**DEFAULT_CLIENT_SETTINGS, **(client_settings or {})}
+        self.rate_limit_settings = {**DEFAULT_RATE_LIMIT_SETTINGS, **(rate_limit_settings or {})}
+        # Per-service settings are merged too, so overriding one keeps the others' defaults
+        resilience_settings = resilience_settings or {}
+        self.resilience_settings = {**DEFAULT_RESILIENCE_SETTINGS, **resilience_settings}
+        for service in ("llm", "web_search"):
+            self.resilience_settings[service] = {
+                **DEFAULT_RESILIENCE_SETTINGS[service], **resilience_settings.get(service, {})
+            }
+        self.profiling_settings = {**DEFAULT_PROFILING_SETTINGS, **(profiling_settings or {})}
+        self.trace_settings = {**DEFAULT_TRACE_SETTINGS, **(trace_settings or {})}
+        self.web_search_settings = {**DEFAULT_WEB_SEARCH_SETTINGS, **(web_search_settings or {})}
         self.document_urls = document_urls or DEFAULT_DOCUMENT_URLS.copy()
         
         # Set up tracing
@@ -62,4 +237,20 @@ class Config:
             os.environ["LANGSMITH_TRACING"] = "true"
             # Ensure project name is set
             if not os.environ.get("LANGSMITH_PROJECT"):
-                os.environ["LANGSMITH_PROJECT"] = "Adaptive_RAG"
\ No newline at end of file
+                os.environ["LANGSMITH_PROJECT"] = "Adaptive_RAG"
+    
+    def context_budget(self, model_name: Union[str, List[str]]) -> int:
+        """
+        Get the context token budget for a model.
+        
+        Args:
+            model_name: Name of the model, or a cascade of models
+            
+        Returns:
+            Maximum number of context tokens, the smallest across a cascade
+        """
+        model_names = [model_name] if isinstance(model_name, str) else model_name
+        return min(
+            self.context_settings["model_max_tokens"].get(name, self.context_settings["max_tokens"])
+            for name in model_names
+        )
\ No newline at end of file
@@ -5,7 +5,9 @@ from .data_models import (
     RouteQuery,
     GradeDocuments,
     GradeHallucinations,
+    GradeSentences,
     GradeAnswer,
+    MultiQuery,
     RAGResult,
     WebSearchResult,
 )
@@ -15,7 +17,9 @@ __all__ = [
     "RouteQuery",
     "GradeDocuments",
     "GradeHallucinations",
+    "GradeSentences",
     "GradeAnswer",
+    "MultiQuery",
     "RAGResult",
     "WebSearchResult",
 ]
\ No newline at end of file
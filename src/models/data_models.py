@@ -12,6 +12,10 @@ class RouteQuery(BaseModel):
         ...,
         description="Given a user question choose to route it to web search or a vectorstore.",
     )
+    confidence: float = Field(
+        default=1.0,
+        description="Confidence that the chosen datasource can answer the question, from 0 (guess) to 1 (certain)",
+    )
 
 class GradeDocuments(BaseModel):
     """Binary score for relevance check on retrieved documents."""
@@ -19,6 +23,10 @@ class GradeDocuments(BaseModel):
     binary_score: str = Field(
         description="Documents are relevant to the question, 'yes' or 'no'"
     )
+    confidence: float = Field(
+        default=1.0,
+        description="Confidence in the score, from 0 (guess) to 1 (certain)",
+    )
 
 class GradeHallucinations(BaseModel):
     """Binary score for hallucination present in generation answer."""
@@ -26,6 +34,18 @@ class GradeHallucinations(BaseModel):
     binary_score: str = Field(
         description="Answer is grounded in the facts, 'yes' or 'no'"
     )
+    confidence: float = Field(
+        default=1.0,
+        description="Confidence in the score, from 0 (guess) to 1 (certain)",
+    )
+
+class GradeSentences(BaseModel):
+    """Statements of an answer that are not supported by the evidence."""
+
+    unsupported: List[int] = Field(
+        default_factory=list,
+        description="Numbers of the statements that are not supported by the facts, empty if all are supported",
+    )
 
 class GradeAnswer(BaseModel):
     """Binary score to assess answer addresses question."""
@@ -33,6 +53,17 @@ class GradeAnswer(BaseModel):
     binary_score: str = Field(
         description="Answer addresses the question, 'yes' or 'no'"
     )
+    confidence: float = Field(
+        default=1.0,
+        description="Confidence in the score, from 0 (guess) to 1 (certain)",
+    )
+
+class MultiQuery(BaseModel):
+    """Alternative phrasings of a user question for retrieval."""
+
+    queries: List[str] = Field(
+        description="Distinct rewrites of the question optimized for vectorstore retrieval"
+    )
 
 class GraphState(TypedDict):
     """
@@ -42,11 +73,34 @@ class GraphState(TypedDict):
         question: Original user question
         generation: LLM generation/response
         documents: List of retrieved documents
+        generation_grade: Grade of the latest generation ("useful", "not_useful",
+            "not_supported" or "budget_exhausted")
+        generation_attempts: Number of generations so far, used to escalate model tiers
+        best_generation: Latest generation that passed the grounding check,
+            returned if the budget runs out before a useful one
+        best_documents: Documents best_generation was generated from
+        generation_graded: False when the budget ran out and the returned
+            generation was never graded
+        budget: QueryBudget limiting the latency and cost of the run
+        metrics: QueryMetrics recording each node and edge of the run
+        trace: Trace recording the run's span tree
+        vectorstore_documents: Documents from the vectorstore branch of a dual-path route
+        web_documents: Documents from the web search branch of a dual-path route
     """
 
     question: str
     generation: Optional[str]
     documents: Optional[List[Document]]
+    generation_grade: Optional[str]
+    generation_attempts: Optional[int]
+    best_generation: Optional[str]
+    best_documents: Optional[List[Document]]
+    generation_graded: Optional[bool]
+    budget: Optional[Any]
+    metrics: Optional[Any]
+    trace: Optional[Any]
+    vectorstore_documents: Optional[List[Document]]
+    web_documents: Optional[List[Document]]
 
 class WebSearchResult(TypedDict):
     """Structure for web search results."""
@@ -6,7 +6,10 @@ from .document_loader import (
     split_documents,
     create_vectorstore,
     load_and_index_urls,
+    chunk_id,
 )
+from .cache import LRUCache, normalize_query
+from .context_packer import ContextPacker
 
 __all__ = [
     "load_environment",
@@ -16,4 +19,8 @@ __all__ = [
     "split_documents",
     "create_vectorstore",
     "load_and_index_urls",
+    "chunk_id",
+    "LRUCache",
+    "normalize_query",
+    "ContextPacker",
 ]
\ No newline at end of file
@@ -0,0 +1,321 @@
+"""Caching utilities for Adaptive RAG."""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(query: str) -> str:
+    """
+    Normalize query text for use in cache keys.
+
+    Args:
+        query: Raw query text
+
+    Returns:
+        Case-folded query with collapsed whitespace
+    """
+    return " ".join(query.split()).casefold()
+
+class LRUCache:
+    """Thread-safe, size-bounded least-recently-used cache."""
+
+    def __init__(self, max_size: int = 128):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries to keep (0 disables caching)
+        """
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a cached value and mark it as recently used.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry if full.
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+class SQLiteCacheBackend:
+    """Persistent store for TTLCache entries, shared across processes and restarts."""
+
+    def __init__(self, path: str, max_entries: int = 10_000):
+        """
+        Initialize the backend.
+
+        Args:
+            path: SQLite database file, created if missing
+            max_entries: Maximum number of stored entries; the oldest are deleted
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, stored_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_stored_at ON cache (stored_at)")
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Look up a stored entry.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The value and the time it was stored, or None if missing
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def put(self, key: str, value: Any, stored_at: float) -> None:
+        """
+        Store an entry, deleting the oldest ones beyond max_entries.
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+            stored_at: Time the value was produced
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), stored_at),
+            )
+            self._conn.execute(
+                "DELETE FROM cache WHERE key NOT IN (SELECT key FROM cache ORDER BY stored_at DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        """Delete all stored entries."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+class TTLCache:
+    """Thread-safe, size-bounded cache whose entries expire, with stale-while-revalidate."""
+
+    def __init__(
+        self,
+        max_size: int = 256,
+        ttl: float = 600.0,
+        stale_ttl: float = 0.0,
+        backend: Optional[SQLiteCacheBackend] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_size: Maximum number of entries kept in memory (0 disables caching)
+            ttl: Seconds an entry is served as fresh
+            stale_ttl: Further seconds an expired entry is still served while
+                it is refreshed in the background (0 disables stale serving)
+            backend: Optional persistent store consulted on memory misses;
+                values must then be JSON-serializable
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.backend = backend
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._data: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Find an entry in memory, then in the backend. Caller holds the lock."""
+        entry = self._data.get(key)
+        if entry is not None:
+            self._data.move_to_end(key)
+            return entry
+        if self.backend is None:
+            return None
+        entry = self.backend.get(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: Tuple[Any, float]) -> None:
+        """Keep an entry in memory, evicting the least recently used. Caller holds the lock."""
+        self._data[key] = entry
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Look up a fresh cached value.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        if self.max_size <= 0:
+            return None
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None or time.time() - entry[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Store a value as fresh from now.
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        if self.max_size <= 0:
+            return
+        entry = (value, time.time())
+        with self._lock:
+            self._remember(key, entry)
+        if self.backend is not None:
+            try:
+                self.backend.put(key, value, entry[1])
+            except (sqlite3.Error, TypeError, ValueError) as e:
+                logger.warning(f"Could not persist cache entry: {e}")
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Tuple[Any, str]:
+        """
+        Get a value, loading it on a miss and refreshing it in the background when stale.
+
+        Args:
+            key: Cache key
+            loader: Function producing the value; errors on a miss propagate
+
+        Returns:
+            The value and how it was served: "hit", "stale" or "miss"
+        """
+        if self.max_size <= 0:
+            return loader(), "miss"
+        with self._lock:
+            entry = self._lookup(key)
+            age = time.time() - entry[1] if entry is not None else None
+            if age is not None and age <= self.ttl:
+                self.hits += 1
+                return entry[0], "hit"
+            if age is not None and age <= self.ttl + self.stale_ttl:
+                self.stale_hits += 1
+                # One background refresh per key; later callers keep getting the stale value
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    self.refreshes += 1
+                    if self._executor is None:
+                        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rag-cache-refresh")
+                    self._executor.submit(self._refresh, key, loader)
+                return entry[0], "stale"
+            self.misses += 1
+
+        value = loader()
+        self.put(key, value)
+        return value, "miss"
+
+    def _refresh(self, key: str, loader: Callable[[], Any]) -> None:
+        """Reload a stale entry, keeping the stale value if loading fails."""
+        try:
+            self.put(key, loader())
+        except Exception as e:
+            logger.warning(f"Background cache refresh failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def clear(self) -> None:
+        """Remove all entries from memory and the backend."""
+        with self._lock:
+            self._data.clear()
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit, stale hit, miss and refresh counters and current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshes": self.refreshes,
+                "size": len(self._data),
+            }
+
+    def close(self) -> None:
+        """Stop background refreshes and close the backend."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        if self.backend is not None:
+            self.backend.close()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,123 @@
+"""Shared HTTP clients for model providers."""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from .rate_limit import RateLimiterRegistry
+
+class ClientRegistry:
+    """Builds one pooled, keep-alive HTTP client per provider and model."""
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        rate_limiter: Optional[RateLimiterRegistry] = None,
+    ):
+        """
+        Initialize the client registry.
+
+        Args:
+            max_connections: Maximum number of concurrent connections per client
+            max_keepalive_connections: Maximum number of idle connections kept open per client
+            keepalive_expiry: Seconds an idle connection is kept open
+            connect_timeout: Seconds to wait for a connection
+            read_timeout: Seconds to wait for a response
+            rate_limiter: Optional per-model rate limits applied to every request
+        """
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.rate_limiter = rate_limiter
+
+        self._clients: Dict[Tuple[str, str], httpx.Client] = {}
+        self._async_clients: Dict[Tuple[str, str], httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def http_client(self, provider: str = "openai", model: Optional[str] = None) -> httpx.Client:
+        """
+        Get the shared synchronous client for a provider and model.
+
+        Args:
+            provider: Name of the model provider
+            model: Model name, or None for the provider default
+
+        Returns:
+            Pooled HTTP client
+        """
+        key = (provider, model or "default")
+        with self._lock:
+            if key not in self._clients:
+                hooks = self.rate_limiter.limiter(model).httpx_hooks() if self.rate_limiter else None
+                self._clients[key] = httpx.Client(limits=self.limits, timeout=self.timeout, event_hooks=hooks)
+            return self._clients[key]
+
+    def async_http_client(
+        self, provider: str = "openai", model: Optional[str] = None
+    ) -> httpx.AsyncClient:
+        """
+        Get the shared asynchronous client for a provider and model.
+
+        Args:
+            provider: Name of the model provider
+            model: Model name, or None for the provider default
+
+        Returns:
+            Pooled asynchronous HTTP client
+        """
+        key = (provider, model or "default")
+        with self._lock:
+            if key not in self._async_clients:
+                hooks = self.rate_limiter.limiter(model).async_httpx_hooks() if self.rate_limiter else None
+                self._async_clients[key] = httpx.AsyncClient(
+                    limits=self.limits, timeout=self.timeout, event_hooks=hooks
+                )
+            return self._async_clients[key]
+
+    def openai_kwargs(self, model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get keyword arguments that make an OpenAI chat model or embeddings use the shared clients.
+
+        Args:
+            model: Model name
+
+        Returns:
+            Keyword arguments for ChatOpenAI or OpenAIEmbeddings
+        """
+        return {
+            "http_client": self.http_client("openai", model),
+            "http_async_client": self.async_http_client("openai", model),
+            "timeout": self.timeout,
+        }
+
+    def close(self) -> None:
+        """Close all synchronous clients and forget the asynchronous ones."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            # Async clients must be closed from an event loop; dropping them
+            # lets their connections be released with the client
+            self._async_clients.clear()
+        for client in clients:
+            client.close()
+
+def openai_client_kwargs(registry: Optional[ClientRegistry], model: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get shared client arguments for an OpenAI model, if a registry is in use.
+
+    Args:
+        registry: Optional client registry
+        model: Model name
+
+    Returns:
+        Keyword arguments for the model constructor, empty without a registry
+    """
+    return registry.openai_kwargs(model) if registry is not None else {}
@@ -0,0 +1,108 @@
+"""Single-flight coalescing of identical concurrent calls."""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Set, Tuple
+
+class SingleFlight:
+    """
+    Shares one in-flight call among concurrent callers with the same key.
+
+    The first caller for a key runs the call; callers arriving before it
+    finishes wait for its result or exception instead of running their own.
+    Thread and asyncio callers can be mixed and share each other's calls.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.followers = 0
+        self._calls: Dict[Hashable, Future] = {}
+        self._tasks: Set[asyncio.Task] = set()  # Keeps shared async calls referenced
+        self._lock = threading.Lock()
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """Get the in-flight call for a key, registering a new one if there is none."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.followers += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _leave(self, key: Hashable) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, bool]:
+        """
+        Call a function, or wait for the identical call already in flight.
+
+        Args:
+            key: Identifies calls that are interchangeable
+            func: Function to call
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The call's result and whether it was shared from another caller
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            self._leave(key)
+        return result, False
+
+    async def ado(
+        self,
+        key: Hashable,
+        func: Callable[..., Awaitable[Any]],
+        *args: Any,
+        **kwargs: Any,
+    ) -> Tuple[Any, bool]:
+        """
+        Await a coroutine function, or wait for the identical call already in flight.
+
+        The shared call runs as its own task, so cancelling the caller that
+        started it does not cancel it for the others.
+
+        Args:
+            key: Identifies calls that are interchangeable
+            func: Coroutine function to call
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The call's result and whether it was shared from another caller
+        """
+        future, leader = self._join(key)
+        if leader:
+            async def run() -> None:
+                try:
+                    future.set_result(await func(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+                finally:
+                    self._leave(key)
+
+            task = asyncio.ensure_future(run())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return await asyncio.shield(asyncio.wrap_future(future)), not leader
+
+    def stats(self) -> Dict[str, int]:
+        """Return the calls run, the calls that shared another's result and the calls in flight."""
+        with self._lock:
+            return {"leaders": self.leaders, "followers": self.followers, "in_flight": len(self._calls)}
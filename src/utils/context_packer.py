@@ -0,0 +1,168 @@
+"""Token-budgeted context packing for Adaptive RAG."""
+
+import logging
+import re
+import threading
+from typing import List, Optional, Set
+
+import tiktoken
+from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+class _ApproximateEncoding:
+    """Fallback tokenizer used when tiktoken data cannot be loaded (e.g. offline)."""
+
+    # Words, runs of punctuation and whitespace, split into pieces of at most
+    # four characters, which roughly matches BPE token counts for English.
+    _pattern = re.compile(r"\s*\w{1,4}|\s*[^\w\s]{1,4}|\s+")
+
+    def encode(self, text: str) -> List[str]:
+        return self._pattern.findall(text)
+
+    def decode(self, tokens: List[str]) -> str:
+        return "".join(tokens)
+
+def _shingles(text: str, size: int = 3) -> Set[str]:
+    """Return the set of word n-grams in a text."""
+    words = text.lower().split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class ContextPacker:
+    """Packs documents into a prompt context under a token budget."""
+
+    def __init__(
+        self,
+        max_tokens: int = 6000,
+        model_name: str = "gpt-4o-mini",
+        near_duplicate_threshold: float = 0.9,
+        separator: str = "\n\n",
+    ):
+        """
+        Initialize the context packer.
+
+        Args:
+            max_tokens: Maximum number of tokens in the packed context
+            model_name: Model whose tokenizer is used to count tokens
+            near_duplicate_threshold: Word-shingle Jaccard similarity at or above
+                which a passage is dropped as a near duplicate of an earlier one
+            separator: Text placed between passages
+        """
+        self.max_tokens = max_tokens
+        self.model_name = model_name
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.separator = separator
+        self._encoding = None
+        self._encoding_lock = threading.Lock()
+
+    @property
+    def encoding(self):
+        """Tokenizer for the configured model, loaded on first use."""
+        if self._encoding is None:
+            with self._encoding_lock:
+                if self._encoding is None:
+                    self._encoding = self._load_encoding()
+        return self._encoding
+
+    def _load_encoding(self):
+        """Load the tiktoken encoding, falling back to an approximation."""
+        try:
+            try:
+                return tiktoken.encoding_for_model(self.model_name)
+            except KeyError:
+                return tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            logger.warning(f"Could not load tiktoken encoding, approximating token counts: {e}")
+            return _ApproximateEncoding()
+
+    def count_tokens(self, text: str) -> int:
+        """
+        Count the tokens in a text.
+
+        Args:
+            text: Text to count
+
+        Returns:
+            Number of tokens
+        """
+        return len(self.encoding.encode(text))
+
+    def _deduplicate(self, documents: List[Document]) -> List[Document]:
+        """Drop exact and near-duplicate passages, keeping the first occurrence."""
+        seen_texts: Set[str] = set()
+        kept_shingles: List[Set[str]] = []
+        unique = []
+
+        for doc in documents:
+            text = " ".join(doc.page_content.split())
+            if not text or text in seen_texts:
+                continue
+
+            shingles = _shingles(text)
+            if any(
+                len(shingles & other) / len(shingles | other) >= self.near_duplicate_threshold
+                for other in kept_shingles
+            ):
+                continue
+
+            seen_texts.add(text)
+            kept_shingles.append(shingles)
+            unique.append(doc)
+        return unique
+
+    def select(self, documents: List[Document]) -> List[Document]:
+        """
+        Order, deduplicate and truncate documents to fit the token budget.
+
+        Documents are ordered by ``metadata["score"]`` when every document has
+        one, otherwise their retrieval order is kept. The last passage that
+        does not fit is truncated to the remaining budget.
+
+        Args:
+            documents: Documents to pack
+
+        Returns:
+            Documents that fit in the budget, possibly with the last one truncated
+        """
+        if all(isinstance(doc.metadata.get("score"), (int, float)) for doc in documents):
+            documents = sorted(documents, key=lambda doc: doc.metadata["score"], reverse=True)
+
+        separator_tokens = self.count_tokens(self.separator)
+        remaining = self.max_tokens
+        packed = []
+
+        for doc in self._deduplicate(documents):
+            if packed:
+                remaining -= separator_tokens
+            if remaining <= 0:
+                break
+
+            tokens = self.encoding.encode(doc.page_content)
+            if len(tokens) <= remaining:
+                packed.append(doc)
+                remaining -= len(tokens)
+                continue
+
+            packed.append(
+                Document(
+                    page_content=self.encoding.decode(tokens[:remaining]),
+                    metadata={**doc.metadata, "truncated": True},
+                )
+            )
+            break
+
+        return packed
+
+    def pack(self, documents: Optional[List[Document]]) -> str:
+        """
+        Pack documents into a single context string.
+
+        Args:
+            documents: Documents to pack
+
+        Returns:
+            Context string within the token budget
+        """
+        return self.separator.join(doc.page_content for doc in self.select(documents or []))
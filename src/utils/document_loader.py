@@ -1,12 +1,46 @@
 """Document loading and indexing utilities."""
 
-from typing import List, Optional
+import hashlib
+from typing import List, Optional, Tuple
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.document_loaders import WebBaseLoader
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 from langchain.schema import Document
 
+from .clients import ClientRegistry, openai_client_kwargs
+
+def chunk_id(document: Document) -> str:
+    """
+    Get the vectorstore id of a chunk.
+    
+    Ids are derived from the chunk's source and content, so the stored
+    embedding of a retrieved chunk can be looked up by id.
+    
+    Args:
+        document: Chunk to identify
+        
+    Returns:
+        Hex digest identifying the chunk
+    """
+    key = f"{document.metadata.get('source', '')}\0{document.page_content}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def unique_chunks(documents: List[Document]) -> Tuple[List[Document], List[str]]:
+    """
+    Drop repeated chunks and get the id of each remaining one.
+    
+    Args:
+        documents: Chunks to index
+        
+    Returns:
+        Tuple of (chunks, ids)
+    """
+    chunks = {}
+    for document in documents:
+        chunks.setdefault(chunk_id(document), document)
+    return list(chunks.values()), list(chunks)
+
 def load_documents_from_urls(urls: List[str]) -> List[Document]:
     """
     Load documents from a list of URLs.
@@ -53,6 +87,7 @@ def create_vectorstore(
     documents: List[Document],
     collection_name: str = "adaptive-rag-collection",
     embedding_model: Optional[str] = None,
+    client_registry: Optional[ClientRegistry] = None,
 ) -> Chroma:
     """
     Create a vectorstore from documents.
@@ -61,6 +96,7 @@ def create_vectorstore(
         documents: Documents to index
         collection_name: Name for the Chroma collection
         embedding_model: Optional specific OpenAI embedding model to use
+        client_registry: Optional registry of shared HTTP clients
         
     Returns:
         Chroma vectorstore
@@ -70,13 +106,17 @@ def create_vectorstore(
     if embedding_model:
         embedding_kwargs["model"] = embedding_model
         
-    embeddings = OpenAIEmbeddings(**embedding_kwargs)
+    embeddings = OpenAIEmbeddings(
+        **embedding_kwargs, **openai_client_kwargs(client_registry, embedding_model)
+    )
     
     # Create and return the vectorstore
+    documents, ids = unique_chunks(documents)
     return Chroma.from_documents(
         documents=documents,
         collection_name=collection_name,
         embedding=embeddings,
+        ids=ids,
     )
 
 def load_and_index_urls(
@@ -85,6 +125,7 @@ def load_and_index_urls(
     chunk_size: int = 500,
     chunk_overlap: int = 0,
     embedding_model: Optional[str] = None,
+    client_registry: Optional[ClientRegistry] = None,
 ) -> Chroma:
     """
     Load documents from URLs, split them, and create a vectorstore.
@@ -95,6 +136,7 @@ def load_and_index_urls(
         chunk_size: Size of each chunk
         chunk_overlap: Overlap between chunks
         embedding_model: Optional specific OpenAI embedding model to use
+        client_registry: Optional registry of shared HTTP clients
         
     Returns:
         Chroma vectorstore
@@ -114,4 +156,5 @@ def load_and_index_urls(
         split_docs,
         collection_name=collection_name,
         embedding_model=embedding_model,
+        client_registry=client_registry,
     )
\ No newline at end of file
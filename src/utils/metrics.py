@@ -0,0 +1,348 @@
+"""Latency, token and call-count metrics for Adaptive RAG."""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# Histogram buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage currently executing in this context, used to attribute LLM calls and
+# cache hits made by components that know nothing about metrics
+_current_stage: contextvars.ContextVar[Optional["StageRecord"]] = contextvars.ContextVar(
+    "rag_current_stage", default=None
+)
+
+class StageRecord:
+    """Measurements for one execution of a workflow node or edge."""
+
+    def __init__(self, kind: str, name: str, iteration: int):
+        self.kind = kind
+        self.name = name
+        self.iteration = iteration
+        self.seconds = 0.0
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hits = 0
+        self.decision: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def add(self, **amounts: int) -> None:
+        """Add to counters; components may report from several threads."""
+        with self._lock:
+            for field, amount in amounts.items():
+                setattr(self, field, getattr(self, field) + amount)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the measurements as a dictionary."""
+        record = {
+            "kind": self.kind,
+            "name": self.name,
+            "iteration": self.iteration,
+            "seconds": round(self.seconds, 6),
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cache_hits": self.cache_hits,
+        }
+        if self.decision is not None:
+            record["decision"] = self.decision
+        return record
+
+class QueryMetrics:
+    """Per-query record of every node and edge decision."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+        self.stages: List[StageRecord] = []
+        self._visits: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def start_stage(self, kind: str, name: str) -> StageRecord:
+        """
+        Start recording a node or edge.
+
+        Args:
+            kind: "node" or "edge"
+            name: Node or edge name
+
+        Returns:
+            Record for this execution, numbered by how often the stage ran
+        """
+        with self._lock:
+            iteration = self._visits.get((kind, name), 0) + 1
+            self._visits[(kind, name)] = iteration
+            record = StageRecord(kind, name, iteration)
+            self.stages.append(record)
+        return record
+
+    def finish(self) -> None:
+        """Mark the query as finished, fixing its total wall time."""
+        if self.finished is None:
+            self.finished = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the query.
+
+        Returns:
+            The per-stage records in execution order and their totals
+        """
+        with self._lock:
+            stages = [record.to_dict() for record in self.stages]
+        totals = {
+            field: sum(stage[field] for stage in stages)
+            for field in ("llm_calls", "prompt_tokens", "completion_tokens", "cache_hits")
+        }
+        end = self.finished if self.finished is not None else time.perf_counter()
+        totals["seconds"] = round(end - self.started, 6)
+        return {"stages": stages, "totals": totals}
+
+class Histogram:
+    """Cumulative histogram with fixed buckets."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record one value."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        """Return (upper bound, cumulative count) pairs, ending with +Inf."""
+        bounds = [repr(bound) for bound in self.buckets] + ["+Inf"]
+        total = 0
+        cumulative = []
+        for bound, count in zip(bounds, self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+def _escape(value: str) -> str:
+    """Escape a label value for the Prometheus text format."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    """Format labels in the Prometheus text format."""
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+class MetricsRegistry:
+    """Process-wide counters and histograms aggregated across queries."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        """
+        Initialize the registry.
+
+        Args:
+            buckets: Histogram bucket upper bounds in seconds
+        """
+        self.buckets = buckets
+        self._counters: Dict[str, Dict[Tuple[Tuple[str, str], ...], float]] = {}
+        self._histograms: Dict[str, Dict[Tuple[Tuple[str, str], ...], Histogram]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, help_text: str, amount: float = 1, **labels: str) -> None:
+        """Add to a counter."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help.setdefault(name, help_text)
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, help_text: str, value: float, **labels: str) -> None:
+        """Record a value in a histogram."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._help.setdefault(name, help_text)
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(self.buckets)
+            series[key].observe(value)
+
+    def record_stage(self, record: StageRecord) -> None:
+        """Aggregate a finished node or edge execution."""
+        labels = {"kind": record.kind, "stage": record.name}
+        self.observe("rag_stage_seconds", "Wall time of workflow nodes and edges", record.seconds, **labels)
+        self.increment("rag_stage_llm_calls_total", "LLM calls made by workflow stages", record.llm_calls, **labels)
+        self.increment(
+            "rag_stage_tokens_total", "Tokens used by workflow stages",
+            record.prompt_tokens, type="prompt", **labels,
+        )
+        self.increment(
+            "rag_stage_tokens_total", "Tokens used by workflow stages",
+            record.completion_tokens, type="completion", **labels,
+        )
+        self.increment("rag_stage_cache_hits_total", "Cache hits in workflow stages", record.cache_hits, **labels)
+        if record.decision is not None:
+            self.increment(
+                "rag_edge_decisions_total", "Decisions taken by workflow edges",
+                edge=record.name, decision=str(record.decision),
+            )
+
+    def record_query(self, metrics: QueryMetrics) -> None:
+        """Aggregate a finished query."""
+        metrics.finish()
+        summary = metrics.summary()
+        self.observe("rag_query_seconds", "Wall time of whole queries", summary["totals"]["seconds"])
+        self.increment("rag_queries_total", "Queries processed")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Export all metrics as JSON-serializable data.
+
+        Returns:
+            Counters and histograms keyed by metric name, one entry per label set
+        """
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "buckets": dict(histogram.cumulative()),
+                    }
+                    for key, histogram in series.items()
+                ]
+                for name, series in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        """
+        Export all metrics in the Prometheus text exposition format.
+
+        Returns:
+            Metrics text
+        """
+        lines = []
+        with self._lock:
+            for name, series in self._counters.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in self._histograms.items():
+                lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"{name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+@contextmanager
+def track_stage(
+    query_metrics: Optional[QueryMetrics],
+    registry: Optional[MetricsRegistry],
+    kind: str,
+    name: str,
+) -> Iterator[Optional[StageRecord]]:
+    """
+    Measure a workflow node or edge.
+
+    LLM calls and cache hits made while the stage runs, including from
+    threads started with a context-propagating executor, are attributed to it.
+
+    Args:
+        query_metrics: Per-query metrics, or None to skip recording
+        registry: Optional registry that aggregates the finished stage
+        kind: "node" or "edge"
+        name: Node or edge name
+
+    Yields:
+        The stage record, or None when not recording
+    """
+    if query_metrics is None:
+        yield None
+        return
+
+    record = query_metrics.start_stage(kind, name)
+    token = _current_stage.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record.seconds = time.perf_counter() - started
+        _current_stage.reset(token)
+        if registry is not None:
+            registry.record_stage(record)
+
+def record_cache_hit() -> None:
+    """Count a cache hit against the stage running in this context, if any."""
+    record = _current_stage.get()
+    if record is not None:
+        record.add(cache_hits=1)
+
+def token_usage(response: LLMResult) -> Tuple[int, int]:
+    """Extract prompt and completion token counts from an LLM response, if reported."""
+    prompt = completion = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt += usage.get("input_tokens", 0)
+                completion += usage.get("output_tokens", 0)
+    if prompt or completion:
+        return prompt, completion
+
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """Callback handler that attributes LLM calls and tokens to the running stage."""
+
+    def __init__(self):
+        self._stages: Dict[UUID, StageRecord] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID) -> None:
+        record = _current_stage.get()
+        if record is None:
+            return
+        record.add(llm_calls=1)
+        with self._lock:
+            self._stages[run_id] = record
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._start(run_id)
+
+    def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._start(run_id)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            record = self._stages.pop(run_id, None)
+        if record is not None:
+            prompt, completion = token_usage(response)
+            record.add(prompt_tokens=prompt, completion_tokens=completion)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            self._stages.pop(run_id, None)
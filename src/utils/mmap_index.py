@@ -0,0 +1,337 @@
+"""Read-only memory-mapped vector index shared by serving processes.
+
+One builder process publishes index versions into a directory; any number of
+worker processes map the current version read-only, so its pages are held
+once in the OS page cache however many workers there are.
+
+Directory layout:
+
+    <root>/CURRENT              name of the published version
+    <root>/versions/<version>/  vectors.npy, texts.bin, metadata.bin,
+                                their offsets and manifest.json
+
+Publishing writes a complete version directory first and then replaces
+CURRENT with os.replace, so readers always see either the old or the new
+version, never a partial one.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from langchain_openai import OpenAIEmbeddings
+
+from .clients import ClientRegistry, openai_client_kwargs
+from .rate_limit import request_priority, shared_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+
+def _fsync(path: Path) -> None:
+    """Flush a file or directory to disk."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return  # Directories cannot be opened on every platform
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _write_blobs(path: Path, items: Sequence[bytes]) -> np.ndarray:
+    """Concatenate byte strings into one file and return their offsets."""
+    offsets = np.zeros(len(items) + 1, dtype=np.int64)
+    with open(path, "wb") as f:
+        for index, item in enumerate(items):
+            f.write(item)
+            offsets[index + 1] = offsets[index] + len(item)
+    return offsets
+
+def publish_index(
+    root: str,
+    vectors: Any,
+    texts: Sequence[str],
+    metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+    keep: int = 3,
+) -> str:
+    """
+    Write a new index version and make it the current one.
+
+    Args:
+        root: Index directory shared with the readers
+        vectors: Chunk embeddings, one row per text
+        texts: Chunk texts
+        metadatas: Optional metadata of each chunk, JSON-serializable
+        keep: Number of versions kept, including the new one; readers still
+            mapping a deleted version keep their mapping until they move on
+
+    Returns:
+        Name of the published version
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim != 2 or len(matrix) != len(texts):
+        raise ValueError("vectors must have one row per text")
+    metadatas = list(metadatas) if metadatas is not None else [{} for _ in texts]
+    if len(metadatas) != len(texts):
+        raise ValueError("metadatas must have one entry per text")
+
+    # Unit rows turn cosine similarity into a single matrix product at query time
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix = matrix / np.maximum(norms, 1e-12)
+
+    versions = Path(root) / VERSIONS_DIR
+    versions.mkdir(parents=True, exist_ok=True)
+    # Names sort by publish time, which is the order old versions are pruned in
+    version = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+    staging = versions / f".{version}.tmp"
+    staging.mkdir()
+
+    np.save(staging / "vectors.npy", matrix)
+    np.save(staging / "text_offsets.npy", _write_blobs(staging / "texts.bin", [text.encode("utf-8") for text in texts]))
+    np.save(
+        staging / "metadata_offsets.npy",
+        _write_blobs(staging / "metadata.bin", [json.dumps(metadata).encode("utf-8") for metadata in metadatas]),
+    )
+    manifest = {"version": version, "count": len(texts), "dimensions": int(matrix.shape[1]), "created_at": time.time()}
+    (staging / "manifest.json").write_text(json.dumps(manifest), encoding="utf-8")
+    for path in staging.iterdir():
+        _fsync(path)
+
+    os.replace(staging, versions / version)
+    _fsync(versions)
+
+    # Swap the pointer; readers pick up the new version on their next check
+    current = Path(root) / CURRENT_FILE
+    pointer = Path(root) / f".{CURRENT_FILE}.{uuid.uuid4().hex[:8]}.tmp"
+    pointer.write_text(version, encoding="utf-8")
+    _fsync(pointer)
+    os.replace(pointer, current)
+    _fsync(Path(root))
+    logger.info(f"Published index version {version} with {len(texts)} chunks")
+
+    _prune_versions(versions, version, keep)
+    return version
+
+def _prune_versions(versions: Path, current: str, keep: int) -> None:
+    """Delete the oldest versions beyond keep, never the current one."""
+    names = sorted(path.name for path in versions.iterdir() if path.is_dir() and not path.name.startswith("."))
+    for name in names[:max(0, len(names) - max(keep, 1))]:
+        if name == current:
+            continue
+        try:
+            shutil.rmtree(versions / name)
+        except OSError as e:
+            # Mapped files cannot be deleted on some platforms; retry on the next publish
+            logger.warning(f"Could not delete index version {name}: {e}")
+
+def current_version(root: str) -> Optional[str]:
+    """Get the name of the published version, or None if nothing has been published."""
+    try:
+        return (Path(root) / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+class IndexVersion:
+    """One published index version, mapped read-only."""
+
+    def __init__(self, root: str, version: str):
+        """
+        Map a version.
+
+        Args:
+            root: Index directory
+            version: Name of the version to map
+        """
+        path = Path(root) / VERSIONS_DIR / version
+        self.version = version
+        self.manifest = json.loads((path / "manifest.json").read_text(encoding="utf-8"))
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        self._texts = np.memmap(path / "texts.bin", dtype=np.uint8, mode="r") if self._size(path / "texts.bin") else None
+        self._text_offsets = np.load(path / "text_offsets.npy", mmap_mode="r")
+        self._metadata = np.memmap(path / "metadata.bin", dtype=np.uint8, mode="r") if self._size(path / "metadata.bin") else None
+        self._metadata_offsets = np.load(path / "metadata_offsets.npy", mmap_mode="r")
+
+    @staticmethod
+    def _size(path: Path) -> int:
+        # Empty files cannot be mapped
+        return path.stat().st_size
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def text(self, index: int) -> str:
+        """Decode the text of a chunk."""
+        if self._texts is None:
+            return ""
+        start, end = int(self._text_offsets[index]), int(self._text_offsets[index + 1])
+        return bytes(self._texts[start:end]).decode("utf-8")
+
+    def metadata(self, index: int) -> Dict[str, Any]:
+        """Decode the metadata of a chunk."""
+        if self._metadata is None:
+            return {}
+        start, end = int(self._metadata_offsets[index]), int(self._metadata_offsets[index + 1])
+        return json.loads(bytes(self._metadata[start:end]))
+
+    def document(self, index: int) -> Document:
+        """Build the document of a chunk."""
+        return Document(page_content=self.text(index), metadata=self.metadata(index))
+
+    def search(self, embedding: Sequence[float], k: int) -> List[Tuple[int, float]]:
+        """
+        Find the chunks most similar to an embedding.
+
+        Args:
+            embedding: Query embedding
+            k: Number of results
+
+        Returns:
+            (chunk index, relevance) pairs, best first. Relevance is on the
+            scale of Chroma's default relevance scores, so the same adaptive
+            retrieval thresholds apply
+        """
+        if not len(self.vectors) or k <= 0:
+            return []
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        similarities = self.vectors @ query
+        k = min(k, len(similarities))
+        top = np.argpartition(-similarities, k - 1)[:k]
+        top = top[np.argsort(-similarities[top])]
+        # Squared L2 distance between unit vectors is 2 - 2 cos
+        return [(int(index), 1.0 - (2.0 - 2.0 * float(similarities[index])) / np.sqrt(2)) for index in top]
+
+class SharedIndexReader:
+    """Follows the published version of a shared index, remapping when it changes."""
+
+    def __init__(self, root: str, check_interval: float = 1.0):
+        """
+        Initialize the reader.
+
+        Args:
+            root: Index directory written by the builder
+            check_interval: Minimum seconds between checks for a new version
+        """
+        self.root = root
+        self.check_interval = check_interval
+        self._index: Optional[IndexVersion] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[IndexVersion]:
+        """
+        Get the current version, switching to a newly published one if there is one.
+
+        Returns:
+            The mapped version, or None if nothing has been published yet
+        """
+        now = time.monotonic()
+        if self._index is not None and now - self._checked < self.check_interval:
+            return self._index
+        with self._lock:
+            if self._index is not None and now - self._checked < self.check_interval:
+                return self._index
+            self._checked = now
+            version = current_version(self.root)
+            if version is not None and (self._index is None or self._index.version != version):
+                try:
+                    # Searches holding the old version finish on it; its mapping
+                    # is released once they drop their reference
+                    self._index = IndexVersion(self.root, version)
+                    logger.info(f"Switched to index version {version}")
+                except (OSError, ValueError) as e:
+                    logger.error(f"Could not map index version {version}: {e}")
+            return self._index
+
+def build_index(
+    root: str,
+    urls: List[str],
+    chunk_size: int = 500,
+    chunk_overlap: int = 0,
+    embedding_model: Optional[str] = None,
+    batch_size: int = 256,
+    keep: int = 3,
+    client_registry: Optional[ClientRegistry] = None,
+) -> str:
+    """
+    Crawl, split and embed documents, then publish them as a new version.
+
+    Args:
+        root: Index directory shared with the readers
+        urls: URLs to index
+        chunk_size: Size of each chunk
+        chunk_overlap: Overlap between chunks
+        embedding_model: Optional specific OpenAI embedding model
+        batch_size: Chunks embedded per request
+        keep: Number of versions kept
+        client_registry: Optional registry of shared HTTP clients and rate limits
+
+    Returns:
+        Name of the published version
+    """
+    from .document_loader import load_documents_from_urls, split_documents
+
+    chunks = split_documents(load_documents_from_urls(urls), chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    embeddings = OpenAIEmbeddings(
+        **({"model": embedding_model} if embedding_model else {}),
+        **openai_client_kwargs(client_registry, embedding_model),
+    )
+    texts = [chunk.page_content for chunk in chunks]
+    vectors: List[List[float]] = []
+    # Rebuilding the index yields the shared quota to interactive queries
+    with request_priority("bulk"):
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(embeddings.embed_documents(texts[start:start + batch_size]))
+    return publish_index(
+        root,
+        np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1),
+        texts,
+        [chunk.metadata for chunk in chunks],
+        keep=keep,
+    )
+
+def main():
+    """Build and publish a shared index from the command line."""
+    from ..config import Config
+    from .env_setup import setup_required_env_vars
+
+    parser = argparse.ArgumentParser(description="Build a shared memory-mapped index for serving workers")
+    parser.add_argument("root", help="Index directory shared with the workers")
+    parser.add_argument("--url", action="append", dest="urls", help="URL to index (default: the configured URLs)")
+    parser.add_argument("--keep", type=int, default=3, help="Versions kept, including the new one")
+    args = parser.parse_args()
+
+    setup_required_env_vars()
+    config = Config()
+    rate_limit_settings = dict(config.rate_limit_settings)
+    rate_limiter = shared_rate_limiter(**rate_limit_settings) if rate_limit_settings.pop("enabled") else None
+    client_registry = ClientRegistry(**config.client_settings, rate_limiter=rate_limiter)
+    try:
+        version = build_index(
+            args.root,
+            args.urls or config.document_urls,
+            chunk_size=config.vectorstore_settings["chunk_size"],
+            chunk_overlap=config.vectorstore_settings["chunk_overlap"],
+            keep=args.keep,
+            client_registry=client_registry,
+        )
+    finally:
+        client_registry.close()
+    print(f"Published {version}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""Opt-in per-query profiling for Adaptive RAG."""
+
+import cProfile
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Modules whose frames mark a thread as idle when they are at the top of its stack
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py")
+
+class QueryThreads:
+    """Threads currently doing work for one profiled query."""
+
+    def __init__(self):
+        self._counts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, thread_id: int) -> None:
+        with self._lock:
+            self._counts[thread_id] = self._counts.get(thread_id, 0) + 1
+
+    def discard(self, thread_id: int) -> None:
+        with self._lock:
+            count = self._counts.get(thread_id, 0) - 1
+            if count > 0:
+                self._counts[thread_id] = count
+            else:
+                self._counts.pop(thread_id, None)
+
+    def snapshot(self) -> Set[int]:
+        """Return the ids of the threads working for the query right now."""
+        with self._lock:
+            return set(self._counts)
+
+# Threads of the query being profiled in this context, if it is profiled
+_query_threads: contextvars.ContextVar[Optional[QueryThreads]] = contextvars.ContextVar(
+    "rag_query_threads", default=None
+)
+
+@contextmanager
+def track_thread() -> Iterator[None]:
+    """
+    Count the current thread as working for this context's profiled query while the block runs.
+
+    Pool threads serve many queries, so they are only sampled for a query
+    while they run one of its tasks.
+    """
+    threads = _query_threads.get()
+    if threads is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    threads.add(thread_id)
+    try:
+        yield
+    finally:
+        threads.discard(thread_id)
+
+class QueryThreadPoolExecutor(ContextThreadPoolExecutor):
+    """Context-propagating executor whose tasks are sampled with the profiled query that submitted them."""
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any):
+        def run(*args: Any, **kwargs: Any) -> Any:
+            with track_thread():
+                return func(*args, **kwargs)
+
+        return super().submit(run, *args, **kwargs)
+
+class StackSampler:
+    """Samples the Python stacks of running threads at a fixed interval."""
+
+    def __init__(self, interval: float = 0.005, threads: Optional[QueryThreads] = None):
+        """
+        Initialize the sampler.
+
+        Args:
+            interval: Seconds between samples
+            threads: Optional threads to sample; all threads are sampled without it
+        """
+        self.interval = interval
+        self.threads = threads
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        frames = sys._current_frames()
+        if self.threads is not None:
+            # Walk only the query's threads, not every thread of a busy server
+            frames = {thread_id: frames[thread_id] for thread_id in self.threads.snapshot() if thread_id in frames}
+        for thread_id, frame in frames.items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame))
+                frame = frame.f_back
+            # Threads waiting on locks or queues are not doing work for the query
+            if not stack or stack[0].split(":")[0] in _IDLE_MODULES:
+                continue
+            self.samples[";".join(reversed(stack))] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        self._thread = threading.Thread(target=self._run, name="rag-stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        """
+        Format the samples as collapsed stacks.
+
+        Returns:
+            One "frame;frame;frame count" line per distinct stack, the input
+            format of flamegraph.pl and speedscope
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+class ProfileRun:
+    """One profiled query."""
+
+    def __init__(self, profile_id: str, question: str, mode: str):
+        self.profile_id = profile_id
+        self.question = question
+        self.mode = mode
+        self.seconds = 0.0
+        self.metrics: Optional[Any] = None  # QueryMetrics of the profiled query
+        self.paths: Dict[str, str] = {}
+
+    def breakdown(self) -> Dict[str, Any]:
+        """
+        Summarize where the query spent its time.
+
+        Returns:
+            Total wall time, per-node and per-edge seconds, and the stage records
+        """
+        summary = self.metrics.summary() if self.metrics is not None else {"stages": [], "totals": {}}
+        per_stage: Dict[str, float] = {}
+        for stage in summary["stages"]:
+            key = f"{stage['kind']}:{stage['name']}"
+            per_stage[key] = round(per_stage.get(key, 0.0) + stage["seconds"], 6)
+        return {
+            "id": self.profile_id,
+            "question": self.question,
+            "mode": self.mode,
+            "seconds": round(self.seconds, 6),
+            "per_stage_seconds": dict(sorted(per_stage.items(), key=lambda item: -item[1])),
+            "stages": summary["stages"],
+            "totals": summary["totals"],
+        }
+
+class QueryProfiler:
+    """Wraps individual queries in a profiler and writes the results to disk."""
+
+    def __init__(
+        self,
+        output_dir: str = "profiles",
+        sample_rate: float = 0.0,
+        mode: str = "sampling",
+        interval: float = 0.005,
+        max_profiles: int = 100,
+    ):
+        """
+        Initialize the profiler.
+
+        Args:
+            output_dir: Directory the profiles are written to
+            sample_rate: Fraction of queries profiled without being requested
+            mode: "sampling" to sample the stacks of the threads working for
+                the query, or "cprofile" for a deterministic profile of the
+                calling thread only
+            interval: Seconds between stack samples in sampling mode
+            max_profiles: Number of profiles kept; older ones are deleted
+        """
+        if mode not in ("sampling", "cprofile"):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+        self.output_dir = Path(output_dir)
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def should_profile(self, requested: Optional[bool] = None) -> bool:
+        """
+        Decide whether to profile a query.
+
+        Args:
+            requested: True or False to force a decision, None to sample
+
+        Returns:
+            Whether the query should be profiled
+        """
+        if requested is not None:
+            return requested
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, question: str) -> Iterator[ProfileRun]:
+        """
+        Profile the code run inside the block.
+
+        Set the yielded run's metrics to the query's QueryMetrics so that the
+        per-node breakdown is written with the profile.
+
+        Args:
+            question: Question being answered, recorded with the profile
+
+        Yields:
+            The profile run; its paths are filled in when the block exits
+        """
+        run = ProfileRun(
+            profile_id=f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}",
+            question=question,
+            mode=self.mode,
+        )
+        sampler = profiler = None
+        threads = QueryThreads()
+        threads_token = _query_threads.set(threads)
+        if self.mode == "sampling":
+            sampler = StackSampler(self.interval, threads=threads)
+            sampler.start()
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # Only one deterministic profiler can be active at a time
+                logger.warning(f"Could not start profiler, running unprofiled: {e}")
+                profiler = None
+
+        started = time.perf_counter()
+        try:
+            with track_thread():
+                yield run
+        finally:
+            run.seconds = time.perf_counter() - started
+            _query_threads.reset(threads_token)
+            if sampler is not None:
+                sampler.stop()
+            if profiler is not None:
+                profiler.disable()
+            try:
+                self._write(run, sampler, profiler)
+            except OSError as e:
+                logger.error(f"Could not write profile {run.profile_id}: {e}")
+
+    def _write(
+        self,
+        run: ProfileRun,
+        sampler: Optional[StackSampler],
+        profiler: Optional[cProfile.Profile],
+    ) -> None:
+        """Write a profile and its breakdown, then prune old profiles."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        base = self.output_dir / run.profile_id
+        if sampler is not None:
+            path = base.with_suffix(".folded")
+            path.write_text(sampler.collapsed(), encoding="utf-8")
+            run.paths["profile"] = str(path)
+        elif profiler is not None:
+            path = base.with_suffix(".prof")
+            profiler.dump_stats(str(path))
+            run.paths["profile"] = str(path)
+
+        breakdown_path = base.with_suffix(".json")
+        breakdown_path.write_text(json.dumps(run.breakdown(), indent=2), encoding="utf-8")
+        run.paths["breakdown"] = str(breakdown_path)
+        self._prune()
+
+    def _prune(self) -> None:
+        """Delete the oldest profiles beyond max_profiles."""
+        with self._lock:
+            breakdowns: List[Path] = sorted(self.output_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+            for old in breakdowns[:max(0, len(breakdowns) - self.max_profiles)]:
+                for suffix in (".json", ".folded", ".prof"):
+                    old.with_suffix(suffix).unlink(missing_ok=True)
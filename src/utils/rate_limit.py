@@ -0,0 +1,321 @@
+"""Process-wide client-side rate limiting for model provider requests."""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, served in this order. Lower classes also leave part of
+# each bucket unused so that interactive requests arriving later find capacity.
+PRIORITIES = {"interactive": 0, "batch": 1, "bulk": 2}
+PRIORITY_RESERVE = {"interactive": 0.0, "batch": 0.1, "bulk": 0.25}
+
+# Priority of requests made in this context
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("rag_request_priority", default="interactive")
+
+@contextmanager
+def request_priority(priority: str) -> Iterator[None]:
+    """
+    Run provider requests made inside the block at a priority class.
+
+    Args:
+        priority: "interactive", "batch" or "bulk"
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown request priority: {priority}")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def current_priority() -> str:
+    """Get the priority class of requests made in this context."""
+    return _priority.get()
+
+def estimate_tokens(body: bytes) -> int:
+    """
+    Estimate the tokens a chat or embedding request counts against the limit.
+
+    Args:
+        body: JSON request body
+
+    Returns:
+        Roughly four characters per token of input, plus the requested
+        completion tokens
+    """
+    try:
+        payload = json.loads(body or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        return max(1, len(body) // 4)
+    if not isinstance(payload, dict):
+        return max(1, len(body) // 4)
+
+    chars = 0
+    for message in payload.get("messages") or []:
+        content = message.get("content") if isinstance(message, dict) else None
+        if isinstance(content, str):
+            chars += len(content)
+        elif isinstance(content, list):
+            chars += sum(len(part.get("text", "")) for part in content if isinstance(part, dict))
+    inputs = payload.get("input")
+    if isinstance(inputs, str):
+        chars += len(inputs)
+    elif isinstance(inputs, list):
+        # Pre-tokenized inputs are lists of token ids
+        chars += sum(len(item) if isinstance(item, str) else 4 * len(item) for item in inputs)
+    completion = payload.get("max_completion_tokens") or payload.get("max_tokens") or 0
+    return max(1, chars // 4 + completion)
+
+def _retry_after(response: httpx.Response) -> float:
+    """Seconds a provider asked us to wait after a 429 response."""
+    try:
+        return max(0.0, float(response.headers.get("retry-after", 1.0)))
+    except ValueError:
+        return 1.0
+
+class ModelRateLimiter:
+    """Token buckets for the requests and tokens per minute allowed for one model."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        burst_seconds: float = 10.0,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_minute: Request rate, or None for no limit
+            tokens_per_minute: Token rate, or None for no limit
+            burst_seconds: Seconds of traffic that may be sent at once after
+                an idle period; smaller values give smoother throughput
+        """
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.request_capacity = requests_per_minute / 60 * burst_seconds if requests_per_minute else None
+        self.token_capacity = tokens_per_minute / 60 * burst_seconds if tokens_per_minute else None
+        self.requests = self.request_capacity or 0.0
+        self.tokens = self.token_capacity or 0.0
+        self.paused_until = 0.0
+
+        self.granted = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.request_capacity is not None:
+            self.requests = min(self.request_capacity, self.requests + elapsed * self.requests_per_minute / 60)
+        if self.token_capacity is not None:
+            self.tokens = min(self.token_capacity, self.tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _delay(self, tokens: int, priority: str, now: float) -> float:
+        """Seconds until both buckets can cover a request at a priority."""
+        delay = max(0.0, self.paused_until - now)
+        reserve = PRIORITY_RESERVE[priority]
+        if self.request_capacity is not None:
+            needed = min(1 + reserve * self.request_capacity, self.request_capacity)
+            delay = max(delay, (needed - self.requests) * 60 / self.requests_per_minute)
+        if self.token_capacity is not None:
+            # Requests larger than the bucket go through once it is full
+            needed = min(tokens + reserve * self.token_capacity, self.token_capacity)
+            delay = max(delay, (needed - self.tokens) * 60 / self.tokens_per_minute)
+        return delay
+
+    def acquire(self, tokens: int = 0, priority: Optional[str] = None) -> float:
+        """
+        Block until a request may be sent, serving higher priorities first.
+
+        Args:
+            tokens: Estimated tokens of the request
+            priority: Priority class, or None for the context's priority
+
+        Returns:
+            Seconds spent waiting
+        """
+        priority = priority or current_priority()
+        started = time.monotonic()
+        with self._condition:
+            ticket = (PRIORITIES[priority], next(self._sequence))
+            heapq.heappush(self._waiters, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if self._waiters[0] != ticket:
+                        # Wait for the requests ahead of this one
+                        self._condition.wait()
+                        continue
+                    delay = self._delay(tokens, priority, now)
+                    if delay <= 0:
+                        break
+                    self._condition.wait(timeout=delay)
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+            self.requests -= 1
+            self.tokens -= tokens
+            waited = time.monotonic() - started
+            self.granted += 1
+            self.wait_seconds += waited
+            return waited
+
+    def adjust(self, tokens: int) -> None:
+        """Charge (or refund, if negative) tokens once the actual usage is known."""
+        with self._condition:
+            self.tokens -= tokens
+            self._condition.notify_all()
+
+    def pause(self, seconds: float) -> None:
+        """Hold all requests for a while, e.g. after the provider returned 429."""
+        with self._condition:
+            self.throttled += 1
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.requests = min(self.requests, 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return request counts, time spent waiting and provider throttling."""
+        with self._condition:
+            return {
+                "granted": self.granted,
+                "throttled": self.throttled,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "queued": len(self._waiters),
+            }
+
+    def _on_request(self, request: httpx.Request) -> None:
+        tokens = estimate_tokens(request.content)
+        request.extensions["rag_estimated_tokens"] = tokens
+        self.acquire(tokens)
+
+    def _on_response(self, response: httpx.Response) -> None:
+        if response.status_code == 429:
+            self.pause(_retry_after(response))
+            return
+        # Streamed responses report usage in the stream; keep the estimate for those
+        if not response.headers.get("content-type", "").startswith("application/json"):
+            return
+        try:
+            response.read()
+            usage = response.json().get("usage") or {}
+        except (ValueError, AttributeError, httpx.HTTPError):
+            return
+        if "total_tokens" in usage:
+            self.adjust(usage["total_tokens"] - response.request.extensions.get("rag_estimated_tokens", 0))
+
+    def httpx_hooks(self) -> Dict[str, list]:
+        """Get event hooks that apply this limiter to a synchronous httpx client."""
+        return {"request": [self._on_request], "response": [self._on_response]}
+
+    def async_httpx_hooks(self) -> Dict[str, list]:
+        """Get event hooks that apply this limiter to an asynchronous httpx client."""
+        async def on_request(request: httpx.Request) -> None:
+            # Waiting happens in a worker thread so the event loop keeps running
+            await asyncio.to_thread(self._on_request, request)
+
+        async def on_response(response: httpx.Response) -> None:
+            if response.status_code == 429:
+                self.pause(_retry_after(response))
+                return
+            if response.headers.get("content-type", "").startswith("application/json"):
+                await response.aread()
+                self._on_response(response)
+
+        return {"request": [on_request], "response": [on_response]}
+
+class RateLimiterRegistry:
+    """One rate limiter per model, shared by every client that calls it."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        burst_seconds: float = 10.0,
+        models: Optional[Dict[str, Dict[str, Any]]] = None,
+    ):
+        """
+        Initialize the registry.
+
+        Args:
+            requests_per_minute: Default request rate per model
+            tokens_per_minute: Default token rate per model
+            burst_seconds: Seconds of traffic that may be sent at once
+            models: Per-model overrides of the settings above
+        """
+        self.defaults = {
+            "requests_per_minute": requests_per_minute,
+            "tokens_per_minute": tokens_per_minute,
+            "burst_seconds": burst_seconds,
+        }
+        self.models = models or {}
+        self._limiters: Dict[str, ModelRateLimiter] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, model: Optional[str] = None) -> ModelRateLimiter:
+        """
+        Get the limiter for a model.
+
+        Args:
+            model: Model name, or None for the provider default
+
+        Returns:
+            The model's shared limiter
+        """
+        key = model or "default"
+        with self._lock:
+            if key not in self._limiters:
+                self._limiters[key] = ModelRateLimiter(**{**self.defaults, **self.models.get(key, {})})
+            return self._limiters[key]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the statistics of every model's limiter."""
+        with self._lock:
+            limiters = dict(self._limiters)
+        return {model: limiter.stats() for model, limiter in limiters.items()}
+
+_shared: Optional[RateLimiterRegistry] = None
+_shared_lock = threading.Lock()
+
+def shared_rate_limiter(**settings: Any) -> RateLimiterRegistry:
+    """
+    Get the process-wide rate limiter registry, creating it on first use.
+
+    Every system in the process draws from the same provider quota, so they
+    share one registry. Settings passed after it has been created are ignored.
+
+    Args:
+        **settings: Arguments for RateLimiterRegistry
+
+    Returns:
+        The shared registry
+    """
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = RateLimiterRegistry(**settings)
+        elif settings and settings != _shared_settings(_shared):
+            logger.warning("Rate limiter already configured for this process; ignoring new settings")
+        return _shared
+
+def _shared_settings(registry: RateLimiterRegistry) -> Dict[str, Any]:
+    return {**registry.defaults, "models": registry.models}
@@ -0,0 +1,402 @@
+"""Deadlines, hedged requests and circuit breakers for external calls."""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+import openai
+
+from .profiling import QueryThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Tag prefix identifying the attempt of a resilient call a model run belongs to
+ATTEMPT_TAG_PREFIX = "resilience_attempt:"
+
+# Attempt running in the current context, and recently abandoned attempts (oldest first)
+_current_attempt: ContextVar[Optional[str]] = ContextVar("resilience_attempt", default=None)
+_abandoned: "OrderedDict[str, None]" = OrderedDict()
+_abandoned_lock = threading.Lock()
+_MAX_ABANDONED = 1024
+
+class DeadlineExceeded(TimeoutError):
+    """An external call did not finish before its deadline."""
+
+class CircuitOpenError(RuntimeError):
+    """An external service is failing, so calls to it are rejected without trying."""
+
+def is_service_failure(error: BaseException) -> bool:
+    """
+    Decide whether an error means the service is unhealthy.
+
+    Args:
+        error: Error raised by a call
+
+    Returns:
+        True for transport errors, timeouts, rate limiting and 5xx responses;
+        False for errors a healthy service produces, e.g. malformed output
+    """
+    if isinstance(error, (ConnectionError, TimeoutError, httpx.TransportError, openai.APIConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+def attempt_tags() -> List[str]:
+    """
+    Get run tags identifying the current attempt of a resilient call.
+
+    Returns:
+        A tag naming the attempt when called from inside one, else no tags
+    """
+    attempt = _current_attempt.get()
+    return [f"{ATTEMPT_TAG_PREFIX}{attempt}"] if attempt is not None else []
+
+def is_abandoned(tags: List[str]) -> bool:
+    """
+    Decide whether a run belongs to an attempt that was abandoned.
+
+    Args:
+        tags: Tags of the run, as produced with attempt_tags
+
+    Returns:
+        True if the run's attempt missed its deadline or lost a hedged race,
+        so its output will never be used
+    """
+    with _abandoned_lock:
+        return any(
+            tag.startswith(ATTEMPT_TAG_PREFIX) and tag[len(ATTEMPT_TAG_PREFIX):] in _abandoned
+            for tag in tags
+        )
+
+def _abandon(attempt: str) -> None:
+    """Record an attempt as abandoned, forgetting the oldest ones."""
+    with _abandoned_lock:
+        _abandoned[attempt] = None
+        while len(_abandoned) > _MAX_ABANDONED:
+            _abandoned.popitem(last=False)
+
+class CircuitBreaker:
+    """Fails fast after repeated failures, then lets a single probe through."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize the breaker.
+
+        Args:
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds the circuit stays open before a probe call
+                is allowed; a successful probe closes it again
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    @property
+    def state(self) -> str:
+        """"closed", "open", or "half_open" when a probe call may be made."""
+        with self._lock:
+            return self._state()
+
+    @property
+    def is_open(self) -> bool:
+        """Whether calls are currently rejected."""
+        with self._lock:
+            state = self._state()
+            return state == "open" or (state == "half_open" and self._probing)
+
+    def allow(self) -> bool:
+        """
+        Decide whether a call may be made, reserving the probe when half open.
+
+        Returns:
+            Whether to make the call
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Record a successful call, closing the circuit."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit at the threshold or after a failed probe."""
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._probing:
+                    logger.warning(f"Circuit opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+class ResiliencePolicy:
+    """Applies a deadline, hedging and a circuit breaker to calls to one service."""
+
+    def __init__(
+        self,
+        name: str,
+        executor: QueryThreadPoolExecutor,
+        timeout: Optional[float] = None,
+        hedge: bool = False,
+        hedge_quantile: float = 95.0,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 0.05,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        window: int = 200,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            name: Service name, used in errors and logs
+            executor: Executor that runs calls with a deadline or hedging
+            timeout: Seconds before a call is abandoned, or None for no deadline
+            hedge: Whether to send a duplicate call when the first is slow
+            hedge_quantile: Latency percentile after which the duplicate is sent
+            hedge_min_samples: Successful calls observed before hedging starts
+            hedge_min_delay: Minimum seconds before a duplicate is sent
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds before an open circuit allows a probe call
+            window: Number of recent latencies the hedge delay is computed from
+        """
+        self.name = name
+        self.executor = executor
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._counts = {
+            "calls": 0, "successes": 0, "failures": 0, "timeouts": 0,
+            "errors": 0, "rejected": 0, "hedges": 0, "hedge_wins": 0,
+        }
+        self._lock = threading.Lock()
+
+    def _count(self, **amounts: int) -> None:
+        with self._lock:
+            for key, amount in amounts.items():
+                self._counts[key] += amount
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Seconds after which a duplicate call is sent.
+
+        Returns:
+            The configured percentile of recent latencies, or None when
+            hedging is off or too few calls have been observed
+        """
+        if not self.hedge:
+            return None
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        index = min(len(latencies) - 1, int(len(latencies) * self.hedge_quantile / 100))
+        return max(self.hedge_min_delay, latencies[index])
+
+    def check(self) -> None:
+        """Raise CircuitOpenError if calls to the service are being rejected."""
+        if not self.breaker.allow():
+            self._count(rejected=1)
+            raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def _success(self, latency: float) -> None:
+        self.breaker.record_success()
+        with self._lock:
+            self._counts["successes"] += 1
+            self._latencies.append(latency)
+
+    def _failure(self, timed_out: bool = False) -> None:
+        self.breaker.record_failure()
+        self._count(failures=1, timeouts=int(timed_out))
+
+    def _error(self, error: BaseException) -> None:
+        if not is_service_failure(error):
+            # The service answered; the error is the caller's to handle
+            self.breaker.record_success()
+            self._count(errors=1)
+            return
+        self._failure()
+
+    def call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Call a function under the policy.
+
+        Only transport errors, timeouts, rate limiting and 5xx responses count
+        against the circuit; other errors are re-raised without opening it.
+        Attempts with a deadline or hedging run under their own attempt_tags,
+        so output an abandoned attempt streams can be told apart with is_abandoned.
+
+        Args:
+            func: Function making the external call
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            The result of the first attempt to succeed
+
+        Raises:
+            CircuitOpenError: The circuit is open
+            DeadlineExceeded: No attempt finished before the deadline
+        """
+        self.check()
+        self._count(calls=1)
+
+        if self.timeout is None and not self.hedge:
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._error(e)
+                raise
+            self._success(time.perf_counter() - started)
+            return result
+
+        def attempt(attempt_id: str) -> Tuple[Any, float]:
+            token = _current_attempt.set(attempt_id)
+            try:
+                attempt_started = time.perf_counter()
+                return func(*args, **kwargs), time.perf_counter() - attempt_started
+            finally:
+                _current_attempt.reset(token)
+
+        def submit() -> Future:
+            attempt_id = uuid.uuid4().hex
+            future = self.executor.submit(attempt, attempt_id)
+            attempt_ids[future] = attempt_id
+            return future
+
+        attempt_ids: Dict[Future, str] = {}
+        started = time.monotonic()
+        deadline = started + self.timeout if self.timeout is not None else None
+        hedge_at = self.hedge_delay()
+        attempts: List[Future] = [submit()]
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+
+        while pending:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            if hedge_at is not None and len(attempts) == 1 and now - started >= hedge_at:
+                # The first attempt is slower than usual; race a duplicate against it
+                attempts.append(submit())
+                pending.add(attempts[-1])
+                self._count(hedges=1)
+
+            waits = []
+            if deadline is not None:
+                waits.append(deadline - now)
+            if hedge_at is not None and len(attempts) == 1:
+                waits.append(started + hedge_at - now)
+            done, pending = wait(pending, timeout=max(0.0, min(waits)) if waits else None, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    result, latency = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                self._success(latency)
+                if future is not attempts[0]:
+                    self._count(hedge_wins=1)
+                for other in pending:
+                    other.cancel()
+                    _abandon(attempt_ids[other])
+                return result
+
+        if pending:
+            # Abandoned attempts finish in the background; their results and streamed output are dropped
+            for future in pending:
+                future.cancel()
+                _abandon(attempt_ids[future])
+            self._failure(timed_out=True)
+            raise DeadlineExceeded(f"{self.name} did not respond within {self.timeout}s")
+        self._error(error)
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        """Return call outcomes, hedging counts, circuit state and the current hedge delay."""
+        with self._lock:
+            stats = dict(self._counts)
+        stats["circuit"] = self.breaker.state
+        stats["hedge_delay"] = self.hedge_delay()
+        return stats
+
+class ResilienceRegistry:
+    """One resilience policy per service and model, shared across components."""
+
+    def __init__(self, services: Optional[Dict[str, Dict[str, Any]]] = None, max_workers: int = 32):
+        """
+        Initialize the registry.
+
+        Args:
+            services: Policy settings by service kind, e.g. "llm" or "web_search";
+                see ResiliencePolicy for the keys
+            max_workers: Threads available to calls with a deadline or hedging
+        """
+        self.services = services or {}
+        self.executor = QueryThreadPoolExecutor(max_workers=max_workers)
+        self._policies: Dict[Tuple[str, str], ResiliencePolicy] = {}
+        self._lock = threading.Lock()
+
+    def policy(self, service: str, name: Optional[str] = None) -> ResiliencePolicy:
+        """
+        Get the policy for a service.
+
+        Args:
+            service: Service kind, selecting the settings
+            name: Instance of the service, e.g. a model name; each gets its own breaker
+
+        Returns:
+            The shared policy
+        """
+        key = (service, name or "default")
+        with self._lock:
+            if key not in self._policies:
+                self._policies[key] = ResiliencePolicy(
+                    name=f"{service}:{key[1]}",
+                    executor=self.executor,
+                    **self.services.get(service, {}),
+                )
+            return self._policies[key]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Return the statistics of every policy, keyed by service and name."""
+        with self._lock:
+            policies = dict(self._policies)
+        return {policy.name: policy.stats() for policy in policies.values()}
+
+    def close(self) -> None:
+        """Stop the executor without waiting for abandoned calls."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
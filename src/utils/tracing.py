@@ -0,0 +1,502 @@
+"""Structured span-tree tracing for Adaptive RAG, independent of LangSmith.
+
+Each query becomes a trace: a root span with one child span per workflow node
+and edge, which in turn contain spans for the retrieval, embedding, search and
+LLM calls made while they ran. Finished traces are handed to a background
+thread through a bounded queue and written as one JSON line each to rotating
+files. Summarize them with:
+
+    python -m src.utils.tracing traces/
+"""
+
+import argparse
+import contextvars
+import json
+import logging
+import math
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from .metrics import token_usage
+
+logger = logging.getLogger(__name__)
+
+# Span currently open in this context; new spans become its children
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "rag_current_span", default=None
+)
+
+class Span:
+    """One timed operation within a trace."""
+
+    def __init__(
+        self,
+        trace: "Trace",
+        name: str,
+        kind: str,
+        parent_id: Optional[str],
+        attributes: Dict[str, Any],
+    ):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = dict(attributes)
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        """Close the span, recording an error outcome if given."""
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.status = "error"
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the span as JSON-serializable data."""
+        record = {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6) if self.duration is not None else None,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+        if self.error is not None:
+            record["error"] = self.error
+        return record
+
+class _NullSpan:
+    """Stand-in yielded when no trace is active, so callers need not check."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+NULL_SPAN = _NullSpan()
+
+class Trace:
+    """Span tree recorded for one run."""
+
+    def __init__(self, name: str, **attributes: Any):
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self.root = self.start_span(name, "run", None, **attributes)
+
+    def start_span(self, name: str, kind: str, parent: Optional[Span], **attributes: Any) -> Span:
+        """
+        Open a span without making it current; the caller must end it.
+
+        Args:
+            name: Span name
+            kind: Span kind, e.g. "node", "llm" or "retriever"
+            parent: Parent span, or None for the root
+            **attributes: Initial attributes
+
+        Returns:
+            The open span
+        """
+        span = Span(self, name, kind, parent.span_id if parent is not None else None, attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name: str, kind: str, **attributes: Any) -> Iterator[Span]:
+        """
+        Record the block as a span of this trace.
+
+        The span is a child of the current span if it belongs to this trace,
+        otherwise of the root.
+
+        Args:
+            name: Span name
+            kind: Span kind
+            **attributes: Initial attributes
+
+        Yields:
+            The open span
+        """
+        parent = _current_span.get()
+        if parent is None or parent.trace is not self:
+            parent = self.root
+        span = self.start_span(name, kind, parent, **attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.end(error=e)
+            raise
+        finally:
+            span.end()
+            _current_span.reset(token)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the trace and all its spans as JSON-serializable data."""
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "start": spans[0]["start"],
+            "duration": spans[0]["duration"],
+            "status": spans[0]["status"],
+            "spans": spans,
+        }
+
+@contextmanager
+def span(name: str, kind: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Record the block as a child of the current span, if a trace is active.
+
+    Args:
+        name: Span name
+        kind: Span kind, e.g. "retriever", "embedding" or "search"
+        **attributes: Initial attributes
+
+    Yields:
+        The open span, or a stand-in that ignores attributes when not tracing
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield NULL_SPAN
+        return
+    with parent.trace.span(name, kind, **attributes) as current:
+        yield current
+
+class RotatingJSONLWriter:
+    """Appends lines to a JSONL file, rotating it when it grows too large."""
+
+    def __init__(self, output_dir: str, filename: str = "traces.jsonl", max_bytes: int = 10_000_000, max_files: int = 10):
+        """
+        Initialize the writer.
+
+        Args:
+            output_dir: Directory of the trace files
+            filename: Name of the current file; rotated files get a numeric suffix
+            max_bytes: Size at which the current file is rotated
+            max_files: Number of files kept, including the current one
+        """
+        self.output_dir = Path(output_dir)
+        self.path = self.output_dir / filename
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._file = None
+
+    def _rotated(self, index: int) -> Path:
+        return self.path.with_name(f"{self.path.stem}.{index}{self.path.suffix}")
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        self._rotated(self.max_files - 1).unlink(missing_ok=True)
+        for index in range(self.max_files - 2, 0, -1):
+            if self._rotated(index).exists():
+                self._rotated(index).replace(self._rotated(index + 1))
+        if self.max_files > 1:
+            self.path.replace(self._rotated(1))
+        else:
+            self.path.unlink()
+
+    def write(self, line: str) -> None:
+        """Write one line, rotating first if it would overflow the current file."""
+        if self._file is None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        size = len(line.encode("utf-8")) + 1
+        if self._file.tell() and self._file.tell() + size > self.max_bytes:
+            self._rotate()
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line + "\n")
+
+    def flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Callback handler that records LLM calls as children of the current span."""
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, prompt_chars: int, kwargs: Dict[str, Any]) -> None:
+        parent = _current_span.get()
+        if parent is None:
+            return
+        metadata = kwargs.get("metadata") or {}
+        params = kwargs.get("invocation_params") or {}
+        model = metadata.get("ls_model_name") or params.get("model_name") or params.get("model")
+        span = parent.trace.start_span(model or "llm", "llm", parent, prompt_chars=prompt_chars)
+        with self._lock:
+            self._spans[run_id] = span
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._start(run_id, sum(len(prompt) for prompt in prompts), kwargs)
+
+    def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        chars = sum(len(str(message.content)) for batch in messages for message in batch)
+        self._start(run_id, chars, kwargs)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        prompt, completion = token_usage(response)
+        output_chars = sum(len(generation.text) for generations in response.generations for generation in generations)
+        span.set(prompt_tokens=prompt, completion_tokens=completion, output_chars=output_chars)
+        span.end()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.end(error=error)
+
+class Tracer:
+    """Starts traces and writes finished ones to rotating JSONL files in the background."""
+
+    def __init__(
+        self,
+        output_dir: str = "traces",
+        sample_rate: float = 1.0,
+        max_bytes: int = 10_000_000,
+        max_files: int = 10,
+        queue_size: int = 1000,
+    ):
+        """
+        Initialize the tracer.
+
+        Args:
+            output_dir: Directory of the trace files
+            sample_rate: Fraction of runs traced
+            max_bytes: Size at which a trace file is rotated
+            max_files: Number of trace files kept
+            queue_size: Finished traces buffered for writing; traces arriving
+                while the buffer is full are dropped and counted
+        """
+        self.sample_rate = sample_rate
+        self.writer = RotatingJSONLWriter(output_dir, max_bytes=max_bytes, max_files=max_files)
+        self.dropped = 0
+        self._handler = TracingCallbackHandler()
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start_trace(self, name: str, **attributes: Any) -> Optional[Trace]:
+        """
+        Start a trace for a run, if it is sampled.
+
+        Args:
+            name: Name of the root span
+            **attributes: Attributes of the root span
+
+        Returns:
+            The trace, or None when the run is not sampled
+        """
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return None
+        return Trace(name, **attributes)
+
+    def callback_handler(self) -> TracingCallbackHandler:
+        """Get the callback handler that records LLM calls into the active trace."""
+        return self._handler
+
+    def finish(self, trace: Trace, error: Optional[BaseException] = None) -> None:
+        """
+        Close a trace's root span and queue the trace for writing.
+
+        Args:
+            trace: Finished trace
+            error: Exception that ended the run, if any
+        """
+        trace.root.end(error=error)
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(trace.to_dict())
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._write_loop, name="rag-trace-writer", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            record = self._queue.get()
+            try:
+                if record is None:
+                    self.writer.flush()
+                    return
+                self.writer.write(json.dumps(record, default=str))
+                if self._queue.empty():
+                    self.writer.flush()
+            except Exception as e:
+                logger.error(f"Could not write trace: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self) -> None:
+        """Block until every queued trace has been written."""
+        self._queue.join()
+        self.writer.flush()
+
+    def close(self) -> None:
+        """Write the queued traces and stop the writer thread."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join()
+        self.writer.close()
+
+def read_traces(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read traces from a JSONL file or a directory of them, including rotated files.
+
+    Args:
+        path: File or directory
+
+    Yields:
+        Trace records
+    """
+    root = Path(path)
+    files = sorted(root.glob("*.jsonl")) if root.is_dir() else [root]
+    for file in files:
+        with open(file, encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A file may end in a partial line if the process died mid-write
+                    continue
+
+def _percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+def summarize_traces(traces: Iterator[Dict[str, Any]], top: int = 10) -> Dict[str, Any]:
+    """
+    Aggregate span durations across traces.
+
+    Args:
+        traces: Trace records
+        top: Number of slowest individual spans to list
+
+    Returns:
+        Trace count, per kind and name statistics ordered by p95 duration,
+        and the slowest individual spans
+    """
+    durations: Dict[Tuple[str, str], List[float]] = {}
+    errors: Dict[Tuple[str, str], int] = {}
+    slowest: List[Dict[str, Any]] = []
+    count = 0
+    for trace in traces:
+        count += 1
+        question = trace["spans"][0]["attributes"].get("question") if trace["spans"] else None
+        for record in trace["spans"]:
+            if record["duration"] is None:
+                continue
+            key = (record["kind"], record["name"])
+            durations.setdefault(key, []).append(record["duration"])
+            errors[key] = errors.get(key, 0) + (record["status"] == "error")
+            slowest.append({
+                "trace_id": trace["trace_id"],
+                "kind": record["kind"],
+                "name": record["name"],
+                "duration": record["duration"],
+                "question": question,
+            })
+            # Keep the candidate list short while scanning many traces
+            if len(slowest) > top * 20:
+                slowest = sorted(slowest, key=lambda item: -item["duration"])[:top]
+
+    spans = []
+    for (kind, name), values in durations.items():
+        values.sort()
+        spans.append({
+            "kind": kind,
+            "name": name,
+            "count": len(values),
+            "errors": errors[(kind, name)],
+            "mean": sum(values) / len(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "max": values[-1],
+        })
+    spans.sort(key=lambda item: -item["p95"])
+    return {
+        "traces": count,
+        "spans": spans,
+        "slowest": sorted(slowest, key=lambda item: -item["duration"])[:top],
+    }
+
+def format_summary(summary: Dict[str, Any]) -> str:
+    """Format a trace summary as text tables, with durations in milliseconds."""
+    lines = [f"{summary['traces']} traces", ""]
+    lines.append(f"{'kind':<10} {'name':<28} {'count':>7} {'errors':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9}")
+    for item in summary["spans"]:
+        lines.append(
+            f"{item['kind']:<10} {item['name']:<28} {item['count']:>7} {item['errors']:>6} "
+            f"{item['mean'] * 1000:>9.1f} {item['p50'] * 1000:>9.1f} "
+            f"{item['p95'] * 1000:>9.1f} {item['max'] * 1000:>9.1f}"
+        )
+    lines.extend(["", "Slowest spans:"])
+    for item in summary["slowest"]:
+        lines.append(
+            f"{item['duration'] * 1000:>9.1f}  {item['kind']}:{item['name']}  "
+            f"trace={item['trace_id']}  question={item['question']!r}"
+        )
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Summarize slow spans across trace files from the command line."""
+    parser = argparse.ArgumentParser(description="Summarize Adaptive RAG trace files")
+    parser.add_argument("path", help="Trace file or directory of trace files")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest spans to list")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args(argv)
+
+    summary = summarize_traces(read_traces(args.path), top=args.top)
+    print(json.dumps(summary, indent=2) if args.json else format_summary(summary))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Per-query latency and cost budgets for the Adaptive RAG workflow."""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from ..utils.metrics import token_usage
+
+class QueryBudget:
+    """Tracks wall time, loop iterations, LLM calls and tokens for one query."""
+
+    def __init__(
+        self,
+        max_seconds: Optional[float] = None,
+        max_loops: Optional[int] = None,
+        max_llm_calls: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+    ):
+        """
+        Initialize the budget.
+
+        Args:
+            max_seconds: Wall-clock deadline for the query
+            max_loops: Maximum number of retry loops (query rewrites and regenerations)
+            max_llm_calls: Maximum number of LLM calls
+            max_tokens: Maximum number of prompt and completion tokens
+        """
+        self.max_seconds = max_seconds
+        self.max_loops = max_loops
+        self.max_llm_calls = max_llm_calls
+        self.max_tokens = max_tokens
+
+        self.started = time.monotonic()
+        self.loops = 0
+        self.llm_calls = 0
+        self.tokens = 0
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        """Seconds since the query started."""
+        return time.monotonic() - self.started
+
+    def record_loop(self) -> None:
+        """Record one iteration of a workflow retry loop."""
+        with self._lock:
+            self.loops += 1
+
+    def record_llm_call(self) -> None:
+        """Record the start of an LLM call."""
+        with self._lock:
+            self.llm_calls += 1
+
+    def record_tokens(self, tokens: int) -> None:
+        """Record tokens used by a completed LLM call."""
+        with self._lock:
+            self.tokens += tokens
+
+    def exhausted(self) -> Optional[str]:
+        """
+        Check whether any limit has been reached.
+
+        Returns:
+            Name of the exhausted limit, or None if budget remains
+        """
+        if self.max_seconds is not None and self.elapsed() >= self.max_seconds:
+            return "deadline"
+        if self.max_loops is not None and self.loops >= self.max_loops:
+            return "loops"
+        if self.max_llm_calls is not None and self.llm_calls >= self.max_llm_calls:
+            return "llm_calls"
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            return "tokens"
+        return None
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the usage recorded so far."""
+        return {
+            "elapsed_seconds": round(self.elapsed(), 3),
+            "loops": self.loops,
+            "llm_calls": self.llm_calls,
+            "tokens": self.tokens,
+            "exhausted": self.exhausted(),
+        }
+
+    def callback_handler(self) -> "BudgetCallbackHandler":
+        """Create a callback handler that charges LLM usage to this budget."""
+        return BudgetCallbackHandler(self)
+
+class BudgetCallbackHandler(BaseCallbackHandler):
+    """Callback handler that records LLM calls and tokens against a budget."""
+
+    def __init__(self, budget: QueryBudget):
+        self.budget = budget
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any) -> None:
+        self.budget.record_llm_call()
+
+    def on_chat_model_start(
+        self, serialized: Dict[str, Any], messages: List[List[Any]], **kwargs: Any
+    ) -> None:
+        self.budget.record_llm_call()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        self.budget.record_tokens(sum(token_usage(response)))
+
+def budget_exhausted(state: Dict[str, Any]) -> Optional[str]:
+    """
+    Check the budget carried in a workflow state.
+
+    Args:
+        state: Current workflow state
+
+    Returns:
+        Name of the exhausted limit, or None if there is no budget or it remains
+    """
+    budget = state.get("budget")
+    return budget.exhausted() if budget is not None else None
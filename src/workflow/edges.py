@@ -1,13 +1,21 @@
 """Workflow edges (conditional logic) for Adaptive RAG."""
 
-from typing import Dict, Any, Literal
+from typing import Dict, Any, Literal, Optional
 from ..models.data_models import GraphState
 from ..components.routers import QueryRouter
 from ..components.graders import HallucinationGrader, AnswerGrader
+from ..components.searchers import WebSearcher
+from .budget import budget_exhausted
 import logging
 
 logger = logging.getLogger(__name__)
 
+def _record_loop(state: GraphState) -> None:
+    """Charge one retry loop to the state's budget, if it has one."""
+    budget = state.get("budget")
+    if budget is not None:
+        budget.record_loop()
+
 class WorkflowEdges:
     """Contains all the edge decision functions for the workflow graph."""
     
@@ -16,6 +24,8 @@ class WorkflowEdges:
         query_router: QueryRouter,
         hallucination_grader: HallucinationGrader,
         answer_grader: AnswerGrader,
+        web_searcher: Optional[WebSearcher] = None,
+        dual_path_threshold: Optional[float] = None,
     ):
         """
         Initialize workflow edges.
@@ -24,12 +34,19 @@ class WorkflowEdges:
             query_router: Query routing component
             hallucination_grader: Hallucination grading component
             answer_grader: Answer grading component
+            web_searcher: Web search component; when given, questions are kept
+                on the vectorstore while its circuit breaker is open
+            dual_path_threshold: Router confidence below which both sources are
+                searched; None routes every question to a single source. Needs
+                a workflow built with dual_path=True
         """
         self.query_router = query_router
         self.hallucination_grader = hallucination_grader
         self.answer_grader = answer_grader
+        self.web_searcher = web_searcher
+        self.dual_path_threshold = dual_path_threshold
     
-    def route_question(self, state: GraphState) -> Literal["web_search", "vectorstore"]:
+    def route_question(self, state: GraphState) -> Literal["web_search", "vectorstore", "both"]:
         """
         Route question to web search or vectorstore.
         
@@ -37,14 +54,25 @@ class WorkflowEdges:
             state: Current workflow state
             
         Returns:
-            Next node to call ("web_search" or "vectorstore")
+            Next node to call ("web_search" or "vectorstore"), or "both" to
+            search both sources in parallel when the router is unsure
         """
         logger.info("Edge: ROUTE QUESTION")
         question = state["question"]
         
         # Route the question
-        source = self.query_router.route(question)
+        if self.dual_path_threshold is None:
+            source, confidence = self.query_router.route(question), 1.0
+        else:
+            source, confidence = self.query_router.route_with_confidence(question)
         
+        if self.web_searcher is not None and not self.web_searcher.available():
+            if source == "web_search" or confidence < (self.dual_path_threshold or 0.0):
+                logger.warning("Decision: WEB SEARCH UNAVAILABLE, Route to VECTORSTORE")
+                return "vectorstore"
+        if self.dual_path_threshold is not None and confidence < self.dual_path_threshold:
+            logger.info(f"Decision: ROUTER UNSURE ({confidence:.2f}), Route to BOTH")
+            return "both"
         if source == "web_search":
             logger.info("Decision: Route to WEB SEARCH")
             return "web_search"
@@ -52,7 +80,9 @@ class WorkflowEdges:
             logger.info("Decision: Route to VECTORSTORE")
             return "vectorstore"
     
-    def decide_to_generate(self, state: GraphState) -> Literal["transform_query", "generate"]:
+    def decide_to_generate(
+        self, state: GraphState
+    ) -> Literal["transform_query", "generate", "budget_exhausted"]:
         """
         Decide whether to generate an answer or transform the query.
         
@@ -60,14 +90,26 @@ class WorkflowEdges:
             state: Current workflow state
             
         Returns:
-            Next node to call ("transform_query" or "generate")
+            Next node to call ("transform_query" or "generate"), or
+            "budget_exhausted" to return an earlier grounded generation
         """
         logger.info("Edge: ASSESS GRADED DOCUMENTS")
         filtered_documents = state["documents"]
         
         if not filtered_documents:
+            reason = budget_exhausted(state)
+            if reason and state.get("best_generation") is not None:
+                # An earlier answer was grounded; better than one from no documents
+                logger.info(f"Decision: BUDGET EXHAUSTED ({reason}), RETURN BEST GENERATION")
+                return "budget_exhausted"
+            if reason:
+                # No budget left for another rewrite, answer with what we have
+                logger.info(f"Decision: BUDGET EXHAUSTED ({reason}), GENERATE")
+                return "generate"
+            
             # No relevant documents found, transform query
             logger.info("Decision: ALL DOCUMENTS ARE NOT RELEVANT, TRANSFORM QUERY")
+            _record_loop(state)
             return "transform_query"
         else:
             # Generate response with relevant documents
@@ -76,7 +118,7 @@ class WorkflowEdges:
     
     def grade_generation(
         self, state: GraphState
-    ) -> Literal["useful", "not_useful", "not_supported"]:
+    ) -> Literal["useful", "not_useful", "not_supported", "budget_exhausted"]:
         """
         Grade the generation for hallucinations and answer quality.
         
@@ -84,9 +126,15 @@ class WorkflowEdges:
             state: Current workflow state
             
         Returns:
-            Next action to take ("useful", "not_useful", or "not_supported")
+            Next action to take ("useful", "not_useful", "not_supported", or
+            "budget_exhausted" to return the best generation so far)
         """
         logger.info("Edge: CHECK HALLUCINATIONS AND ANSWER QUALITY")
+        reason = budget_exhausted(state)
+        if reason:
+            logger.info(f"Decision: BUDGET EXHAUSTED ({reason}), RETURN BEST GENERATION")
+            return "budget_exhausted"
+        
         question = state["question"]
         documents = state["documents"]
         generation = state["generation"]
@@ -106,7 +154,28 @@ class WorkflowEdges:
                 return "useful"
             else:
                 logger.info("Decision: GENERATION DOES NOT ADDRESS QUESTION")
+                _record_loop(state)
                 return "not_useful"
         else:
             logger.info("Decision: GENERATION IS NOT GROUNDED IN DOCUMENTS")
-            return "not_supported"
\ No newline at end of file
+            _record_loop(state)
+            return "not_supported"
+    
+    def route_generation_grade(
+        self, state: GraphState
+    ) -> Literal["useful", "not_useful", "not_supported", "budget_exhausted"]:
+        """
+        Route on a grade computed by the grade_generation node.
+        
+        Args:
+            state: Current workflow state
+            
+        Returns:
+            Next action to take ("useful", "not_useful", "not_supported", or
+            "budget_exhausted")
+        """
+        logger.info("Edge: ROUTE GENERATION GRADE")
+        grade = state["generation_grade"]
+        if grade in ("not_useful", "not_supported"):
+            _record_loop(state)
+        return grade
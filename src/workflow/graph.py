@@ -1,15 +1,36 @@
 """Workflow graph for Adaptive RAG."""
 
 from langgraph.graph import StateGraph, START, END
-from typing import Dict, Any, Optional
+from typing import Dict, Any, AsyncIterator, Callable, Iterator, Optional
+from contextlib import nullcontext
+import functools
 import logging
 
 from ..models.data_models import GraphState
+from ..components.generators import GENERATION_TAG
 from .nodes import WorkflowNodes
 from .edges import WorkflowEdges
+from .budget import QueryBudget
+from ..utils.metrics import MetricsCallbackHandler, MetricsRegistry, QueryMetrics, track_stage
+from ..utils.profiling import track_thread
+from ..utils.resilience import is_abandoned
+from ..utils.tracing import NULL_SPAN, Tracer
 
 logger = logging.getLogger(__name__)
 
+# Graph stream modes behind stream_events: node updates, LLM tokens and full states
+_EVENT_STREAM_MODES = ["updates", "messages", "values"]
+
+def _output_sizes(update: Dict[str, Any]) -> Dict[str, int]:
+    """Describe a node's state update by the sizes of its values."""
+    sizes = {}
+    for key, value in (update or {}).items():
+        if isinstance(value, list):
+            sizes[f"{key}_count"] = len(value)
+        elif isinstance(value, str):
+            sizes[f"{key}_chars"] = len(value)
+    return sizes
+
 class AdaptiveRAGWorkflow:
     """Workflow graph for Adaptive RAG."""
     
@@ -18,6 +39,11 @@ class AdaptiveRAGWorkflow:
         nodes: WorkflowNodes,
         edges: WorkflowEdges,
         debug: bool = False,
+        optimistic: bool = False,
+        dual_path: bool = False,
+        budget_settings: Optional[Dict[str, Any]] = None,
+        metrics: Optional[MetricsRegistry] = None,
+        tracer: Optional[Tracer] = None,
     ):
         """
         Initialize the workflow graph.
@@ -26,9 +52,24 @@ class AdaptiveRAGWorkflow:
             nodes: Workflow node functions
             edges: Workflow edge functions
             debug: Whether to enable debug logging
+            optimistic: Whether to grade generations in a separate node so the
+                answer is delivered before grading finishes
+            dual_path: Whether questions the router is unsure about search the
+                vectorstore and the web in parallel, merging the results before
+                grading; edges decide when via their dual_path_threshold
+            budget_settings: Per-query limits passed to QueryBudget
+                (max_seconds, max_loops, max_llm_calls, max_tokens)
+            metrics: Registry that aggregates node and edge metrics across queries
+            tracer: Optional tracer recording a span tree for each query
         """
         self.nodes = nodes
         self.edges = edges
+        self.optimistic = optimistic
+        self.dual_path = dual_path
+        self.budget_settings = budget_settings or {}
+        self.metrics = metrics or MetricsRegistry()
+        self._metrics_handler = MetricsCallbackHandler()
+        self.tracer = tracer
         
         # Set up logging
         if debug:
@@ -49,74 +90,325 @@ class AdaptiveRAGWorkflow:
         workflow = StateGraph(GraphState)
         
         # Add nodes
-        workflow.add_node("retrieve", self.nodes.retrieve)
-        workflow.add_node("web_search", self.nodes.web_search)
-        workflow.add_node("grade_documents", self.nodes.grade_documents)
-        workflow.add_node("transform_query", self.nodes.transform_query)
-        workflow.add_node("generate", self.nodes.generate)
+        workflow.add_node("retrieve", self._node("retrieve"))
+        workflow.add_node("web_search", self._node("web_search"))
+        workflow.add_node("grade_documents", self._node("grade_documents"))
+        workflow.add_node("transform_query", self._node("transform_query"))
+        workflow.add_node("generate", self._node("generate"))
         
         # Add edges
-        workflow.add_conditional_edges(
-            START,
-            self.edges.route_question,
-            {
-                "web_search": "web_search",
-                "vectorstore": "retrieve",
-            },
-        )
+        routes = {
+            "web_search": "web_search",
+            "vectorstore": "retrieve",
+        }
+        if self.dual_path:
+            # Unsure routes fan out to both sources; the merge waits for both branches
+            workflow.add_node("dual_retrieve", self._node("dual_retrieve"))
+            workflow.add_node("dual_web_search", self._node("dual_web_search"))
+            workflow.add_node("merge_documents", self._node("merge_documents"))
+            routes["dual_retrieve"] = "dual_retrieve"
+            routes["dual_web_search"] = "dual_web_search"
+            workflow.add_edge(["dual_retrieve", "dual_web_search"], "merge_documents")
+            workflow.add_edge("merge_documents", "grade_documents")
+        route_question = self._edge("route_question")
+        
+        def fan_out(state: GraphState):
+            # "both" expands into the two dual-path branches, run in parallel
+            decision = route_question(state)
+            if decision == "both":
+                if not self.dual_path:
+                    raise ValueError("Edges routed to both sources, but the workflow was built without dual_path")
+                return ["dual_retrieve", "dual_web_search"]
+            return decision
+        
+        workflow.add_conditional_edges(START, fan_out, routes)
         workflow.add_edge("web_search", "generate")
         workflow.add_edge("retrieve", "grade_documents")
         workflow.add_conditional_edges(
             "grade_documents",
-            self.edges.decide_to_generate,
+            self._edge("decide_to_generate"),
             {
                 "transform_query": "transform_query",
                 "generate": "generate",
+                "budget_exhausted": "return_best_generation",
             },
         )
         workflow.add_edge("transform_query", "retrieve")
-        workflow.add_conditional_edges(
-            "generate",
-            self.edges.grade_generation,
-            {
-                "not_supported": "generate",
-                "useful": END,
-                "not_useful": "transform_query",
-            },
-        )
+        
+        # A grounded but unhelpful answer is kept in case the budget runs out before a better one
+        workflow.add_node("keep_best_generation", self._node("keep_best_generation"))
+        workflow.add_node("return_best_generation", self._node("return_best_generation"))
+        workflow.add_edge("keep_best_generation", "transform_query")
+        workflow.add_edge("return_best_generation", END)
+        
+        generation_routes = {
+            "not_supported": "generate",
+            "useful": END,
+            "not_useful": "keep_best_generation",
+            "budget_exhausted": "return_best_generation",
+        }
+        if self.optimistic:
+            # Grading runs as its own step, so the generation is published
+            # before the graders run
+            workflow.add_node("grade_generation", self._node("grade_generation"))
+            workflow.add_edge("generate", "grade_generation")
+            workflow.add_conditional_edges(
+                "grade_generation",
+                self._edge("route_generation_grade"),
+                generation_routes,
+            )
+        else:
+            workflow.add_conditional_edges(
+                "generate",
+                self._edge("grade_generation"),
+                generation_routes,
+            )
         
         return workflow
     
-    def run(self, question: str) -> Dict[str, Any]:
+    def _node(self, name: str) -> Callable:
+        """Get a node function, instrumented with metrics."""
+        return self._instrument("node", name, getattr(self.nodes, name))
+    
+    def _edge(self, name: str) -> Callable:
+        """Get an edge function, instrumented with metrics."""
+        return self._instrument("edge", name, getattr(self.edges, name))
+    
+    def _instrument(self, kind: str, name: str, func: Callable) -> Callable:
+        """
+        Wrap a node or edge function to record its metrics and trace span.
+        
+        Args:
+            kind: "node" or "edge"
+            name: Node or edge name
+            func: Function taking the workflow state
+            
+        Returns:
+            Wrapped function
+        """
+        @functools.wraps(func)
+        def instrumented(state: GraphState):
+            trace = state.get("trace")
+            span_context = trace.span(name, kind) if trace is not None else nullcontext(NULL_SPAN)
+            # The thread running the stage is sampled if the query is being profiled
+            with track_stage(state.get("metrics"), self.metrics, kind, name) as record, span_context as span, track_thread():
+                result = func(state)
+                if kind == "edge":
+                    span.set(decision=result)
+                    if record is not None:
+                        record.decision = result
+                else:
+                    span.set(**_output_sizes(result))
+            return result
+        
+        return instrumented
+    
+    def _start(self, question: str, query_metrics: Optional[QueryMetrics] = None):
+        """
+        Create the initial state and run config for a question.
+        
+        Args:
+            question: User question
+            query_metrics: Optional metrics recorder to use instead of a fresh one
+            
+        Returns:
+            Tuple of the initial state, carrying a fresh budget, metrics
+            recorder and trace, and the run config whose callbacks charge LLM
+            usage to them
+        """
+        budget = QueryBudget(**self.budget_settings)
+        trace = self.tracer.start_trace("query", question=question) if self.tracer else None
+        state = {
+            "question": question,
+            "budget": budget,
+            "metrics": query_metrics or QueryMetrics(),
+            "trace": trace,
+        }
+        callbacks = [budget.callback_handler(), self._metrics_handler]
+        if trace is not None:
+            callbacks.append(self.tracer.callback_handler())
+        return state, {"callbacks": callbacks}
+    
+    def _finish_trace(self, state: Dict[str, Any], error: Optional[BaseException] = None) -> None:
+        """Close and export the query's trace, if it is traced."""
+        trace = state.get("trace")
+        if trace is None:
+            return
+        trace.root.set(**state["budget"].summary())
+        self.tracer.finish(trace, error)
+    
+    def _traced(self, state: Dict[str, Any], stream: Iterator[Any]) -> Iterator[Any]:
+        """Pass a stream through, finishing the query's trace when it ends."""
+        try:
+            yield from stream
+        except Exception as e:
+            self._finish_trace(state, e)
+            raise
+        self._finish_trace(state)
+    
+    def run(self, question: str, query_metrics: Optional[QueryMetrics] = None) -> Dict[str, Any]:
         """
         Run the workflow with a question.
         
         Args:
             question: User question
+            query_metrics: Optional recorder for the query's node and edge metrics
             
         Returns:
             Final state of the workflow
         """
         # Initialize state
-        state = {"question": question}
+        state, config = self._start(question, query_metrics)
         
         # Run the workflow
-        final_state = self.app.invoke(state)
+        try:
+            final_state = self.app.invoke(state, config=config)
+        except Exception as e:
+            self._finish_trace(state, e)
+            raise
+        self.metrics.record_query(state["metrics"])
+        self._finish_trace(state)
+        
+        return final_state
+    
+    async def arun(self, question: str, query_metrics: Optional[QueryMetrics] = None) -> Dict[str, Any]:
+        """
+        Run the workflow with a question without blocking the event loop.
+        
+        Nodes and edges are synchronous, so LangGraph runs each of them in the
+        event loop's default executor; its size bounds the concurrent queries.
+        
+        Args:
+            question: User question
+            query_metrics: Optional recorder for the query's node and edge metrics
+            
+        Returns:
+            Final state of the workflow
+        """
+        state, config = self._start(question, query_metrics)
+        
+        try:
+            final_state = await self.app.ainvoke(state, config=config)
+        except Exception as e:
+            self._finish_trace(state, e)
+            raise
+        self.metrics.record_query(state["metrics"])
+        self._finish_trace(state)
         
         return final_state
     
-    def stream(self, question: str):
+    def stream(self, question: str, query_metrics: Optional[QueryMetrics] = None):
         """
         Stream the workflow execution with a question.
         
         Args:
             question: User question
+            query_metrics: Optional recorder for the query's node and edge metrics
             
         Yields:
             Intermediate states of the workflow
         """
         # Initialize state
-        state = {"question": question}
+        state, config = self._start(question, query_metrics)
         
         # Stream the workflow execution
-        return self.app.stream(state)
\ No newline at end of file
+        return self._traced(state, self.app.stream(state, config=config))
+    
+    def stream_events(self, question: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream node updates and generated answer tokens as they happen.
+        
+        Args:
+            question: User question
+            
+        Yields:
+            Event dictionaries with a "type" key:
+            - "node": a node finished; includes "node" and its "state" update
+            - "generation_start": a new answer generation began (earlier tokens are superseded)
+            - "token": a chunk of the answer being generated, in "content"
+            - "answer": in optimistic mode, a provisional answer in "content"
+              delivered before it has been graded
+            - "answer_confirmed": in optimistic mode, the provisional answer passed grading
+            - "retraction": in optimistic mode, the provisional answer failed
+              grading for the "reason" given and the workflow is retrying
+            - "budget_exhausted": in optimistic mode, the budget ran out before
+              grading; the final state holds the best grounded answer so far,
+              or the provisional answer ungraded if there is none
+            - "end": the workflow finished; includes the final "state"
+        """
+        state, config = self._start(question)
+        progress = {"final_state": state, "generation_id": None}
+        
+        for mode, chunk in self._traced(state, self.app.stream(
+            state, config=config, stream_mode=_EVENT_STREAM_MODES
+        )):
+            yield from self._events(mode, chunk, progress)
+        
+        self.metrics.record_query(state["metrics"])
+        yield {"type": "end", "state": progress["final_state"]}
+    
+    async def astream_events(self, question: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the events of stream_events without blocking the event loop.
+        
+        Args:
+            question: User question
+            
+        Yields:
+            The same event dictionaries as stream_events
+        """
+        state, config = self._start(question)
+        progress = {"final_state": state, "generation_id": None}
+        
+        try:
+            async for mode, chunk in self.app.astream(state, config=config, stream_mode=_EVENT_STREAM_MODES):
+                for event in self._events(mode, chunk, progress):
+                    yield event
+        except Exception as e:
+            self._finish_trace(state, e)
+            raise
+        self._finish_trace(state)
+        
+        self.metrics.record_query(state["metrics"])
+        yield {"type": "end", "state": progress["final_state"]}
+    
+    def _events(self, mode: str, chunk: Any, progress: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Translate one chunk of a multi-mode graph stream into events.
+        
+        Args:
+            mode: Stream mode the chunk came from
+            chunk: Stream chunk
+            progress: The current generation's message id and the latest full
+                state, updated in place
+            
+        Yields:
+            Event dictionaries as described in stream_events
+        """
+        if mode == "messages":
+            message, metadata = chunk
+            tags = metadata.get("tags", [])
+            # Tokens of a generation abandoned at its deadline would interleave with its replacement's
+            if GENERATION_TAG not in tags or is_abandoned(tags):
+                return
+            if message.id != progress["generation_id"]:
+                progress["generation_id"] = message.id
+                yield {"type": "generation_start"}
+            if message.content:
+                yield {"type": "token", "content": message.content}
+        elif mode == "updates":
+            for node, update in chunk.items():
+                yield {"type": "node", "node": node, "state": update}
+                if not self.optimistic:
+                    continue
+                if node == "generate":
+                    yield {"type": "answer", "content": update["generation"], "provisional": True}
+                elif node == "grade_generation":
+                    if update["generation_grade"] == "useful":
+                        yield {"type": "answer_confirmed"}
+                    elif update["generation_grade"] == "budget_exhausted":
+                        yield {"type": "budget_exhausted"}
+                    else:
+                        yield {"type": "retraction", "reason": update["generation_grade"]}
+        else:
+            progress["final_state"] = chunk
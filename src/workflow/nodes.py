@@ -1,17 +1,22 @@
 """Workflow nodes for Adaptive RAG."""
 
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from ..models.data_models import GraphState
-from ..components.retrievers import VectorStoreRetriever
-from ..components.searchers import WebSearcher
+from ..components.retrievers import VectorStoreRetriever, reciprocal_rank_fusion
+from ..components.searchers import WebSearcher, WebSearchError
+from ..utils.profiling import QueryThreadPoolExecutor
+from ..utils.resilience import CircuitOpenError, DeadlineExceeded
 from ..components.generators import RAGGenerator
-from ..components.transformers import QueryTransformer
+from ..components.transformers import QueryTransformer, HypotheticalDocumentGenerator
 from ..components.graders import DocumentGrader, HallucinationGrader, AnswerGrader
+from .budget import budget_exhausted
 from langchain.schema import Document
 import logging
 
 logger = logging.getLogger(__name__)
 
+RETRIEVAL_MODES = ("similarity", "multi_query", "hyde")
+
 class WorkflowNodes:
     """Contains all the node functions for the workflow graph."""
     
@@ -24,6 +29,10 @@ class WorkflowNodes:
         document_grader: DocumentGrader,
         hallucination_grader: HallucinationGrader,
         answer_grader: AnswerGrader,
+        retrieval_mode: str = "similarity",
+        num_queries: int = 3,
+        max_documents: Optional[int] = None,
+        hypothetical_document_generator: Optional[HypotheticalDocumentGenerator] = None,
     ):
         """
         Initialize workflow nodes.
@@ -36,7 +45,16 @@ class WorkflowNodes:
             document_grader: Document grading component
             hallucination_grader: Hallucination grading component
             answer_grader: Answer grading component
+            retrieval_mode: "similarity", "multi_query" or "hyde"
+            num_queries: Number of rewrites to retrieve with in multi-query mode
+            max_documents: Maximum number of merged documents in multi-query and HyDE modes
+            hypothetical_document_generator: HyDE component, required in "hyde" mode
         """
+        if retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode {retrieval_mode!r}; expected one of {RETRIEVAL_MODES}")
+        if retrieval_mode == "hyde" and hypothetical_document_generator is None:
+            raise ValueError("HyDE retrieval mode requires a hypothetical document generator")
+        
         self.retriever = retriever
         self.web_searcher = web_searcher
         self.generator = generator
@@ -44,6 +62,29 @@ class WorkflowNodes:
         self.document_grader = document_grader
         self.hallucination_grader = hallucination_grader
         self.answer_grader = answer_grader
+        self.retrieval_mode = retrieval_mode
+        self.num_queries = num_queries
+        self.max_documents = max_documents
+        self.hypothetical_document_generator = hypothetical_document_generator
+    
+    def _retrieve_hypothetical(self, question: str) -> List[Document]:
+        """Retrieve documents similar to a hypothetical answer passage."""
+        passage = self.hypothetical_document_generator.generate_document(question)
+        return self.retriever.retrieve_many([passage])
+    
+    def _retrieve_hyde(self, question: str) -> List[Document]:
+        """Run plain and HyDE retrieval concurrently and fuse the results."""
+        with QueryThreadPoolExecutor(max_workers=2) as executor:
+            plain = executor.submit(self.retriever.retrieve, question)
+            hypothetical = executor.submit(self._retrieve_hypothetical, question)
+            result_lists = [plain.result()]
+            try:
+                result_lists.append(hypothetical.result())
+            except Exception as e:
+                # The plain results still answer the question without the hypothetical passage
+                logger.warning(f"HyDE retrieval failed, using plain retrieval only: {e}")
+        
+        return reciprocal_rank_fusion(result_lists, limit=self.max_documents)
     
     def retrieve(self, state: GraphState) -> Dict[str, Any]:
         """
@@ -59,7 +100,16 @@ class WorkflowNodes:
         question = state["question"]
         
         # Retrieve documents
-        documents = self.retriever.retrieve(question)
+        if self.retrieval_mode == "multi_query":
+            queries = [question] + self.query_transformer.generate_queries(
+                question, self.num_queries
+            )
+            logger.info(f"Retrieving with {len(queries)} queries")
+            documents = self.retriever.retrieve_many(queries, limit=self.max_documents)
+        elif self.retrieval_mode == "hyde":
+            documents = self._retrieve_hyde(question)
+        else:
+            documents = self.retriever.retrieve(question)
         
         return {"documents": documents, "question": question}
     
@@ -76,11 +126,68 @@ class WorkflowNodes:
         logger.info("Node: WEB SEARCH")
         question = state["question"]
         
-        # Perform web search
-        documents = self.web_searcher.search_to_documents(question)
+        # Perform web search, falling back to the vectorstore if it hangs or is failing
+        try:
+            documents = self.web_searcher.search_to_documents(question)
+        except (DeadlineExceeded, CircuitOpenError, WebSearchError) as e:
+            logger.warning(f"Web search unavailable, retrieving instead: {e}")
+            documents = self.retriever.retrieve(question)
         
         return {"documents": documents, "question": question}
     
+    def dual_retrieve(self, state: GraphState) -> Dict[str, Any]:
+        """
+        Retrieve from the vectorstore as one branch of a dual-path route.
+        
+        Args:
+            state: Current workflow state
+            
+        Returns:
+            Updated state with the vectorstore branch's documents
+        """
+        return {"vectorstore_documents": self.retrieve(state)["documents"]}
+    
+    def dual_web_search(self, state: GraphState) -> Dict[str, Any]:
+        """
+        Search the web as one branch of a dual-path route.
+        
+        Args:
+            state: Current workflow state
+            
+        Returns:
+            Updated state with the web branch's documents, empty if web search
+            is unavailable since the other branch already covers the vectorstore
+        """
+        logger.info("Node: DUAL WEB SEARCH")
+        try:
+            documents = self.web_searcher.search_to_documents(state["question"])
+        except (DeadlineExceeded, CircuitOpenError, WebSearchError) as e:
+            logger.warning(f"Web search unavailable, using the vectorstore only: {e}")
+            documents = []
+        return {"web_documents": documents}
+    
+    def merge_documents(self, state: GraphState) -> Dict[str, Any]:
+        """
+        Merge and rank the documents of both branches of a dual-path route.
+        
+        Args:
+            state: Current workflow state
+            
+        Returns:
+            Updated state with the fused documents, ready for grading
+        """
+        logger.info("Node: MERGE DOCUMENTS")
+        documents = reciprocal_rank_fusion(
+            [state.get("vectorstore_documents") or [], state.get("web_documents") or []],
+            limit=self.max_documents,
+        )
+        return {
+            "documents": documents,
+            "question": state["question"],
+            "vectorstore_documents": None,
+            "web_documents": None,
+        }
+    
     def grade_documents(self, state: GraphState) -> Dict[str, Any]:
         """
         Grade retrieved documents for relevance.
@@ -134,11 +241,101 @@ class WorkflowNodes:
         question = state["question"]
         documents = state["documents"]
         
+        # When retrying after a scoped hallucination grade, steer the new
+        # answer away from the sentences the grader could not support
+        unsupported = None
+        previous = state.get("generation")
+        if previous:
+            unsupported = self.hallucination_grader.cached_unsupported(documents, previous)
+        
+        if unsupported:
+            logger.info(f"Regenerating without {len(unsupported)} unsupported sentences")
+        
+        # Each retry follows a failed grade, so escalate to the next model tier
+        attempts = state.get("generation_attempts") or 0
+        
         # Generate response
-        generation = self.generator.generate(question, documents)
+        generation = self.generator.generate(
+            question, documents, unsupported=unsupported, tier=attempts
+        )
         
         return {
             "documents": documents, 
             "question": question, 
-            "generation": generation
-        }
\ No newline at end of file
+            "generation": generation,
+            "generation_attempts": attempts + 1,
+        }
+    
+    def grade_generation(self, state: GraphState) -> Dict[str, Any]:
+        """
+        Grade the generation for hallucinations and answer quality concurrently.
+        
+        Args:
+            state: Current workflow state
+            
+        Returns:
+            Updated state with the generation grade
+        """
+        logger.info("Node: GRADE GENERATION")
+        reason = budget_exhausted(state)
+        if reason:
+            # Stop rather than spending more calls on grading
+            logger.info(f"Budget exhausted ({reason}), returning the best generation so far")
+            return {"generation_grade": "budget_exhausted"}
+        
+        question = state["question"]
+        documents = state["documents"]
+        generation = state["generation"]
+        
+        # Run both graders at the same time instead of one after the other
+        with QueryThreadPoolExecutor(max_workers=2) as executor:
+            grounded = executor.submit(
+                self.hallucination_grader.grade_generation, documents, generation
+            )
+            answers = executor.submit(self.answer_grader.grade_answer, question, generation)
+            is_grounded, answers_question = grounded.result(), answers.result()
+        
+        if not is_grounded:
+            grade = "not_supported"
+        elif not answers_question:
+            grade = "not_useful"
+        else:
+            grade = "useful"
+        logger.info(f"Generation grade: {grade}")
+        
+        return {"generation_grade": grade}
+    
+    def keep_best_generation(self, state: GraphState) -> Dict[str, Any]:
+        """
+        Remember a grounded generation before retrying for a more useful one.
+        
+        Args:
+            state: Current workflow state
+            
+        Returns:
+            Updated state with the best generation and its documents
+        """
+        logger.info("Node: KEEP BEST GENERATION")
+        return {"best_generation": state["generation"], "best_documents": state["documents"]}
+    
+    def return_best_generation(self, state: GraphState) -> Dict[str, Any]:
+        """
+        Finish a run whose budget ran out with the best generation so far.
+        
+        The latest generation that passed the grounding check is preferred;
+        without one, the current generation is returned ungraded.
+        
+        Args:
+            state: Current workflow state
+            
+        Returns:
+            Updated state with the generation to return and whether it was graded
+        """
+        logger.info("Node: RETURN BEST GENERATION")
+        if state.get("best_generation") is not None:
+            return {
+                "generation": state["best_generation"],
+                "documents": state.get("best_documents") or [],
+                "generation_graded": True,
+            }
+        return {"generation_graded": False}
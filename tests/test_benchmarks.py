@@ -0,0 +1,38 @@
+"""Tests for the offline benchmark suite."""
+
+import logging
+import unittest
+
+from benchmarks.run_benchmarks import run_benchmarks
+
+class TestBenchmarks(unittest.TestCase):
+    """Test the benchmark scenarios take their scripted paths."""
+
+    def setUp(self):
+        logging.getLogger("src").setLevel(logging.WARNING)
+
+    def test_scenarios(self):
+        """Test each scenario runs offline and exercises its path."""
+        results = run_benchmarks(
+            num_queries=2,
+            llm_latency=0.0,
+            embedding_latency=0.0,
+            search_latency=0.0,
+            track_memory=False,
+        )
+        by_name = {result["scenario"]: result for result in results}
+
+        self.assertEqual(by_name["vectorstore_hit"]["web_search_share"], 0.0)
+        self.assertEqual(by_name["vectorstore_hit"]["generations_per_query"], 1.0)
+        self.assertEqual(by_name["web_route"]["web_search_share"], 1.0)
+        self.assertGreater(
+            by_name["transform_loop"]["llm_calls_per_query"],
+            by_name["vectorstore_hit"]["llm_calls_per_query"],
+        )
+        self.assertEqual(by_name["hallucination_retry"]["generations_per_query"], 2.0)
+        for result in results:
+            self.assertGreater(result["qps"], 0)
+            self.assertIsNone(result["peak_memory_mb"])
+
+if __name__ == "__main__":
+    unittest.main()
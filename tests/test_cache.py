@@ -0,0 +1,100 @@
+"""Tests for the TTL cache and cached web searches."""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from benchmarks.fakes import fake_providers
+from src.components.searchers import WebSearcher, WebSearchError
+from src.utils.cache import SQLiteCacheBackend, TTLCache
+
+class TestTTLCache(unittest.TestCase):
+    """Test expiry, stale-while-revalidate and persistence."""
+
+    def test_expiry_and_size(self):
+        """Test entries expire after the TTL and the least recently used are evicted."""
+        cache = TTLCache(max_size=2, ttl=60.0)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+
+        with patch("src.utils.cache.time.time", return_value=time.time() + 61):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_stale_while_revalidate(self):
+        """Test stale entries are served at once and refreshed once in the background."""
+        cache = TTLCache(ttl=0.05, stale_ttl=60.0)
+        self.assertEqual(cache.get_or_load("q", lambda: "old"), ("old", "miss"))
+        time.sleep(0.06)
+
+        refreshed = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(None)
+            refreshed.wait(1.0)
+            return "new"
+
+        self.assertEqual(cache.get_or_load("q", loader), ("old", "stale"))
+        self.assertEqual(cache.get_or_load("q", loader), ("old", "stale"))
+        refreshed.set()
+        cache.close()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get_or_load("q", loader), ("new", "hit"))
+        self.assertEqual(cache.stats()["refreshes"], 1)
+
+    def test_persistent_backend(self):
+        """Test entries survive a new cache over the same database."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.db")
+            first = TTLCache(backend=SQLiteCacheBackend(path))
+            first.put("q", [{"url": "https://example.com"}])
+            first.close()
+
+            second = TTLCache(backend=SQLiteCacheBackend(path))
+            self.assertEqual(second.get("q"), [{"url": "https://example.com"}])
+            second.close()
+
+class TestWebSearcherCache(unittest.TestCase):
+    """Test web searches are served from the cache."""
+
+    def test_repeated_queries(self):
+        """Test normalized repeats reuse results and other search arguments do not."""
+        with fake_providers():
+            searcher = WebSearcher(api_key="test", num_results=2)
+            other = WebSearcher(api_key="test", num_results=2, include_domains=["example.com"])
+            with patch.object(searcher.search_tool, "invoke", wraps=searcher.search_tool.invoke) as invoke:
+                first = searcher.search_to_documents("Latest agent news")
+                first[0].metadata["title"] = "changed"
+                second = searcher.search_to_documents("  latest AGENT news ")
+
+            self.assertEqual(invoke.call_count, 1)
+            self.assertEqual(len(second), 2)
+            self.assertNotEqual(second[0].metadata["title"], "changed")
+            self.assertNotEqual(searcher._search_key, other._search_key)
+            self.assertEqual(searcher.cache.stats()["hits"], 1)
+
+    def test_failed_search_not_cached(self):
+        """Test an error reported by the search tool raises and the next call searches again."""
+        with fake_providers():
+            searcher = WebSearcher(api_key="test", num_results=2, stale_ttl=60.0)
+            results = searcher.search_tool.invoke({"query": "agents"})
+            with patch.object(
+                searcher.search_tool, "invoke", side_effect=["HTTPError('502 Server Error')", results]
+            ) as invoke:
+                with self.assertRaises(WebSearchError):
+                    searcher.search("agents")
+                self.assertEqual(len(searcher.cache), 0)
+                self.assertEqual(len(searcher.search("agents")), 2)
+
+            self.assertEqual(invoke.call_count, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Tests for model cascades."""
+
+import functools
+import unittest
+from unittest.mock import MagicMock
+
+from src.components.cascade import ModelCascade, binary_score_accepted
+from src.models.data_models import GradeDocuments
+
+class TestModelCascade(unittest.TestCase):
+    """Test the ModelCascade component."""
+
+    def test_escalates_unclear_grade(self):
+        """Test an unclear grade from the cheap model is escalated."""
+        # Set up mocks
+        cheap, strong = MagicMock(), MagicMock()
+        cheap.invoke.return_value = GradeDocuments(binary_score="maybe")
+        strong.invoke.return_value = GradeDocuments(binary_score="yes")
+
+        # Create cascade
+        cascade = ModelCascade([("cheap", cheap), ("strong", strong)], accept=binary_score_accepted)
+
+        # Test invoke
+        result = cascade.invoke({"question": "test"})
+
+        # Assertions
+        self.assertEqual(result.binary_score, "yes")
+        stats = cascade.stats()
+        self.assertEqual(stats["cheap"]["escalated"], 1)
+        self.assertEqual(stats["strong"]["hit_rate"], 1.0)
+
+    def test_escalates_low_confidence_grade(self):
+        """Test a clear but unconfident grade from the cheap model is escalated."""
+        # Set up mocks
+        cheap, strong = MagicMock(), MagicMock()
+        cheap.invoke.return_value = GradeDocuments(binary_score="no", confidence=0.4)
+        strong.invoke.return_value = GradeDocuments(binary_score="yes", confidence=0.9)
+
+        # Create cascade
+        accept = functools.partial(binary_score_accepted, min_confidence=0.7)
+        cascade = ModelCascade([("cheap", cheap), ("strong", strong)], accept=accept)
+
+        # Test invoke
+        result = cascade.invoke({"question": "test"})
+
+        # Assertions
+        self.assertEqual(result.binary_score, "yes")
+        self.assertEqual(cascade.stats()["cheap"]["escalated"], 1)
+        self.assertTrue(accept(GradeDocuments(binary_score="no", confidence=0.8)))
+
+    def test_escalates_errors_and_starts_at_tier(self):
+        """Test failures escalate and a starting tier skips cheaper models."""
+        # Set up mocks
+        cheap, strong = MagicMock(), MagicMock()
+        cheap.invoke.side_effect = ValueError("malformed output")
+        strong.invoke.return_value = "answer"
+
+        # Create cascade
+        cascade = ModelCascade([("cheap", cheap), ("strong", strong)])
+
+        # Test invoke
+        self.assertEqual(cascade.invoke({"question": "test"}), "answer")
+        self.assertEqual(cascade.invoke({"question": "test"}, tier=5), "answer")
+
+        # Assertions
+        cheap.invoke.assert_called_once()
+        self.assertEqual(cascade.stats()["cheap"]["errors"], 1)
+        self.assertEqual(cascade.stats()["strong"]["calls"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
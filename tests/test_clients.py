@@ -0,0 +1,32 @@
+"""Tests for the shared client registry."""
+
+import unittest
+
+from src.utils.clients import ClientRegistry, openai_client_kwargs
+
+class TestClientRegistry(unittest.TestCase):
+    """Test the ClientRegistry utility."""
+
+    def test_shares_clients_per_model(self):
+        """Test one pooled client is built per provider and model."""
+        registry = ClientRegistry(connect_timeout=2.0, read_timeout=10.0)
+
+        first = registry.openai_kwargs("gpt-4o-mini")
+        second = registry.openai_kwargs("gpt-4o-mini")
+        other = registry.openai_kwargs("gpt-4o")
+
+        self.assertIs(first["http_client"], second["http_client"])
+        self.assertIs(first["http_async_client"], second["http_async_client"])
+        self.assertIsNot(first["http_client"], other["http_client"])
+        self.assertEqual(first["http_client"].timeout.connect, 2.0)
+        self.assertEqual(first["http_client"].timeout.read, 10.0)
+
+        registry.close()
+        self.assertTrue(first["http_client"].is_closed)
+
+    def test_no_registry(self):
+        """Test components keep their default clients without a registry."""
+        self.assertEqual(openai_client_kwargs(None, "gpt-4o-mini"), {})
+
+if __name__ == '__main__':
+    unittest.main()
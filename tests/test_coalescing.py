@@ -0,0 +1,125 @@
+"""Tests for single-flight request coalescing."""
+
+import asyncio
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from src.app import AdaptiveRAG
+from src.models.data_models import RAGResult
+from src.utils.coalescing import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    """Test concurrent calls with the same key share one run."""
+
+    def test_threads_share_call(self):
+        """Test concurrent thread callers get the result of a single call."""
+        flight = SingleFlight()
+        calls = []
+
+        def slow(value):
+            calls.append(value)
+            time.sleep(0.1)
+            return value * 2
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            results = list(executor.map(lambda _: flight.do("key", slow, 21), range(5)))
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], [42] * 5)
+        self.assertEqual(sum(shared for _, shared in results), 4)
+        self.assertEqual(flight.stats(), {"leaders": 1, "followers": 4, "in_flight": 0})
+
+    def test_errors_are_shared(self):
+        """Test waiting callers receive the call's exception and later calls run again."""
+        flight = SingleFlight()
+        started = threading.Event()
+
+        def failing():
+            started.set()
+            time.sleep(0.05)
+            raise ValueError("upstream failed")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(flight.do, "key", failing)
+            started.wait()
+            follower = executor.submit(flight.do, "key", failing)
+            for future in (leader, follower):
+                with self.assertRaises(ValueError):
+                    future.result()
+
+        self.assertEqual(flight.do("key", lambda: "ok"), ("ok", False))
+
+    def test_async_and_thread_callers(self):
+        """Test asyncio callers share a call with each other and with threads."""
+        flight = SingleFlight()
+        calls = []
+
+        async def slow():
+            calls.append(None)
+            await asyncio.sleep(0.1)
+            return "answer"
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            tasks = [asyncio.ensure_future(flight.ado("key", slow)) for _ in range(3)]
+            await asyncio.sleep(0.02)
+            from_thread = loop.run_in_executor(None, flight.do, "key", lambda: "unused")
+            return await asyncio.gather(*tasks, from_thread)
+
+        results = asyncio.run(main())
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], ["answer"] * 4)
+
+    def test_cancelled_leader(self):
+        """Test cancelling the caller that started a call does not cancel it for the others."""
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        async def main():
+            leader = asyncio.ensure_future(flight.ado("key", slow))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.ado("key", slow))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            return await follower
+
+        self.assertEqual(asyncio.run(main()), ("answer", True))
+
+class TestQueryCoalescing(unittest.TestCase):
+    """Test AdaptiveRAG.query coalesces identical questions."""
+
+    def test_query(self):
+        """Test normalized repeats share a run but get their own copy of the result."""
+        rag = AdaptiveRAG.__new__(AdaptiveRAG)
+        rag.coalescer = SingleFlight()
+        runs = []
+
+        def run(question, profile=None):
+            runs.append(question)
+            time.sleep(0.1)
+            return RAGResult(
+                question=question, answer="Answer", documents=[], routing_decision="vectorstore",
+                metadata={"original_question": question},
+            )
+
+        rag._query = run
+        questions = ["What is an agent?", "  what is an AGENT? "]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(rag.query, questions[0])
+            time.sleep(0.02)
+            second = executor.submit(rag.query, questions[1])
+            results = [first.result(), second.result()]
+
+        self.assertEqual(runs, [questions[0]])
+        self.assertEqual(results[1].question, questions[1])
+        self.assertTrue(results[1].metadata["coalesced"])
+        self.assertNotIn("coalesced", results[0].metadata)
+
+if __name__ == "__main__":
+    unittest.main()
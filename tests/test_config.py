@@ -0,0 +1,38 @@
+"""Tests for configuration defaults."""
+
+import unittest
+
+from src.config import Config, DEFAULT_RESILIENCE_SETTINGS
+
+class TestConfig(unittest.TestCase):
+    """Test partial settings are merged with the defaults."""
+
+    def test_partial_vectorstore_settings(self):
+        """Test overriding sharding keeps the chunking defaults."""
+        config = Config(vectorstore_settings={"num_shards": 4, "shard_key": "source"})
+
+        self.assertEqual(config.vectorstore_settings["num_shards"], 4)
+        self.assertEqual(config.vectorstore_settings["chunk_size"], 500)
+        self.assertEqual(config.vectorstore_settings["chunk_overlap"], 0)
+
+    def test_partial_resilience_settings(self):
+        """Test overriding one service setting keeps the rest of it and the other service."""
+        config = Config(resilience_settings={"enabled": True, "llm": {"timeout": 5.0}})
+
+        self.assertTrue(config.resilience_settings["enabled"])
+        self.assertEqual(config.resilience_settings["llm"]["timeout"], 5.0)
+        self.assertEqual(
+            config.resilience_settings["llm"]["failure_threshold"],
+            DEFAULT_RESILIENCE_SETTINGS["llm"]["failure_threshold"],
+        )
+        self.assertEqual(config.resilience_settings["web_search"], DEFAULT_RESILIENCE_SETTINGS["web_search"])
+
+    def test_result_changing_features_off_by_default(self):
+        """Test features that change what callers get back must be opted into."""
+        config = Config()
+
+        self.assertFalse(config.context_settings["enabled"])
+        self.assertFalse(config.workflow_settings["coalesce_queries"])
+
+if __name__ == "__main__":
+    unittest.main()
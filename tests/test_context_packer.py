@@ -0,0 +1,50 @@
+"""Tests for context packing utilities."""
+
+import unittest
+from langchain.schema import Document
+
+from src.utils.context_packer import ContextPacker
+
+class TestContextPacker(unittest.TestCase):
+    """Test the ContextPacker utility."""
+
+    def test_removes_duplicates(self):
+        """Test exact and near-duplicate passages are dropped."""
+        packer = ContextPacker(max_tokens=1000, near_duplicate_threshold=0.8)
+        passage = "Agents use short-term and long-term memory to plan their next actions carefully."
+
+        docs = packer.select([
+            Document(page_content=passage),
+            Document(page_content="  " + passage.replace(" ", "  ")),
+            Document(page_content=passage + " Indeed."),
+            Document(page_content="Prompt engineering steers model behaviour."),
+        ])
+
+        self.assertEqual(len(docs), 2)
+        self.assertEqual(docs[1].page_content, "Prompt engineering steers model behaviour.")
+
+    def test_orders_by_score(self):
+        """Test passages are ordered by relevance score."""
+        packer = ContextPacker(max_tokens=1000)
+
+        docs = packer.select([
+            Document(page_content="Low relevance", metadata={"score": 0.2}),
+            Document(page_content="High relevance", metadata={"score": 0.9}),
+        ])
+
+        self.assertEqual([doc.page_content for doc in docs], ["High relevance", "Low relevance"])
+
+    def test_truncates_to_budget(self):
+        """Test the packed context never exceeds the token budget."""
+        packer = ContextPacker(max_tokens=50)
+
+        context = packer.pack([
+            Document(page_content=" ".join(f"word{i}" for i in range(200))),
+            Document(page_content="Never included"),
+        ])
+
+        self.assertLessEqual(packer.count_tokens(context), 50)
+        self.assertNotIn("Never included", context)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+"""Tests for grader components."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+from langchain.schema import Document
+
+from src.components.graders import DocumentGrader, HallucinationGrader
+from src.models.data_models import GradeDocuments, GradeSentences
+
+class TestDocumentGrader(unittest.TestCase):
+    """Test the DocumentGrader component."""
+
+    @patch('src.components.graders.ChatOpenAI')
+    @patch('src.components.graders.ChatPromptTemplate')
+    def test_filter_documents(self, mock_prompt, mock_llm):
+        """Test every document is graded by the LLM without a pre-filter."""
+        # Set up mocks
+        mock_chain = MagicMock()
+        mock_chain.invoke.side_effect = [
+            GradeDocuments(binary_score="yes"),
+            GradeDocuments(binary_score="no"),
+        ]
+        mock_prompt.from_messages.return_value.__or__.return_value = mock_chain
+
+        # Create grader
+        grader = DocumentGrader()
+
+        # Test filter_documents
+        docs = grader.filter_documents(
+            [Document(page_content="Relevant"), Document(page_content="Irrelevant")],
+            "test question",
+        )
+
+        # Assertions
+        self.assertEqual([doc.page_content for doc in docs], ["Relevant"])
+        self.assertEqual(mock_chain.invoke.call_count, 2)
+
+    @patch('src.components.graders.ChatOpenAI')
+    @patch('src.components.graders.ChatPromptTemplate')
+    def test_embedding_prefilter(self, mock_prompt, mock_llm):
+        """Test only the uncertain band is sent to the LLM grader."""
+        # Set up mocks
+        mock_chain = MagicMock()
+        mock_chain.invoke.return_value = GradeDocuments(binary_score="yes")
+        mock_prompt.from_messages.return_value.__or__.return_value = mock_chain
+
+        embeddings = MagicMock()
+        embeddings.embed_documents.return_value = [
+            [1.0, 0.0],   # question
+            [0.99, 0.1],  # clearly relevant
+            [0.0, 1.0],   # clearly irrelevant
+            [0.6, 0.8],   # uncertain
+        ]
+
+        # Create grader
+        grader = DocumentGrader(
+            embeddings=embeddings,
+            accept_threshold=0.9,
+            reject_threshold=0.2,
+        )
+
+        # Test filter_documents
+        docs = grader.filter_documents(
+            [
+                Document(page_content="Clear"),
+                Document(page_content="Unrelated"),
+                Document(page_content="Maybe"),
+            ],
+            "test question",
+        )
+
+        # Assertions
+        self.assertEqual([doc.page_content for doc in docs], ["Clear", "Maybe"])
+        mock_chain.invoke.assert_called_once_with({
+            "document": "Maybe",
+            "question": "test question",
+        })
+        self.assertEqual(grader.prefilter_stats, {"accepted": 1, "rejected": 1, "llm": 1})
+
+        # Embeddings are memoized across calls
+        grader.filter_documents([Document(page_content="Clear")], "test question")
+        embeddings.embed_documents.assert_called_once()
+
+    @patch('src.components.graders.ChatOpenAI')
+    @patch('src.components.graders.ChatPromptTemplate')
+    def test_low_confidence_grade_escalates(self, mock_prompt, mock_llm):
+        """Test a cascade asks the stronger model when the cheap grade is unconfident."""
+        # Set up mocks; both tiers share the mocked chain
+        mock_chain = MagicMock()
+        mock_chain.invoke.side_effect = [
+            GradeDocuments(binary_score="no", confidence=0.3),
+            GradeDocuments(binary_score="yes", confidence=0.95),
+        ]
+        mock_prompt.from_messages.return_value.__or__.return_value = mock_chain
+
+        # Create grader
+        grader = DocumentGrader(model_name=["cheap", "strong"], min_confidence=0.7)
+
+        # Assertions
+        self.assertTrue(grader.grade_document(Document(page_content="Maybe"), "test question"))
+        self.assertEqual(grader.grader_chain.stats()["cheap"]["escalated"], 1)
+
+    @patch('src.components.graders.ChatOpenAI')
+    @patch('src.components.graders.ChatPromptTemplate')
+    def test_prefilter_reuses_stored_embeddings(self, mock_prompt, mock_llm):
+        """Test stored chunk and query vectors are used and only unknown chunks are embedded."""
+        # Set up mocks
+        mock_chain = MagicMock()
+        mock_chain.invoke.return_value = GradeDocuments(binary_score="yes")
+        mock_prompt.from_messages.return_value.__or__.return_value = mock_chain
+
+        embeddings = MagicMock()
+        retriever = MagicMock()
+        retriever.lookup_query_embedding.return_value = [1.0, 0.0]
+        retriever.lookup_embeddings.return_value = [[0.99, 0.1], [0.0, 1.0]]
+
+        # Create grader
+        grader = DocumentGrader(
+            embeddings=embeddings,
+            retriever=retriever,
+            accept_threshold=0.9,
+            reject_threshold=0.2,
+        )
+
+        # Test filter_documents with only stored vectors
+        docs = [Document(page_content="Clear"), Document(page_content="Unrelated")]
+        self.assertEqual([doc.page_content for doc in grader.filter_documents(docs, "test question")], ["Clear"])
+        embeddings.embed_documents.assert_not_called()
+        mock_chain.invoke.assert_not_called()
+
+        # A chunk the index does not hold, such as a web result, is embedded alone
+        retriever.lookup_embeddings.return_value = [[0.99, 0.1], None]
+        embeddings.embed_documents.return_value = [[0.0, 1.0]]
+        grader.filter_documents(docs[:1] + [Document(page_content="Web result")], "test question")
+        embeddings.embed_documents.assert_called_once_with(["Web result"])
+
+class TestHallucinationGrader(unittest.TestCase):
+    """Test the HallucinationGrader component."""
+
+    @patch('src.components.graders.ChatOpenAI')
+    @patch('src.components.graders.ChatPromptTemplate')
+    def test_scoped_grading(self, mock_prompt, mock_llm):
+        """Test each sentence is graded against its closest passages only."""
+        # Set up mocks
+        mock_chain = MagicMock()
+        mock_chain.invoke.return_value = GradeSentences(unsupported=[2, 7])
+        mock_prompt.from_messages.return_value.__or__.return_value = mock_chain
+
+        embeddings = MagicMock()
+        embeddings.embed_documents.return_value = [
+            [1.0, 0.0],   # first sentence
+            [0.0, 1.0],   # second sentence
+            [1.0, 0.1],   # closest to the first sentence
+            [0.3, 1.0],   # closest to the second sentence
+            [-1.0, 0.0],  # unrelated
+        ]
+
+        # Create grader
+        grader = HallucinationGrader(embeddings=embeddings, evidence_per_sentence=1)
+        documents = [
+            Document(page_content="Agents plan."),
+            Document(page_content="Agents remember."),
+            Document(page_content="Unrelated."),
+        ]
+        generation = "Agents plan ahead. Agents never forget."
+
+        # Test find_unsupported
+        unsupported = grader.find_unsupported(documents, generation)
+
+        # Assertions
+        self.assertEqual(unsupported, ["Agents never forget."])
+        mock_chain.invoke.assert_called_once_with({
+            "documents": "Agents plan.\n\nAgents remember.",
+            "statements": "1. Agents plan ahead.\n2. Agents never forget.",
+        })
+        self.assertEqual(grader.cached_unsupported(documents, generation), unsupported)
+        self.assertIsNone(grader.cached_unsupported(documents, "Another answer."))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Tests for metrics utilities."""
+
+import unittest
+from langchain_core.language_models import FakeListChatModel
+
+from src.utils.metrics import (
+    MetricsCallbackHandler,
+    MetricsRegistry,
+    QueryMetrics,
+    record_cache_hit,
+    track_stage,
+)
+
+class TestMetrics(unittest.TestCase):
+    """Test stage tracking and aggregation."""
+
+    def test_attributes_calls_to_stage(self):
+        """Test LLM calls and cache hits are charged to the running stage."""
+        query_metrics = QueryMetrics()
+        registry = MetricsRegistry()
+        handler = MetricsCallbackHandler()
+        llm = FakeListChatModel(responses=["one", "two"])
+
+        with track_stage(query_metrics, registry, "node", "generate"):
+            llm.invoke("first", config={"callbacks": [handler]})
+            record_cache_hit()
+        llm.invoke("outside", config={"callbacks": [handler]})
+
+        summary = query_metrics.summary()
+        self.assertEqual(summary["stages"][0]["llm_calls"], 1)
+        self.assertEqual(summary["stages"][0]["cache_hits"], 1)
+        self.assertEqual(summary["totals"]["llm_calls"], 1)
+
+        data = registry.to_dict()
+        self.assertEqual(data["histograms"]["rag_stage_seconds"][0]["count"], 1)
+        self.assertEqual(
+            data["histograms"]["rag_stage_seconds"][0]["buckets"]["+Inf"], 1
+        )
+
+    def test_no_query_metrics(self):
+        """Test stages are not recorded without per-query metrics."""
+        registry = MetricsRegistry()
+
+        with track_stage(None, registry, "node", "retrieve") as record:
+            record_cache_hit()
+
+        self.assertIsNone(record)
+        self.assertEqual(registry.to_prometheus(), "\n")
+
+if __name__ == '__main__':
+    unittest.main()
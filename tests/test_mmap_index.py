@@ -0,0 +1,188 @@
+"""Tests for the shared memory-mapped index."""
+
+import importlib.util
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+from langchain.schema import Document
+
+from benchmarks.fakes import FakeEmbeddings, fake_providers
+from src.components.retrievers import MemoryMappedRetriever
+from src.utils.clients import ClientRegistry
+from src.utils.mmap_index import IndexVersion, SharedIndexReader, build_index, current_version, publish_index
+from src.utils.rate_limit import current_priority
+
+TEXTS = [
+    "Agents plan tasks and call tools.",
+    "Prompt engineering steers model outputs.",
+    "Adversarial attacks target language models.",
+]
+
+UI_DIR = Path(__file__).parent.parent / "ui"
+
+def installed(package):
+    """Whether an optional UI framework is installed."""
+    return importlib.util.find_spec(package) is not None
+
+def publish(root, texts, keep=3):
+    """Publish texts embedded with the fake embeddings."""
+    vectors = FakeEmbeddings().embed_documents(texts)
+    metadatas = [{"source": f"https://example.com/{index}"} for index in range(len(texts))]
+    return publish_index(root, vectors, texts, metadatas, keep=keep)
+
+class TestPublishIndex(unittest.TestCase):
+    """Test publishing and mapping index versions."""
+
+    def test_publish_and_search(self):
+        """Test a published version is mapped read-only and searched by similarity."""
+        with tempfile.TemporaryDirectory() as root:
+            version = publish(root, TEXTS)
+            self.assertEqual(current_version(root), version)
+
+            index = IndexVersion(root, version)
+            self.assertIsInstance(index.vectors, np.memmap)
+            self.assertFalse(index.vectors.flags.writeable)
+            self.assertEqual(index.document(1), Document(page_content=TEXTS[1], metadata={"source": "https://example.com/1"}))
+
+            query = FakeEmbeddings().embed_query("Agents plan tasks and call tools.")
+            results = index.search(query, 2)
+            self.assertEqual([position for position, _ in results][0], 0)
+            self.assertAlmostEqual(results[0][1], 1.0, places=5)
+            self.assertGreater(results[0][1], results[1][1])
+
+    def test_reader_follows_published_version(self):
+        """Test readers switch to a new version and old versions are pruned."""
+        with tempfile.TemporaryDirectory() as root:
+            reader = SharedIndexReader(root, check_interval=0.0)
+            self.assertIsNone(reader.current())
+
+            first = publish(root, TEXTS)
+            held = reader.current()
+            self.assertEqual(held.version, first)
+
+            second = publish(root, TEXTS[:1], keep=1)
+            self.assertEqual(reader.current().version, second)
+            self.assertEqual(len(reader.current()), 1)
+            self.assertEqual(os.listdir(os.path.join(root, "versions")), [second])
+
+            # A search that started on the old version can still read it
+            self.assertEqual(held.text(2), TEXTS[2])
+
+    def test_rejects_mismatched_rows(self):
+        """Test publishing fails when vectors and texts disagree."""
+        with tempfile.TemporaryDirectory() as root:
+            with self.assertRaises(ValueError):
+                publish_index(root, np.zeros((2, 4)), TEXTS)
+            self.assertIsNone(current_version(root))
+
+class TestBuildIndex(unittest.TestCase):
+    """Test building an index from documents."""
+
+    def test_build_uses_shared_clients_at_bulk_priority(self):
+        """Test embeddings go through the client registry and run as bulk requests."""
+        priorities = []
+        constructed = []
+
+        class RecordingEmbeddings(FakeEmbeddings):
+            def embed_documents(self, texts):
+                priorities.append(current_priority())
+                return super().embed_documents(texts)
+
+        def embeddings(**kwargs):
+            constructed.append(kwargs)
+            return RecordingEmbeddings()
+
+        registry = ClientRegistry()
+        with tempfile.TemporaryDirectory() as root, fake_providers(), \
+                patch("src.utils.mmap_index.OpenAIEmbeddings", embeddings):
+            version = build_index(root, ["https://example.com/agents"], batch_size=2, client_registry=registry)
+            self.assertEqual(current_version(root), version)
+            self.assertGreater(len(IndexVersion(root, version)), 0)
+
+        self.assertIs(constructed[0]["http_client"], registry.http_client("openai"))
+        self.assertTrue(priorities)
+        self.assertEqual(set(priorities), {"bulk"})
+        self.assertEqual(current_priority(), "interactive")
+        registry.close()
+
+class TestMemoryMappedRetriever(unittest.TestCase):
+    """Test retrieval from a shared index."""
+
+    def test_retrieve(self):
+        """Test results come from the current version and are not cached across versions."""
+        with tempfile.TemporaryDirectory() as root, fake_providers():
+            publish(root, TEXTS)
+            retriever = MemoryMappedRetriever(root, check_interval=0.0, search_kwargs={"k": 2})
+
+            documents = retriever.retrieve("How do agents call tools?")
+            self.assertEqual(len(documents), 2)
+            self.assertEqual(documents[0].page_content, TEXTS[0])
+
+            publish(root, ["Agents call tools in a loop."])
+            documents = retriever.retrieve("How do agents call tools?")
+            self.assertEqual([doc.page_content for doc in documents], ["Agents call tools in a loop."])
+
+            embeddings, sources = retriever.get_index_embeddings()
+            self.assertEqual((len(embeddings), sources), (1, ["https://example.com/0"]))
+            with self.assertRaises(RuntimeError):
+                retriever.add_documents([Document(page_content="new")])
+
+    def test_adaptive_k(self):
+        """Test adaptive selection uses the index's relevance scores."""
+        with tempfile.TemporaryDirectory() as root, fake_providers():
+            publish(root, TEXTS)
+            retriever = MemoryMappedRetriever(root, adaptive_k=True, k_min=1, k_max=3, score_threshold=0.9)
+
+            documents = retriever.retrieve("Agents plan tasks and call tools.")
+            self.assertEqual([doc.page_content for doc in documents], [TEXTS[0]])
+            self.assertAlmostEqual(documents[0].metadata["score"], 1.0, places=5)
+
+class TestUISharedIndex(unittest.TestCase):
+    """Test every UI maps the shared index named by RAG_SHARED_INDEX_DIR."""
+
+    def build_rag(self, load):
+        """Publish an index, build a UI's RAG system with the variable set and check its retriever."""
+        with tempfile.TemporaryDirectory() as root, fake_providers():
+            publish(root, TEXTS)
+            with patch.dict(os.environ, {"RAG_SHARED_INDEX_DIR": root}):
+                rag = load()
+            try:
+                self.assertIsInstance(rag.retriever, MemoryMappedRetriever)
+                self.assertEqual(rag.retriever.index_version, current_version(root))
+            finally:
+                rag.close()
+
+    def import_ui(self, name):
+        """Import a UI module from its file and return the RAG system it built."""
+        spec = importlib.util.spec_from_file_location(f"ui_{name}", UI_DIR / f"{name}.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module.rag
+
+    @unittest.skipUnless(installed("flask"), "Flask is not installed")
+    def test_flask(self):
+        """Test the Flask app."""
+        self.build_rag(lambda: self.import_ui("flask_app"))
+
+    @unittest.skipUnless(installed("gradio"), "Gradio is not installed")
+    def test_gradio(self):
+        """Test the Gradio app."""
+        self.build_rag(lambda: self.import_ui("gradio_app"))
+
+    @unittest.skipUnless(installed("streamlit"), "Streamlit is not installed")
+    def test_streamlit(self):
+        """Test the Streamlit app."""
+        from streamlit.testing.v1 import AppTest
+
+        def load():
+            app = AppTest.from_file(str(UI_DIR / "app.py"), default_timeout=30).run()
+            return app.session_state["rag"]
+
+        self.build_rag(load)
+
+if __name__ == "__main__":
+    unittest.main()
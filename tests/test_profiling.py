@@ -0,0 +1,97 @@
+"""Tests for query profiling."""
+
+import json
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from src.utils.metrics import QueryMetrics, track_stage
+from src.utils.profiling import QueryProfiler, QueryThreadPoolExecutor
+
+def busy(seconds):
+    """Spin for a while so the sampler sees this frame."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def unrelated_work(stop):
+    """Spin until stopped, standing in for another query served concurrently."""
+    while not stop.is_set():
+        pass
+
+def pool_task():
+    """Spin in a pool thread on behalf of the profiled query."""
+    busy(0.05)
+
+class TestQueryProfiler(unittest.TestCase):
+    """Test profiles and breakdowns are written and pruned."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.output_dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_profiled(self, profiler):
+        query_metrics = QueryMetrics()
+        with profiler.profile("What is agent memory?") as run:
+            run.metrics = query_metrics
+            with track_stage(query_metrics, None, "node", "retrieve"):
+                busy(0.05)
+        return run
+
+    def test_sampling_profile(self):
+        """Test sampling mode writes collapsed stacks and a per-node breakdown."""
+        profiler = QueryProfiler(output_dir=self.tmp.name, mode="sampling", interval=0.001)
+        run = self.run_profiled(profiler)
+
+        stacks = Path(run.paths["profile"]).read_text()
+        self.assertIn("test_profiling.py:busy", stacks)
+        breakdown = json.loads(Path(run.paths["breakdown"]).read_text())
+        self.assertEqual(breakdown["question"], "What is agent memory?")
+        self.assertGreater(breakdown["per_stage_seconds"]["node:retrieve"], 0.04)
+
+    def test_sampling_ignores_other_threads(self):
+        """Test only the query's own threads, including its pool tasks, are sampled."""
+        profiler = QueryProfiler(output_dir=self.tmp.name, mode="sampling", interval=0.001)
+        stop = threading.Event()
+        other = threading.Thread(target=unrelated_work, args=(stop,))
+        other.start()
+        try:
+            with QueryThreadPoolExecutor(max_workers=1) as executor:
+                with profiler.profile("What is agent memory?"):
+                    executor.submit(pool_task).result()
+                # The pool thread is no longer the query's once its task is done
+                executor.submit(pool_task).result()
+        finally:
+            stop.set()
+            other.join()
+
+        stacks = Path(next(self.output_dir.glob("*.folded"))).read_text()
+        self.assertIn("test_profiling.py:pool_task", stacks)
+        self.assertNotIn("unrelated_work", stacks)
+
+    def test_cprofile_and_pruning(self):
+        """Test cProfile mode writes a stats file and old profiles are deleted."""
+        profiler = QueryProfiler(output_dir=self.tmp.name, mode="cprofile", max_profiles=2)
+        runs = [self.run_profiled(profiler) for _ in range(3)]
+
+        self.assertTrue(runs[-1].paths["profile"].endswith(".prof"))
+        self.assertEqual(len(list(self.output_dir.glob("*.json"))), 2)
+        self.assertEqual(len(list(self.output_dir.glob("*.prof"))), 2)
+
+    def test_should_profile(self):
+        """Test explicit requests override the sample rate."""
+        never = QueryProfiler(output_dir=self.tmp.name, sample_rate=0.0)
+        always = QueryProfiler(output_dir=self.tmp.name, sample_rate=1.0)
+
+        self.assertFalse(never.should_profile())
+        self.assertTrue(never.should_profile(True))
+        self.assertTrue(always.should_profile())
+        self.assertFalse(always.should_profile(False))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""Tests for client-side rate limiting."""
+
+import json
+import threading
+import time
+import unittest
+
+import httpx
+
+from src.utils.clients import ClientRegistry
+from src.utils.rate_limit import (
+    ModelRateLimiter,
+    RateLimiterRegistry,
+    estimate_tokens,
+    request_priority,
+)
+
+class TestModelRateLimiter(unittest.TestCase):
+    """Test the token buckets and priority scheduling."""
+
+    def test_smooths_bursts(self):
+        """Test requests beyond the burst wait for the bucket to refill."""
+        # One request of burst, refilled every 10ms
+        limiter = ModelRateLimiter(requests_per_minute=6000, burst_seconds=0.01)
+
+        waits = [limiter.acquire() for _ in range(4)]
+
+        self.assertLess(waits[0], 0.005)
+        self.assertTrue(all(wait > 0.005 for wait in waits[1:]))
+        self.assertEqual(limiter.stats()["granted"], 4)
+
+    def test_token_limit(self):
+        """Test large requests are held back by the token bucket."""
+        limiter = ModelRateLimiter(tokens_per_minute=60_000, burst_seconds=0.1)  # 100 tokens
+
+        self.assertLess(limiter.acquire(tokens=100), 0.005)
+        self.assertGreater(limiter.acquire(tokens=50), 0.03)
+
+    def test_interactive_before_bulk(self):
+        """Test a waiting interactive request is served before an earlier bulk one."""
+        limiter = ModelRateLimiter(requests_per_minute=600, burst_seconds=0.1)  # 1 request per 100ms
+        limiter.acquire()
+        order = []
+
+        def request(priority):
+            with request_priority(priority):
+                limiter.acquire()
+            order.append(priority)
+
+        bulk = threading.Thread(target=request, args=("bulk",))
+        bulk.start()
+        time.sleep(0.02)
+        interactive = threading.Thread(target=request, args=("interactive",))
+        interactive.start()
+        bulk.join()
+        interactive.join()
+
+        self.assertEqual(order, ["interactive", "bulk"])
+
+    def test_estimate_tokens(self):
+        """Test token estimates for chat and embedding requests."""
+        chat = json.dumps({"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 50})
+        embedding = json.dumps({"input": ["y" * 80, "z" * 80]})
+
+        self.assertEqual(estimate_tokens(chat.encode()), 150)
+        self.assertEqual(estimate_tokens(embedding.encode()), 40)
+
+class TestHttpxHooks(unittest.TestCase):
+    """Test the limiter applied to HTTP clients."""
+
+    def test_usage_and_throttling(self):
+        """Test actual usage corrects the estimate and 429 responses pause requests."""
+        limiter = ModelRateLimiter(tokens_per_minute=600_000)
+        responses = iter([
+            httpx.Response(200, json={"usage": {"total_tokens": 1000}}),
+            httpx.Response(429, headers={"retry-after": "0.05"}),
+        ])
+        client = httpx.Client(
+            transport=httpx.MockTransport(lambda request: next(responses)),
+            event_hooks=limiter.httpx_hooks(),
+        )
+        body = {"messages": [{"role": "user", "content": "x" * 40}]}
+
+        before = limiter.tokens
+        client.post("https://api.example.com/v1/chat/completions", json=body)
+        self.assertAlmostEqual(before - limiter.tokens, 1000, delta=5)
+
+        client.post("https://api.example.com/v1/chat/completions", json=body)
+        self.assertEqual(limiter.stats()["throttled"], 1)
+        self.assertGreaterEqual(limiter.acquire(), 0.03)
+
+    def test_registry_shares_limiters(self):
+        """Test every client for a model draws from the same limiter."""
+        rate_limiter = RateLimiterRegistry(
+            requests_per_minute=100,
+            models={"gpt-4o": {"requests_per_minute": 10}},
+        )
+        registry = ClientRegistry(rate_limiter=rate_limiter)
+        registry.openai_kwargs("gpt-4o")
+
+        self.assertIs(rate_limiter.limiter("gpt-4o"), rate_limiter.limiter("gpt-4o"))
+        self.assertEqual(rate_limiter.limiter("gpt-4o").requests_per_minute, 10)
+        self.assertEqual(rate_limiter.limiter("gpt-4o-mini").requests_per_minute, 100)
+        self.assertIn("gpt-4o", rate_limiter.stats())
+        registry.close()
+
+if __name__ == '__main__':
+    unittest.main()
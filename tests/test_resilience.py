@@ -0,0 +1,214 @@
+"""Tests for deadlines, hedged requests and circuit breakers."""
+
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import httpx
+
+from benchmarks.fakes import FaultInjector, fake_providers
+from src.app import AdaptiveRAG
+from src.components.searchers import WebSearcher, WebSearchError
+from src.config import Config
+from src.workflow.edges import WorkflowEdges
+from src.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    DeadlineExceeded,
+    ResiliencePolicy,
+    ResilienceRegistry,
+    is_service_failure,
+)
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Test the circuit breaker states."""
+
+    def test_opens_and_probes(self):
+        """Test the circuit opens at the threshold and a single probe closes it."""
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "closed")
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow())
+
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        # Only one probe at a time
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_failed_probe_reopens(self):
+        """Test a failed probe opens the circuit again."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+
+class TestResiliencePolicy(unittest.TestCase):
+    """Test calls made under a policy."""
+
+    def setUp(self):
+        self.registry = ResilienceRegistry(max_workers=4)
+
+    def tearDown(self):
+        self.registry.close()
+
+    def test_deadline(self):
+        """Test a hung call is abandoned at the deadline."""
+        policy = ResiliencePolicy("slow", self.registry.executor, timeout=0.05)
+        started = time.perf_counter()
+        with self.assertRaises(DeadlineExceeded):
+            policy.call(time.sleep, 1.0)
+
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(policy.stats()["timeouts"], 1)
+
+    def test_hedge_wins(self):
+        """Test a duplicate request answers when the first one hangs."""
+        policy = ResiliencePolicy(
+            "hedged", self.registry.executor, timeout=1.0,
+            hedge=True, hedge_min_samples=1, hedge_min_delay=0.02,
+        )
+        self.assertEqual(policy.call(lambda: "warm"), "warm")
+        calls = []
+        lock = threading.Lock()
+
+        def flaky():
+            with lock:
+                calls.append(None)
+                first = len(calls) == 1
+            if first:
+                time.sleep(0.5)
+            return len(calls)
+
+        started = time.perf_counter()
+        self.assertEqual(policy.call(flaky), 2)
+
+        self.assertLess(time.perf_counter() - started, 0.3)
+        stats = policy.stats()
+        self.assertEqual(stats["hedges"], 1)
+        self.assertEqual(stats["hedge_wins"], 1)
+
+    def test_circuit_rejects(self):
+        """Test errors are re-raised and open the circuit, which then fails fast."""
+        policy = ResiliencePolicy("failing", self.registry.executor, failure_threshold=2)
+        fault = FaultInjector(error_rate=1.0)
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                policy.call(fault)
+
+        with self.assertRaises(CircuitOpenError):
+            policy.call(fault)
+        self.assertEqual(fault.errors, 2)
+        self.assertEqual(policy.stats()["rejected"], 1)
+
+    def test_other_errors_keep_circuit_closed(self):
+        """Test errors from a service that answered are re-raised without opening the circuit."""
+        for timeout in (None, 1.0):
+            policy = ResiliencePolicy("healthy", self.registry.executor, timeout=timeout, failure_threshold=1)
+            for _ in range(2):
+                with self.assertRaises(ValueError):
+                    policy.call(int, "not a number")
+
+            stats = policy.stats()
+            self.assertEqual((stats["circuit"], stats["errors"], stats["failures"]), ("closed", 2, 0))
+
+    def test_service_failures(self):
+        """Test transport errors, timeouts, 429 and 5xx responses count against the circuit."""
+        request = httpx.Request("POST", "https://api.example.com")
+
+        def status_error(status):
+            response = httpx.Response(status, request=request)
+            return httpx.HTTPStatusError(str(status), request=request, response=response)
+
+        self.assertTrue(is_service_failure(httpx.ConnectError("refused", request=request)))
+        self.assertTrue(is_service_failure(DeadlineExceeded("slow")))
+        self.assertTrue(is_service_failure(WebSearchError("error text")))
+        self.assertTrue(is_service_failure(status_error(503)))
+        self.assertTrue(is_service_failure(status_error(429)))
+        self.assertFalse(is_service_failure(status_error(400)))
+        self.assertFalse(is_service_failure(ValueError("malformed output")))
+
+class TestWebSearchResilience(unittest.TestCase):
+    """Test web search with injected faults."""
+
+    def test_routing_skips_unhealthy_search(self):
+        """Test hung searches time out and open the circuit, keeping questions on the vectorstore."""
+        registry = ResilienceRegistry(services={
+            "web_search": {"timeout": 0.05, "failure_threshold": 2, "reset_timeout": 60.0},
+        })
+        faults = FaultInjector(hang_rate=1.0, hang_seconds=0.5)
+        query_router = MagicMock()
+        query_router.route.return_value = "web_search"
+
+        with fake_providers(search_faults=faults):
+            searcher = WebSearcher(api_key="test", resilience=registry)
+            edges = WorkflowEdges(
+                query_router=query_router,
+                hallucination_grader=MagicMock(),
+                answer_grader=MagicMock(),
+                web_searcher=searcher,
+            )
+            self.assertEqual(edges.route_question({"question": "News?"}), "web_search")
+            for _ in range(2):
+                with self.assertRaises(DeadlineExceeded):
+                    searcher.search("News?")
+
+            self.assertFalse(searcher.available())
+            self.assertEqual(edges.route_question({"question": "News?"}), "vectorstore")
+        registry.close()
+
+    def test_search_errors_open_circuit(self):
+        """Test errors the search tool returns as text count as failures."""
+        registry = ResilienceRegistry(services={"web_search": {"failure_threshold": 2, "reset_timeout": 60.0}})
+        with fake_providers():
+            searcher = WebSearcher(api_key="test", resilience=registry)
+            with patch.object(searcher.search_tool, "invoke", return_value="HTTPError('503 Server Error')"):
+                for _ in range(2):
+                    with self.assertRaises(WebSearchError):
+                        searcher.search("News?")
+
+            self.assertFalse(searcher.available())
+        registry.close()
+
+class TestClientTimeout(unittest.TestCase):
+    """Test abandoned model calls do not outlive their deadline."""
+
+    def test_read_timeout_capped_by_deadline(self):
+        """Test the shared clients time out requests at the model deadline."""
+        with fake_providers():
+            rag = AdaptiveRAG(config=Config(
+                document_urls=["https://example.com/agents"],
+                enable_tracing=False,
+                resilience_settings={"enabled": True, "llm": {"timeout": 5.0}},
+            ))
+            try:
+                self.assertEqual(rag.client_registry.timeout.read, 5.0)
+            finally:
+                rag.close()
+
+    def test_search_timeout_capped_by_deadline(self):
+        """Test web search requests time out at the search deadline."""
+        registry = ResilienceRegistry(services={"web_search": {"timeout": 3.0}})
+        searcher = WebSearcher(api_key="test", resilience=registry)
+        response = MagicMock()
+        response.json.return_value = {
+            "results": [{"title": "News", "url": "https://example.com", "content": "Text", "score": 1.0}],
+        }
+        try:
+            with patch("src.components.searchers.requests.post", return_value=response) as post:
+                results = searcher.search("News?")
+        finally:
+            registry.close()
+
+        self.assertEqual(results[0]["url"], "https://example.com")
+        self.assertEqual(post.call_args.kwargs["timeout"], 3.0)
+        self.assertEqual(post.call_args.kwargs["json"]["api_key"], "test")
+
+if __name__ == "__main__":
+    unittest.main()
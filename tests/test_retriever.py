@@ -4,7 +4,11 @@ import unittest
 from unittest.mock import MagicMock, patch
 from langchain.schema import Document
 
-from src.components.retrievers import VectorStoreRetriever, HybridRetriever
+from src.components.retrievers import (
+    VectorStoreRetriever,
+    ShardedVectorStoreRetriever,
+    HybridRetriever,
+)
 
 class TestVectorStoreRetriever(unittest.TestCase):
     """Test the VectorStoreRetriever component."""
@@ -36,12 +40,11 @@ class TestVectorStoreRetriever(unittest.TestCase):
         """Test retrieve method."""
         # Set up mocks
         mock_embeddings.return_value = MagicMock()
-        mock_retriever = MagicMock()
-        mock_retriever.invoke.return_value = [
+        mock_embeddings.return_value.embed_query.return_value = [0.1, 0.2]
+        mock_chroma.return_value = MagicMock()
+        mock_chroma.return_value.similarity_search_by_vector.return_value = [
             Document(page_content="Test content", metadata={"source": "test"})
         ]
-        mock_chroma.return_value = MagicMock()
-        mock_chroma.return_value.as_retriever.return_value = mock_retriever
         
         # Create retriever
         retriever = VectorStoreRetriever()
@@ -52,7 +55,210 @@ class TestVectorStoreRetriever(unittest.TestCase):
         # Assertions
         self.assertEqual(len(docs), 1)
         self.assertEqual(docs[0].page_content, "Test content")
-        mock_retriever.invoke.assert_called_once_with("test query")
+        mock_embeddings.return_value.embed_query.assert_called_once_with("test query")
+        mock_chroma.return_value.similarity_search_by_vector.assert_called_once_with([0.1, 0.2], k=4)
+        # The pre-filter reuses the embedding the search used
+        self.assertEqual(retriever.lookup_query_embedding("Test Query"), [0.1, 0.2])
+
+    @patch('src.components.retrievers.Chroma')
+    @patch('src.components.retrievers.OpenAIEmbeddings')
+    def test_retrieve_uses_cache(self, mock_embeddings, mock_chroma):
+        """Test repeated queries are served from the cache."""
+        # Set up mocks
+        mock_embeddings.return_value = MagicMock()
+        mock_embeddings.return_value.embed_query.return_value = [0.1, 0.2]
+        mock_chroma.return_value = MagicMock()
+        mock_chroma.return_value.similarity_search_by_vector.return_value = [
+            Document(page_content="Test content", metadata={"source": "test"})
+        ]
+        
+        # Create retriever
+        retriever = VectorStoreRetriever()
+        
+        # Same question with different casing and whitespace
+        retriever.retrieve("What is an agent?")
+        docs = retriever.retrieve("  what is  an AGENT? ")
+        
+        # Assertions
+        self.assertEqual(docs[0].page_content, "Test content")
+        mock_embeddings.return_value.embed_query.assert_called_once_with("What is an agent?")
+        self.assertEqual(retriever.cache.stats()["hits"], 1)
+    
+    @patch('src.components.retrievers.Chroma')
+    @patch('src.components.retrievers.OpenAIEmbeddings')
+    def test_add_documents_invalidates_cache(self, mock_embeddings, mock_chroma):
+        """Test adding documents bumps the index version."""
+        # Set up mocks
+        mock_embeddings.return_value = MagicMock()
+        mock_chroma.return_value = MagicMock()
+        mock_chroma.return_value.similarity_search_by_vector.return_value = []
+        
+        # Create retriever
+        retriever = VectorStoreRetriever()
+        
+        # Query, add documents, query again
+        retriever.retrieve("test query")
+        retriever.add_documents([Document(page_content="New", metadata={})])
+        retriever.retrieve("test query")
+        
+        # Assertions
+        self.assertEqual(retriever.index_version, 1)
+        self.assertEqual(mock_chroma.return_value.similarity_search_by_vector.call_count, 2)
+
+    @patch('src.components.retrievers.Chroma')
+    @patch('src.components.retrievers.OpenAIEmbeddings')
+    def test_lookup_embeddings(self, mock_embeddings, mock_chroma):
+        """Test chunks are stored under content ids and their vectors looked up by id."""
+        # Set up mocks
+        mock_embeddings.return_value = MagicMock()
+        mock_vectorstore = MagicMock()
+        mock_chroma.return_value = mock_vectorstore
+        docs = [
+            Document(page_content="A", metadata={"source": "doc-a"}),
+            Document(page_content="B", metadata={"source": "doc-a"}),
+        ]
+        
+        # Create retriever and index duplicated chunks
+        retriever = VectorStoreRetriever()
+        retriever.add_documents(docs + docs[:1])
+        added, kwargs = mock_vectorstore.add_documents.call_args
+        self.assertEqual(added[0], docs)
+        self.assertEqual(len(set(kwargs["ids"])), 2)
+        
+        # Look up stored vectors; unknown chunks get None
+        mock_vectorstore.get.return_value = {"ids": [kwargs["ids"][1]], "embeddings": [[0.5, 0.5]]}
+        vectors = retriever.lookup_embeddings([docs[1], Document(page_content="Web")])
+        
+        # Assertions
+        self.assertEqual(vectors, [[0.5, 0.5], None])
+        mock_embeddings.return_value.embed_documents.assert_not_called()
+
+    @patch('src.components.retrievers.Chroma')
+    @patch('src.components.retrievers.OpenAIEmbeddings')
+    def test_retrieve_many(self, mock_embeddings, mock_chroma):
+        """Test multi-query retrieval batches embeddings and merges results."""
+        # Set up mocks
+        mock_embeddings.return_value = MagicMock()
+        mock_embeddings.return_value.embed_documents.return_value = [[0.1], [0.2]]
+        mock_vectorstore = MagicMock()
+        mock_vectorstore.similarity_search_by_vector.side_effect = [
+            [Document(page_content="Shared", metadata={"source": "a"}),
+             Document(page_content="Only first", metadata={"source": "a"})],
+            [Document(page_content="Shared", metadata={"source": "a"})],
+        ]
+        
+        # Create retriever
+        retriever = VectorStoreRetriever(vectorstore=mock_vectorstore)
+        
+        # Test retrieve_many
+        docs = retriever.retrieve_many(["query one", "query two", "Query One"])
+        
+        # Assertions
+        self.assertEqual([doc.page_content for doc in docs], ["Shared", "Only first"])
+        mock_embeddings.return_value.embed_documents.assert_called_once_with(
+            ["query one", "query two"]
+        )
+        self.assertEqual(mock_vectorstore.similarity_search_by_vector.call_count, 2)
+
+    @patch('src.components.retrievers.Chroma')
+    @patch('src.components.retrievers.OpenAIEmbeddings')
+    def test_adaptive_k(self, mock_embeddings, mock_chroma):
+        """Test adaptive retrieval stops at a score gap and records scores."""
+        # Set up mocks
+        mock_embeddings.return_value = MagicMock()
+        mock_embeddings.return_value.embed_query.return_value = [0.1, 0.2]
+        mock_vectorstore = MagicMock()
+        mock_vectorstore._select_relevance_score_fn.return_value = lambda distance: 1.0 - distance
+        mock_vectorstore.similarity_search_by_vector_with_relevance_scores.return_value = [
+            (Document(page_content="A"), 0.05),
+            (Document(page_content="B"), 0.1),
+            (Document(page_content="C"), 0.5),
+            (Document(page_content="D"), 0.55),
+        ]
+        
+        # Create retriever
+        retriever = VectorStoreRetriever(
+            vectorstore=mock_vectorstore,
+            adaptive_k=True,
+            k_min=1,
+            k_max=4,
+            score_threshold=0.2,
+            max_score_gap=0.2,
+        )
+        
+        # Test retrieve
+        docs = retriever.retrieve("test query")
+        
+        # Assertions
+        self.assertEqual([doc.page_content for doc in docs], ["A", "B"])
+        self.assertAlmostEqual(docs[0].metadata["score"], 0.95)
+        mock_vectorstore.similarity_search_by_vector_with_relevance_scores.assert_called_once_with(
+            [0.1, 0.2], k=4
+        )
+
+class TestShardedVectorStoreRetriever(unittest.TestCase):
+    """Test the ShardedVectorStoreRetriever component."""
+    
+    @patch('src.components.retrievers.Chroma')
+    @patch('src.components.retrievers.OpenAIEmbeddings')
+    def test_add_documents_routes_by_source(self, mock_embeddings, mock_chroma):
+        """Test documents from one source land on a single shard."""
+        # Set up mocks
+        mock_embeddings.return_value = MagicMock()
+        mock_chroma.side_effect = [MagicMock(), MagicMock(), MagicMock()]
+        
+        # Create retriever
+        retriever = ShardedVectorStoreRetriever(num_shards=3, shard_key="source")
+        
+        # Add documents from the same source
+        retriever.add_documents([
+            Document(page_content=f"Chunk {i}", metadata={"source": "doc-a"})
+            for i in range(5)
+        ])
+        
+        # Assertions
+        called = [shard for shard in retriever.shards if shard.add_documents.called]
+        self.assertEqual(len(called), 1)
+        self.assertEqual(len(called[0].add_documents.call_args[0][0]), 5)
+        self.assertEqual(retriever.index_version, 1)
+    
+    @patch('src.components.retrievers.Chroma')
+    @patch('src.components.retrievers.OpenAIEmbeddings')
+    def test_retrieve_merges_top_k(self, mock_embeddings, mock_chroma):
+        """Test results from all shards are merged by relevance."""
+        # Set up mocks
+        mock_embeddings.return_value = MagicMock()
+        mock_embeddings.return_value.embed_query.return_value = [0.1, 0.2]
+        shards = [MagicMock(), MagicMock()]
+        for shard in shards:
+            shard._select_relevance_score_fn.return_value = lambda distance: 1.0 - distance
+        shards[0].similarity_search_by_vector_with_relevance_scores.return_value = [
+            (Document(page_content="A"), 0.1), (Document(page_content="C"), 0.5),
+        ]
+        shards[1].similarity_search_by_vector_with_relevance_scores.return_value = [
+            (Document(page_content="B"), 0.2), (Document(page_content="D"), 0.9),
+        ]
+        mock_chroma.side_effect = shards
+        
+        # Create retriever
+        retriever = ShardedVectorStoreRetriever(num_shards=2, search_kwargs={"k": 3})
+        
+        # Test retrieve
+        docs = retriever.retrieve("test query")
+        
+        # Assertions
+        self.assertEqual([doc.page_content for doc in docs], ["A", "B", "C"])
+        mock_embeddings.return_value.embed_query.assert_called_once_with("test query")
+    
+    @patch('src.components.retrievers.Chroma')
+    @patch('src.components.retrievers.OpenAIEmbeddings')
+    def test_close(self, mock_embeddings, mock_chroma):
+        """Test closing the retriever stops its shard search threads."""
+        retriever = ShardedVectorStoreRetriever(num_shards=2)
+        retriever.close()
+        
+        with self.assertRaises(RuntimeError):
+            retriever._executor.submit(print)
 
 class TestHybridRetriever(unittest.TestCase):
     """Test the HybridRetriever component."""
@@ -75,5 +75,60 @@ class TestQueryRouter(unittest.TestCase):
         # Check that a new prompt was created with the updated topics
         mock_prompt.from_messages.call_count >= 2
 
+    @patch('src.components.routers.ChatOpenAI')
+    @patch('src.components.routers.ChatPromptTemplate')
+    def test_centroid_route(self, mock_prompt, mock_llm):
+        """Test centroid routing decides locally and falls back when unsure."""
+        # Set up mocks
+        mock_chain = MagicMock()
+        mock_chain.invoke.return_value = RouteQuery(datasource="web_search")
+        mock_prompt.from_messages.return_value.__or__.return_value = mock_chain
+        
+        embeddings = MagicMock()
+        embeddings.embed_documents.return_value = [[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]]
+        
+        # Create router and fit centroids
+        router = QueryRouter(embeddings=embeddings, mode="centroid", margin=0.1)
+        router.fit_centroids({
+            "vectorstore": ["What is agent memory?", "How do agents plan?"],
+            "web_search": ["What is the news today?"],
+        })
+        
+        # Clearly closer to the vectorstore examples
+        embeddings.embed_query.return_value = [1.0, 0.05]
+        self.assertEqual(router.route("What is agent memory?"), "vectorstore")
+        mock_chain.invoke.assert_not_called()
+        
+        # Equally close to both sources falls back to the LLM
+        embeddings.embed_query.return_value = [1.0, 1.05]
+        self.assertEqual(router.route("Something ambiguous"), "web_search")
+        mock_chain.invoke.assert_called_once()
+        
+        # Assertions
+        self.assertEqual(router.route_stats, {"centroid": 1, "llm": 1})
+
+    @patch('src.components.routers.ChatOpenAI')
+    @patch('src.components.routers.ChatPromptTemplate')
+    def test_centroid_route_symmetric(self, mock_prompt, mock_llm):
+        """Test mirrored questions are routed to mirrored sources with the same margin."""
+        # Set up mocks
+        mock_prompt.from_messages.return_value.__or__.return_value = MagicMock()
+        embeddings = MagicMock()
+        embeddings.embed_documents.return_value = [[1.0, 0.0], [0.0, 1.0]]
+        
+        # Create router and fit centroids
+        router = QueryRouter(embeddings=embeddings, mode="centroid", margin=0.1)
+        router.fit_centroids({"vectorstore": ["Indexed topic?"], "web_search": ["Today's news?"]})
+        
+        # Each datasource wins by the same margin on its mirrored question
+        for query, datasource in (([1.0, 0.5], "vectorstore"), ([0.5, 1.0], "web_search")):
+            embeddings.embed_query.return_value = query
+            self.assertEqual(router._route_by_centroid("question"), datasource)
+        
+        # Mirrored questions just inside the margin both go to the LLM
+        for query in ([1.0, 0.9], [0.9, 1.0]):
+            embeddings.embed_query.return_value = query
+            self.assertIsNone(router._route_by_centroid("question"))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
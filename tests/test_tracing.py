@@ -0,0 +1,94 @@
+"""Tests for the built-in tracer."""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from langchain_core.language_models import FakeListChatModel
+
+from src.utils.tracing import (
+    RotatingJSONLWriter,
+    Trace,
+    Tracer,
+    read_traces,
+    span,
+    summarize_traces,
+)
+
+class TestTracing(unittest.TestCase):
+    """Test span trees, export and summaries."""
+
+    def test_span_tree(self):
+        """Test component spans and LLM calls nest under the open span."""
+        tracer = Tracer(output_dir="unused")
+        trace = Trace("query", question="What is an agent?")
+        llm = FakeListChatModel(responses=["answer"])
+
+        with trace.span("generate", "node"):
+            with span("retrieve", "retriever") as current:
+                current.set(documents=3)
+            llm.invoke("prompt", config={"callbacks": [tracer.callback_handler()]})
+        with span("outside", "retriever") as current:
+            current.set(documents=1)
+
+        spans = [record.to_dict() for record in trace.spans]
+        node, retrieve, llm_span = spans[1:]
+        self.assertEqual(len(spans), 4)
+        self.assertEqual(node["parent_id"], spans[0]["span_id"])
+        self.assertEqual(retrieve["parent_id"], node["span_id"])
+        self.assertEqual(retrieve["attributes"], {"documents": 3})
+        self.assertEqual(llm_span["kind"], "llm")
+        self.assertEqual(llm_span["parent_id"], node["span_id"])
+
+    def test_error_outcome(self):
+        """Test an exception marks its span as failed."""
+        trace = Trace("query")
+        with self.assertRaises(ValueError):
+            with trace.span("retrieve", "node"):
+                raise ValueError("index missing")
+
+        record = trace.spans[1].to_dict()
+        self.assertEqual(record["status"], "error")
+        self.assertEqual(record["error"], "ValueError: index missing")
+
+    def test_rotation(self):
+        """Test files rotate at the size limit and only max_files are kept."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            writer = RotatingJSONLWriter(output_dir, max_bytes=100, max_files=3)
+            for i in range(10):
+                writer.write(json.dumps({"i": i, "padding": "x" * 40}))
+            writer.close()
+
+            files = sorted(path.name for path in Path(output_dir).iterdir())
+            self.assertEqual(files, ["traces.1.jsonl", "traces.2.jsonl", "traces.jsonl"])
+            newest = [json.loads(line)["i"] for line in open(Path(output_dir) / "traces.jsonl")]
+            self.assertEqual(newest, [9])
+
+    def test_export_and_summary(self):
+        """Test finished traces are written and summarized by span."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            tracer = Tracer(output_dir=output_dir)
+            for question in ("first", "second"):
+                trace = tracer.start_trace("query", question=question)
+                with trace.span("retrieve", "node"):
+                    pass
+                tracer.finish(trace)
+            tracer.close()
+
+            summary = summarize_traces(read_traces(output_dir), top=1)
+
+        self.assertEqual(summary["traces"], 2)
+        by_name = {item["name"]: item for item in summary["spans"]}
+        self.assertEqual(by_name["retrieve"]["count"], 2)
+        self.assertEqual(summary["slowest"][0]["name"], "query")
+
+    def test_bounded_queue_drops(self):
+        """Test traces beyond the buffer are dropped instead of blocking."""
+        tracer = Tracer(output_dir="unused", queue_size=1)
+        tracer._ensure_writer = lambda: None  # Keep the writer from draining the queue
+        for _ in range(3):
+            tracer.finish(tracer.start_trace("query"))
+        self.assertEqual(tracer.dropped, 2)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,346 @@
+"""Tests for the workflow graph."""
+
+import asyncio
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+from langchain.schema import Document
+
+from src.app import AdaptiveRAG
+from src.components.generators import RAGGenerator
+from src.workflow.nodes import WorkflowNodes
+from src.workflow.edges import WorkflowEdges
+from src.workflow.graph import AdaptiveRAGWorkflow
+from src.workflow.budget import QueryBudget
+from src.utils.resilience import ResilienceRegistry
+from src.utils.tracing import Tracer, read_traces
+from langchain_core.language_models import FakeListChatModel
+
+def build_workflow(hallucination_grades, **workflow_kwargs):
+    """Build a workflow around mocked components."""
+    retriever = MagicMock()
+    retriever.retrieve.return_value = [Document(page_content="Context")]
+
+    document_grader = MagicMock()
+    document_grader.filter_documents.side_effect = lambda documents, question: documents
+
+    generator = MagicMock()
+    generator.generate.side_effect = ["First answer", "Second answer", "Third answer"]
+
+    hallucination_grader = MagicMock()
+    hallucination_grader.grade_generation.side_effect = hallucination_grades
+    hallucination_grader.cached_unsupported.return_value = None
+
+    answer_grader = MagicMock()
+    answer_grader.grade_answer.return_value = True
+
+    query_router = MagicMock()
+    query_router.route.return_value = "vectorstore"
+
+    nodes = WorkflowNodes(
+        retriever=retriever,
+        web_searcher=MagicMock(),
+        generator=generator,
+        query_transformer=MagicMock(),
+        document_grader=document_grader,
+        hallucination_grader=hallucination_grader,
+        answer_grader=answer_grader,
+    )
+    edges = WorkflowEdges(
+        query_router=query_router,
+        hallucination_grader=hallucination_grader,
+        answer_grader=answer_grader,
+    )
+    return AdaptiveRAGWorkflow(nodes=nodes, edges=edges, **workflow_kwargs)
+
+class TestAdaptiveRAGWorkflow(unittest.TestCase):
+    """Test the AdaptiveRAGWorkflow graph."""
+
+    def test_run(self):
+        """Test a generation that fails grading is regenerated."""
+        workflow = build_workflow([False, True])
+
+        final_state = workflow.run("What is an agent?")
+
+        self.assertEqual(final_state["generation"], "Second answer")
+
+    def test_optimistic_stream_events(self):
+        """Test optimistic mode publishes answers before grading and retracts failures."""
+        workflow = build_workflow([False, True], optimistic=True)
+
+        events = [
+            event for event in workflow.stream_events("What is an agent?")
+            if event["type"] in ("answer", "answer_confirmed", "retraction", "end")
+        ]
+
+        self.assertEqual(
+            [event["type"] for event in events],
+            ["answer", "retraction", "answer", "answer_confirmed", "end"],
+        )
+        self.assertEqual(events[0]["content"], "First answer")
+        self.assertEqual(events[1]["reason"], "not_supported")
+        self.assertEqual(events[-1]["state"]["generation"], "Second answer")
+
+    def test_async_run_and_events(self):
+        """Test the async path regenerates like run and emits the events of stream_events."""
+        async def collect():
+            final_state = await build_workflow([False, True]).arun("What is an agent?")
+            events = [event async for event in build_workflow([False, True]).astream_events("What is an agent?")]
+            return final_state, events
+
+        final_state, events = asyncio.run(collect())
+        expected = list(build_workflow([False, True]).stream_events("What is an agent?"))
+
+        self.assertEqual(final_state["generation"], "Second answer")
+        self.assertEqual([event["type"] for event in events], [event["type"] for event in expected])
+        self.assertEqual(events[-1]["state"]["generation"], "Second answer")
+
+    def test_dual_path(self):
+        """Test an unsure route searches both sources in parallel and grades the merged documents."""
+        workflow = build_workflow([True], dual_path=True)
+        workflow.edges.dual_path_threshold = 0.6
+        workflow.edges.query_router.route_with_confidence.return_value = ("web_search", 0.4)
+        workflow.nodes.web_searcher.search_to_documents.return_value = [Document(page_content="Web result")]
+
+        final_state = workflow.run("What is an agent?")
+
+        nodes = [stage["name"] for stage in final_state["metrics"].summary()["stages"] if stage["kind"] == "node"]
+        self.assertEqual(set(nodes[:2]), {"dual_retrieve", "dual_web_search"})
+        self.assertEqual(nodes[2:], ["merge_documents", "grade_documents", "generate"])
+        self.assertEqual(
+            [doc.page_content for doc in final_state["documents"]],
+            ["Context", "Web result"],
+        )
+        workflow.edges.query_router.route.assert_not_called()
+
+    def test_budget_stops_regeneration(self):
+        """Test the workflow returns the latest answer once the loop budget runs out."""
+        workflow = build_workflow([False, False, False], budget_settings={"max_loops": 1})
+
+        final_state = workflow.run("What is an agent?")
+
+        self.assertEqual(final_state["generation"], "Second answer")
+        self.assertEqual(final_state["budget"].exhausted(), "loops")
+        self.assertEqual(workflow.edges.hallucination_grader.grade_generation.call_count, 1)
+        self.assertFalse(final_state["generation_graded"])
+
+        rag = AdaptiveRAG.__new__(AdaptiveRAG)
+        self.assertFalse(rag._build_result("What is an agent?", final_state).metadata["graded"])
+
+    def test_budget_returns_best_generation(self):
+        """Test a grounded answer is returned over generating from no documents when the budget runs out."""
+        workflow = build_workflow([True], budget_settings={"max_loops": 1})
+        workflow.nodes.answer_grader.grade_answer.return_value = False
+        workflow.nodes.query_transformer.transform_query.return_value = "Rewritten question"
+        workflow.nodes.document_grader.filter_documents.side_effect = [
+            [Document(page_content="Context")],
+            [],
+        ]
+
+        final_state = workflow.run("What is an agent?")
+
+        self.assertEqual(final_state["generation"], "First answer")
+        self.assertEqual([doc.page_content for doc in final_state["documents"]], ["Context"])
+        self.assertTrue(final_state["generation_graded"])
+        workflow.nodes.generator.generate.assert_called_once()
+
+    def test_metrics(self):
+        """Test every node and edge decision is recorded per query and in aggregate."""
+        workflow = build_workflow([False, True])
+
+        final_state = workflow.run("What is an agent?")
+
+        stages = final_state["metrics"].summary()["stages"]
+        self.assertEqual(
+            [(stage["name"], stage["iteration"]) for stage in stages if stage["kind"] == "node"],
+            [("retrieve", 1), ("grade_documents", 1), ("generate", 1), ("generate", 2)],
+        )
+        decisions = [stage.get("decision") for stage in stages if stage["name"] == "grade_generation"]
+        self.assertEqual(decisions, ["not_supported", "useful"])
+
+        text = workflow.metrics.to_prometheus()
+        self.assertIn('rag_stage_seconds_count{kind="node",stage="generate"} 2', text)
+        self.assertIn('rag_edge_decisions_total{decision="useful",edge="grade_generation"} 1', text)
+        self.assertIn("rag_queries_total 1", text)
+
+    def test_trace(self):
+        """Test each query is exported as a span tree under one root."""
+        with tempfile.TemporaryDirectory() as output_dir:
+            tracer = Tracer(output_dir=output_dir)
+            workflow = build_workflow([False, True], tracer=tracer)
+
+            workflow.run("What is an agent?")
+            tracer.flush()
+            traces = list(read_traces(output_dir))
+
+        self.assertEqual(len(traces), 1)
+        spans = traces[0]["spans"]
+        root = spans[0]
+        self.assertEqual(root["attributes"]["question"], "What is an agent?")
+        self.assertTrue(all(span["parent_id"] == root["span_id"] for span in spans[1:]))
+        generations = [span for span in spans if span["name"] == "generate"]
+        self.assertEqual(len(generations), 2)
+        self.assertEqual(generations[0]["attributes"]["generation_chars"], len("First answer"))
+        decisions = [span["attributes"]["decision"] for span in spans if span["name"] == "grade_generation"]
+        self.assertEqual(decisions, ["not_supported", "useful"])
+
+def build_streaming_workflow():
+    """Build a workflow whose generator and graders stream from fake chat models."""
+    answers = ["First answer.", "Second answer."]
+    with patch("src.components.generators.ChatOpenAI", side_effect=lambda **_: FakeListChatModel(responses=answers)):
+        generator = RAGGenerator(prompt_template="{context}\n{question}")
+    workflow = build_workflow([False, True])
+    workflow.nodes.generator = generator
+
+    # Router and grader models run inside the graph too, but are not part of the answer
+    router_llm = FakeListChatModel(responses=["vectorstore"])
+    grader_llm = FakeListChatModel(responses=["no", "yes"])
+    grades = iter([False, True])
+
+    def route(question):
+        router_llm.invoke(question)
+        return "vectorstore"
+
+    def grade_generation(*args, **kwargs):
+        grader_llm.invoke("grade")
+        return next(grades)
+
+    workflow.edges.query_router.route.side_effect = route
+    workflow.edges.hallucination_grader.grade_generation.side_effect = grade_generation
+    return workflow
+
+class TestTokenStreaming(unittest.TestCase):
+    """Test generated answer tokens are streamed and other model output is not."""
+
+    def assert_answer_tokens(self, events):
+        """Check each generation streams its own tokens in order after a generation_start."""
+        generations = []
+        for event in events:
+            if event["type"] == "generation_start":
+                generations.append("")
+            elif event["type"] == "token":
+                generations[-1] += event["content"]
+        self.assertEqual(generations, ["First answer.", "Second answer."])
+
+    def test_stream_events(self):
+        """Test tagged generator tokens become token events and grader and router tokens are dropped."""
+        events = list(build_streaming_workflow().stream_events("What is an agent?"))
+
+        self.assert_answer_tokens(events)
+        self.assertGreater(sum(event["type"] == "token" for event in events), 2)
+        self.assertEqual(events[-1]["state"]["generation"], "Second answer.")
+
+    def test_stream_answer(self):
+        """Test the sync and async answer streams of AdaptiveRAG end with the final result."""
+        async def collect(rag):
+            return [event async for event in rag.astream_answer("What is an agent?")]
+
+        rag = AdaptiveRAG.__new__(AdaptiveRAG)
+        rag.workflow = build_streaming_workflow()
+        sync_events = list(rag.stream_answer("What is an agent?"))
+        rag.workflow = build_streaming_workflow()
+        async_events = asyncio.run(collect(rag))
+
+        for events in (sync_events, async_events):
+            self.assert_answer_tokens(events)
+            self.assertEqual(events[-1]["type"], "result")
+            self.assertEqual(events[-1]["result"].answer, "Second answer.")
+
+    def test_deadline_mid_stream(self):
+        """Test tokens of a generation abandoned at its deadline stop once the next tier takes over."""
+        slow_answer = "A slow answer that is still streaming after its deadline."
+        models = {
+            "slow": FakeListChatModel(responses=[slow_answer], sleep=0.05),
+            "fast": FakeListChatModel(responses=["Fast answer."], sleep=0.02),
+        }
+        registry = ResilienceRegistry(services={"llm": {"timeout": 0.5}})
+        with patch("src.components.generators.ChatOpenAI", side_effect=lambda **kwargs: models[kwargs["model_name"]]):
+            generator = RAGGenerator(
+                model_name=["slow", "fast"], prompt_template="{context}\n{question}", resilience=registry,
+            )
+        workflow = build_workflow([True])
+        workflow.nodes.generator = generator
+
+        try:
+            events = list(workflow.stream_events("What is an agent?"))
+        finally:
+            registry.close()
+
+        generations = []
+        for event in events:
+            if event["type"] == "generation_start":
+                generations.append("")
+            elif event["type"] == "token":
+                generations[-1] += event["content"]
+        self.assertEqual(len(generations), 2)
+        self.assertTrue(slow_answer.startswith(generations[0]))
+        self.assertLess(len(generations[0]), len(slow_answer))
+        self.assertEqual(generations[1], "Fast answer.")
+        self.assertEqual(events[-1]["state"]["generation"], "Fast answer.")
+
+def build_nodes(**kwargs):
+    """Build workflow nodes around mocked components."""
+    components = {
+        name: MagicMock()
+        for name in (
+            "retriever", "web_searcher", "generator", "query_transformer",
+            "document_grader", "hallucination_grader", "answer_grader",
+        )
+    }
+    components.update(kwargs)
+    return WorkflowNodes(**components)
+
+class TestHyDERetrieval(unittest.TestCase):
+    """Test the HyDE retrieval mode of the retrieve node."""
+
+    def test_fuses_plain_and_hypothetical_results(self):
+        """Test the question and the hypothetical passage are both searched and fused with RRF."""
+        generator = MagicMock()
+        generator.generate_document.return_value = "Agents are systems that plan."
+        nodes = build_nodes(hypothetical_document_generator=generator, retrieval_mode="hyde", max_documents=3)
+        nodes.retriever.retrieve.return_value = [Document(page_content="A"), Document(page_content="B")]
+        nodes.retriever.retrieve_many.return_value = [Document(page_content="B"), Document(page_content="C")]
+
+        result = nodes.retrieve({"question": "What is an agent?"})
+
+        nodes.retriever.retrieve.assert_called_once_with("What is an agent?")
+        nodes.retriever.retrieve_many.assert_called_once_with(["Agents are systems that plan."])
+        # B is found by both searches, so it is ranked first
+        self.assertEqual([doc.page_content for doc in result["documents"]], ["B", "A", "C"])
+
+    def test_failed_generation_falls_back(self):
+        """Test a failed hypothetical passage leaves the plain retrieval results."""
+        generator = MagicMock()
+        generator.generate_document.side_effect = RuntimeError("model unavailable")
+        nodes = build_nodes(hypothetical_document_generator=generator, retrieval_mode="hyde")
+        nodes.retriever.retrieve.return_value = [Document(page_content="A")]
+
+        result = nodes.retrieve({"question": "What is an agent?"})
+
+        self.assertEqual([doc.page_content for doc in result["documents"]], ["A"])
+        nodes.retriever.retrieve_many.assert_not_called()
+
+    def test_invalid_modes(self):
+        """Test an unknown mode, or HyDE without a generator, is rejected."""
+        with self.assertRaises(ValueError):
+            build_nodes(retrieval_mode="keyword")
+        with self.assertRaises(ValueError):
+            build_nodes(retrieval_mode="hyde")
+
+class TestQueryBudget(unittest.TestCase):
+    """Test the QueryBudget controller."""
+
+    def test_callback_counts_llm_calls(self):
+        """Test LLM calls made with the budget callback are charged to it."""
+        budget = QueryBudget(max_llm_calls=2)
+        llm = FakeListChatModel(responses=["one", "two"])
+
+        llm.invoke("first", config={"callbacks": [budget.callback_handler()]})
+        self.assertIsNone(budget.exhausted())
+        llm.invoke("second", config={"callbacks": [budget.callback_handler()]})
+
+        self.assertEqual(budget.llm_calls, 2)
+        self.assertEqual(budget.exhausted(), "llm_calls")
+
+if __name__ == '__main__':
+    unittest.main()
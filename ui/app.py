@@ -4,7 +4,6 @@ import os
 import sys
 import streamlit as st
 from pathlib import Path
-import time
 
 # Add the parent directory to the path to import the package
 sys.path.append(str(Path(__file__).parent.parent))
@@ -12,6 +11,9 @@ sys.path.append(str(Path(__file__).parent.parent))
 from src.app import AdaptiveRAG
 from src.config import Config
 
+# Index published by a builder process; sessions map it read-only instead of each indexing the documents
+SHARED_INDEX_DIR = os.environ.get("RAG_SHARED_INDEX_DIR")
+
 # Page config
 st.set_page_config(
     page_title="Adaptive RAG System",
@@ -23,7 +25,7 @@ st.set_page_config(
 if "rag" not in st.session_state:
     with st.spinner("Initializing Adaptive RAG system..."):
         # Create configuration
-        config = Config(enable_tracing=False)
+        config = Config(vectorstore_settings={"shared_index_dir": SHARED_INDEX_DIR}, enable_tracing=False)
         
         # Initialize the RAG system
         st.session_state.rag = AdaptiveRAG(config=config, debug=False)
@@ -124,27 +126,34 @@ if user_input:
         workflow_steps = []
         
         try:
-            # Process the query and capture workflow steps if enabled
+            # Stream workflow steps and answer tokens as they arrive
             if show_workflow:
                 workflow_container = st.empty()
                 workflow_container.markdown("Processing query through workflow...")
-                
-                # Stream workflow
-                for output in st.session_state.rag.stream_query(user_input):
-                    for key, value in output.items():
-                        workflow_steps.append({
-                            "node": key,
-                            "details": f"Processing step: {key}"
-                        })
+            
+            answer = ""
+            result = None
+            for event in st.session_state.rag.stream_answer(user_input):
+                if event["type"] == "node":
+                    workflow_steps.append({
+                        "node": event["node"],
+                        "details": f"Processing step: {event['node']}"
+                    })
+                    if show_workflow:
                         workflow_text = "\n\n".join([f"**{step['node']}**" for step in workflow_steps])
                         workflow_container.markdown(f"**Workflow Steps:**\n{workflow_text}")
-                        time.sleep(0.5)  # Slow down a bit for UI effect
-                
-                # Clear workflow container
-                workflow_container.empty()
+                elif event["type"] == "generation_start":
+                    # A retried generation replaces the previous answer
+                    answer = ""
+                elif event["type"] == "token":
+                    answer += event["content"]
+                    response_placeholder.markdown(answer + "▌")
+                elif event["type"] == "result":
+                    result = event["result"]
             
-            # Get final result
-            result = st.session_state.rag.query(user_input)
+            # Clear workflow container
+            if show_workflow:
+                workflow_container.empty()
             
             # Update response
             response_placeholder.markdown(result.answer)
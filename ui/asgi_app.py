@@ -0,0 +1,231 @@
+"""ASGI web application for Adaptive RAG system.
+
+Serves the routes of the Flask app on an event loop, plus a Server-Sent Events
+endpoint. Queries run on the async AdaptiveRAG path, so a worker keeps many of
+them in flight at once; the workflow's synchronous steps run in a thread pool
+of RAG_EXECUTOR_THREADS threads.
+
+Run it with ui/serve.py, or with any ASGI server: uvicorn asgi_app:app
+"""
+
+import asyncio
+import contextlib
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+# Add the parent directory to the path to import the package
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.app import AdaptiveRAG
+from src.config import Config
+
+TEMPLATES_DIR = Path(__file__).parent / 'templates'
+
+# Threads running workflow steps; each in-flight query occupies one while a step runs
+EXECUTOR_THREADS = int(os.environ.get('RAG_EXECUTOR_THREADS', '64'))
+
+# Index published by a builder process; workers map it read-only instead of each indexing the documents
+SHARED_INDEX_DIR = os.environ.get('RAG_SHARED_INDEX_DIR')
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    """Create the RAG system when a worker starts and close it when it stops."""
+    executor = ThreadPoolExecutor(max_workers=EXECUTOR_THREADS, thread_name_prefix='rag-worker')
+    asyncio.get_running_loop().set_default_executor(executor)
+
+    config = Config(vectorstore_settings={'shared_index_dir': SHARED_INDEX_DIR}, enable_tracing=False)
+    app.state.rag = await asyncio.to_thread(AdaptiveRAG, config=config, debug=False)
+    try:
+        yield
+    finally:
+        app.state.rag.close()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def format_sources(result):
+    """Format the documents of a result for JSON output."""
+    sources = []
+    for doc in result.documents or []:
+        sources.append({
+            'content': doc.page_content,
+            'metadata': getattr(doc, 'metadata', {}) or {},
+        })
+    return sources
+
+def format_event(event, show_sources=True):
+    """Convert a stream_answer event into a JSON-serializable payload."""
+    if event['type'] == 'node':
+        return {'type': 'node', 'node': event['node']}
+    if event['type'] == 'result':
+        result = event['result']
+        return {
+            'type': 'result',
+            'answer': result.answer,
+            'sources': format_sources(result) if show_sources else [],
+            'routing': result.routing_decision,
+        }
+    return event
+
+async def read_json(request):
+    """Read a JSON request body, treating an empty or invalid body as empty."""
+    try:
+        data = await request.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+async def index(request):
+    """Render the main page."""
+    request.session.setdefault('chat_history', [])
+    return FileResponse(TEMPLATES_DIR / 'index.html')
+
+async def process_query(request):
+    """Process a query and return the response."""
+    data = await read_json(request)
+    query = data.get('query', '')
+    show_sources = data.get('show_sources', True)
+    show_workflow = data.get('show_workflow', False)
+    # Profile on request; otherwise the configured sample rate applies
+    profile = True if data.get('profile') else None
+
+    if not query:
+        return JSONResponse({'error': 'No query provided'}, status_code=400)
+
+    rag = request.app.state.rag
+    try:
+        result = await rag.aquery(query, profile=profile)
+
+        # Workflow steps come from the run's metrics rather than a second run
+        workflow_steps = []
+        if show_workflow:
+            stages = (result.metadata.get('metrics') or {}).get('stages', [])
+            workflow_steps = [stage['name'] for stage in stages if stage['kind'] == 'node']
+
+        response = {
+            'answer': result.answer,
+            'sources': format_sources(result) if show_sources else [],
+            'workflow': workflow_steps,
+            'routing': result.routing_decision,
+        }
+        if 'profile' in result.metadata:
+            response['profile'] = result.metadata['profile']
+
+        chat_history = request.session.get('chat_history', [])
+        chat_history.append({'user': query, 'assistant': result.answer})
+        request.session['chat_history'] = chat_history
+
+        return JSONResponse(response)
+
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+async def stream_query(request):
+    """Stream workflow steps and answer tokens as newline-delimited JSON."""
+    data = await read_json(request)
+    query = data.get('query', '')
+    show_sources = data.get('show_sources', True)
+
+    if not query:
+        return JSONResponse({'error': 'No query provided'}, status_code=400)
+
+    async def generate():
+        try:
+            async for event in request.app.state.rag.astream_answer(query):
+                yield json.dumps(format_event(event, show_sources)) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson')
+
+async def query_events(request):
+    """
+    Stream workflow steps and answer tokens as Server-Sent Events.
+
+    Accepts GET with ?query=... (for EventSource) or POST with a JSON body.
+    Each event is named after its type ("node", "generation_start", "token",
+    "result" or "error") and carries the payload as JSON data.
+    """
+    if request.method == 'GET':
+        data = dict(request.query_params)
+        data['show_sources'] = data.get('show_sources', 'true').lower() != 'false'
+    else:
+        data = await read_json(request)
+    query = data.get('query', '')
+    show_sources = data.get('show_sources', True)
+
+    if not query:
+        return JSONResponse({'error': 'No query provided'}, status_code=400)
+
+    async def generate():
+        try:
+            async for event in request.app.state.rag.astream_answer(query):
+                payload = format_event(event, show_sources)
+                yield f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
+
+    headers = {
+        'Cache-Control': 'no-cache',
+        # Keep reverse proxies from buffering the stream
+        'X-Accel-Buffering': 'no',
+    }
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=headers)
+
+async def metrics(request):
+    """Expose aggregated workflow metrics as Prometheus text or JSON."""
+    registry = request.app.state.rag.workflow.metrics
+    wants_json = request.query_params.get('format') == 'json' or (
+        'application/json' in request.headers.get('accept', '')
+    )
+    if wants_json:
+        return JSONResponse(registry.to_dict())
+    return PlainTextResponse(registry.to_prometheus(), media_type='text/plain; version=0.0.4')
+
+async def add_document(request):
+    """Add a document URL to the RAG system."""
+    data = await read_json(request)
+    url = data.get('url', '')
+
+    if not url:
+        return JSONResponse({'error': 'No URL provided'}, status_code=400)
+
+    try:
+        await asyncio.to_thread(request.app.state.rag.add_documents, urls=[url])
+        return JSONResponse({'success': f'Added document: {url}'})
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+async def clear_history(request):
+    """Clear the chat history."""
+    request.session['chat_history'] = []
+    return JSONResponse({'success': 'Chat history cleared'})
+
+async def health(request):
+    """Report that the worker is up, for load balancer health checks."""
+    return JSONResponse({'status': 'ok'})
+
+routes = [
+    Route('/', index),
+    Route('/query', process_query, methods=['POST']),
+    Route('/query_stream', stream_query, methods=['POST']),
+    Route('/query_events', query_events, methods=['GET', 'POST']),
+    Route('/metrics', metrics, methods=['GET']),
+    Route('/add_document', add_document, methods=['POST']),
+    Route('/clear_history', clear_history, methods=['POST']),
+    Route('/health', health, methods=['GET']),
+]
+
+# Sessions are signed cookies; set RAG_SESSION_SECRET so that every worker accepts them
+middleware = [
+    Middleware(SessionMiddleware, secret_key=os.environ.get('RAG_SESSION_SECRET') or os.urandom(24).hex()),
+]
+
+app = Starlette(routes=routes, middleware=middleware, lifespan=lifespan)
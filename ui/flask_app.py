@@ -4,7 +4,7 @@ import os
 import sys
 import json
 from pathlib import Path
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
 
 # Add the parent directory to the path to import the package
 sys.path.append(str(Path(__file__).parent.parent))
@@ -15,8 +15,11 @@ from src.config import Config
 app = Flask(__name__)
 app.secret_key = os.urandom(24)  # For session management
 
+# Index published by a builder process; workers map it read-only instead of each indexing the documents
+SHARED_INDEX_DIR = os.environ.get('RAG_SHARED_INDEX_DIR')
+
 # Initialize RAG system
-config = Config(enable_tracing=False)
+config = Config(vectorstore_settings={'shared_index_dir': SHARED_INDEX_DIR}, enable_tracing=False)
 rag = AdaptiveRAG(config=config, debug=False)
 
 @app.route('/')
@@ -28,6 +31,19 @@ def index():
     
     return render_template('index.html')
 
+def format_sources(result):
+    """Format the documents of a result for JSON output."""
+    sources = []
+    for doc in result.documents or []:
+        source = {
+            'content': doc.page_content,
+            'metadata': {}
+        }
+        if hasattr(doc, 'metadata'):
+            source['metadata'] = doc.metadata
+        sources.append(source)
+    return sources
+
 @app.route('/query', methods=['POST'])
 def process_query():
     """Process a query and return the response."""
@@ -36,6 +52,8 @@ def process_query():
     show_sources = data.get('show_sources', True)
     show_workflow = data.get('show_workflow', False)
     temperature = float(data.get('temperature', 0.0))
+    # Profile on request; otherwise the configured sample rate applies
+    profile = True if data.get('profile') else None
     
     if not query:
         return jsonify({'error': 'No query provided'}), 400
@@ -49,19 +67,10 @@ def process_query():
                     workflow_steps.append(key)
         
         # Get the final result
-        result = rag.query(query)
+        result = rag.query(query, profile=profile)
         
         # Format sources if requested
-        sources = []
-        if show_sources and result.documents:
-            for i, doc in enumerate(result.documents):
-                source = {
-                    'content': doc.page_content,
-                    'metadata': {}
-                }
-                if hasattr(doc, 'metadata'):
-                    source['metadata'] = doc.metadata
-                sources.append(source)
+        sources = format_sources(result) if show_sources else []
         
         # Prepare response
         response = {
@@ -70,6 +79,8 @@ def process_query():
             'workflow': workflow_steps,
             'routing': result.routing_decision
         }
+        if 'profile' in result.metadata:
+            response['profile'] = result.metadata['profile']
         
         # Update chat history in session
         chat_history = session.get('chat_history', [])
@@ -84,6 +95,50 @@ def process_query():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/query_stream', methods=['POST'])
+def stream_query():
+    """Stream workflow steps and answer tokens as newline-delimited JSON."""
+    data = request.json
+    query = data.get('query', '')
+    show_sources = data.get('show_sources', True)
+    
+    if not query:
+        return jsonify({'error': 'No query provided'}), 400
+    
+    def generate():
+        try:
+            for event in rag.stream_answer(query):
+                if event['type'] == 'node':
+                    payload = {'type': 'node', 'node': event['node']}
+                elif event['type'] == 'result':
+                    result = event['result']
+                    payload = {
+                        'type': 'result',
+                        'answer': result.answer,
+                        'sources': format_sources(result) if show_sources else [],
+                        'routing': result.routing_decision,
+                    }
+                else:
+                    payload = event
+                yield json.dumps(payload) + '\n'
+        except Exception as e:
+            yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+    
+    # The session cookie is sent before the answer exists, so streamed
+    # answers are not added to the server-side chat history.
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose aggregated workflow metrics as Prometheus text or JSON."""
+    registry = rag.workflow.metrics
+    wants_json = request.args.get('format') == 'json' or (
+        request.accept_mimetypes.best_match(['text/plain', 'application/json']) == 'application/json'
+    )
+    if wants_json:
+        return jsonify(registry.to_dict())
+    return Response(registry.to_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/add_document', methods=['POST'])
 def add_document():
     """Add a document URL to the RAG system."""
@@ -5,7 +5,6 @@ import sys
 import json
 from pathlib import Path
 import gradio as gr
-import time
 
 # Add the parent directory to the path to import the package
 sys.path.append(str(Path(__file__).parent.parent))
@@ -14,8 +13,11 @@ from src.app import AdaptiveRAG
 from src.config import Config
 from src.models.data_models import RAGResult
 
+# Index published by a builder process; workers map it read-only instead of each indexing the documents
+SHARED_INDEX_DIR = os.environ.get('RAG_SHARED_INDEX_DIR')
+
 # Initialize RAG system
-config = Config(enable_tracing=False)
+config = Config(vectorstore_settings={'shared_index_dir': SHARED_INDEX_DIR}, enable_tracing=False)
 rag = AdaptiveRAG(config=config, debug=False)
 
 # Theme and styling
@@ -81,25 +83,27 @@ def process_query(message, history, show_sources, show_workflow, temperature):
     
     # Initialize response
     response = ""
+    result = None
     
-    # Stream workflow steps if requested
     if show_workflow:
-        response = "Processing your query...\n\n"
-        yield response
-        
-        for output in rag.stream_query(message):
-            for key, value in output.items():
-                step = f"Step: {key}"
-                workflow_steps.append(step)
-                
-                # Update response with workflow steps
-                response = "Processing your query...\n\n"
-                response += "\n".join(f"- {s}" for s in workflow_steps)
-                yield response
-                time.sleep(0.3)  # Slight delay for better UX
+        yield "Processing your query...\n\n"
     
-    # Get final result
-    result = rag.query(message)
+    # Stream workflow steps and answer tokens as they arrive
+    for event in rag.stream_answer(message):
+        if event["type"] == "node":
+            workflow_steps.append(f"Step: {event['node']}")
+            
+            # Show workflow steps until the answer starts streaming
+            if show_workflow and not response:
+                yield "Processing your query...\n\n" + "\n".join(f"- {s}" for s in workflow_steps)
+        elif event["type"] == "generation_start":
+            # A retried generation replaces the previous answer
+            response = ""
+        elif event["type"] == "token":
+            response += event["content"]
+            yield response
+        elif event["type"] == "result":
+            result = event["result"]
     
     # Format final response
     response = result.answer
@@ -22,6 +22,8 @@ def install_requirements(ui_type):
         req_file = 'gradio_requirements.txt'
     elif ui_type == 'flask':
         req_file = 'flask_requirements.txt'
+    elif ui_type == 'asgi':
+        req_file = 'asgi_requirements.txt'
     
     if req_file:
         print(f"Installing requirements for {ui_type} UI...")
@@ -44,6 +46,11 @@ def launch_ui(ui_type):
             install_requirements('flask')
         print("Launching Flask UI...")
         subprocess.run([sys.executable, 'flask_app.py'])
+    elif ui_type == 'asgi':
+        if not check_module_installed('starlette') or not check_module_installed('uvicorn'):
+            install_requirements('asgi')
+        print("Launching ASGI server...")
+        subprocess.run([sys.executable, 'serve.py'])
     else:
         print(f"Unknown UI type: {ui_type}")
         sys.exit(1)
@@ -51,7 +58,7 @@ def launch_ui(ui_type):
 def main():
     """Parse command line arguments and launch the UI."""
     parser = argparse.ArgumentParser(description='Launch Adaptive RAG UI')
-    parser.add_argument('--ui', '-u', type=str, choices=['streamlit', 'gradio', 'flask'], 
+    parser.add_argument('--ui', '-u', type=str, choices=['streamlit', 'gradio', 'flask', 'asgi'], 
                         default='streamlit', help='UI type to launch')
     args = parser.parse_args()
     
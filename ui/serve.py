@@ -0,0 +1,44 @@
+"""
+Production entry point for the Adaptive RAG ASGI app.
+"""
+
+import os
+import argparse
+from pathlib import Path
+
+def main():
+    """Parse command line arguments and serve the ASGI app with uvicorn."""
+    parser = argparse.ArgumentParser(description='Serve the Adaptive RAG ASGI app')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='Interface to bind')
+    parser.add_argument('--port', '-p', type=int, default=8000, help='Port to bind')
+    parser.add_argument('--workers', '-w', type=int, default=1,
+                        help='Worker processes; each loads its own RAG system')
+    parser.add_argument('--shared-index', type=str, default=None,
+                        help='Serve from the memory-mapped index published to this directory '
+                             '(python -m src.utils.mmap_index) instead of indexing in every worker')
+    parser.add_argument('--threads', type=int, default=64,
+                        help='Threads per worker running workflow steps of in-flight queries')
+    parser.add_argument('--log-level', type=str, default='info', help='Uvicorn log level')
+    args = parser.parse_args()
+    
+    # Workers are separate processes, so settings reach them through the environment
+    os.environ['RAG_EXECUTOR_THREADS'] = str(args.threads)
+    if args.shared_index:
+        os.environ['RAG_SHARED_INDEX_DIR'] = str(Path(args.shared_index).resolve())
+    if args.workers > 1 and not os.environ.get('RAG_SESSION_SECRET'):
+        # Every worker must sign session cookies with the same key
+        os.environ['RAG_SESSION_SECRET'] = os.urandom(24).hex()
+    
+    import uvicorn
+    uvicorn.run(
+        'asgi_app:app',
+        app_dir=str(Path(__file__).parent),
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level=args.log_level,
+        proxy_headers=True,
+    )
+
+if __name__ == '__main__':
+    main()